@@ -0,0 +1,170 @@
+"""Extraction and chunking benchmark over synthetic legal PDFs.
+
+For every requested document size a synthetic act is generated, then each
+stage runs in a fresh process so its peak RSS is measured in isolation:
+
+- ``extract``: ``extract_from_pdf`` (pages/sec)
+- ``chunk``: ``chunk_legal_sections`` on the extracted JSON (chunks/sec)
+
+Results can be saved as a baseline and later compared against it; the run
+exits non-zero when a stage's throughput drops more than ``--tolerance``
+below the baseline, which makes it usable as a regression guard.
+
+Usage (from ``backend/``)::
+
+    python benchmarks/bench_extraction.py --pages 10 100 1000 --save-baseline b.json
+    python benchmarks/bench_extraction.py --pages 10 100 1000 --baseline b.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "rag_pipeline", "extraction")
+)
+
+from synthetic_pdf import generate_legal_pdf  # noqa: E402
+
+MIN_PAGES, MAX_PAGES = 10, 5000
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_extract(pdf_path, output_path, workers):
+    from extractor import extract_from_pdf
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        data = extract_from_pdf(pdf_path, output_path=output_path, workers=workers)
+        elapsed = time.perf_counter() - start
+    return {
+        "seconds": elapsed,
+        "sections": len(data["sections"]),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_chunk(extracted_path):
+    from chunks import chunk_legal_sections
+
+    with open(extracted_path, encoding="utf-8") as f:
+        data = json.load(f)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        chunks = chunk_legal_sections(data)
+        elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "chunks": len(chunks), "peak_rss_mb": peak_rss_mb()}
+
+
+def in_fresh_process(func, *args):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(func, *args).result()
+
+
+def bench_size(pages, workdir, *, toc, explanations, workers):
+    pdf_path = os.path.join(workdir, f"synthetic_{pages}.pdf")
+    extracted_path = os.path.join(workdir, f"synthetic_{pages}_extracted.json")
+    generate_legal_pdf(pdf_path, pages, toc=toc, explanations=explanations)
+
+    extract = in_fresh_process(run_extract, pdf_path, extracted_path, workers)
+    chunk = in_fresh_process(run_chunk, extracted_path)
+    return {
+        "extract_pages_per_sec": pages / extract["seconds"],
+        "extract_peak_rss_mb": extract["peak_rss_mb"],
+        "sections": extract["sections"],
+        "chunk_chunks_per_sec": chunk["chunks"] / chunk["seconds"],
+        "chunk_peak_rss_mb": chunk["peak_rss_mb"],
+        "chunks": chunk["chunks"],
+    }
+
+
+def check_regressions(results, baseline, tolerance):
+    """Return messages for every throughput that fell below the baseline."""
+    failures = []
+    for pages, metrics in results.items():
+        expected = baseline.get(pages)
+        if not expected:
+            continue
+        for key in ("extract_pages_per_sec", "chunk_chunks_per_sec"):
+            floor = expected[key] * (1 - tolerance)
+            if metrics[key] < floor:
+                failures.append(
+                    f"{pages} pages: {key} {metrics[key]:.1f} < {floor:.1f} "
+                    f"(baseline {expected[key]:.1f}, tolerance {tolerance:.0%})"
+                )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extraction and chunking")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--toc", action="store_true", help="Add TOC pages")
+    parser.add_argument(
+        "--explanations", action="store_true", help="Add Explanation blocks"
+    )
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--baseline", help="Fail if throughput regresses vs. this")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--save-baseline", help="Write results as a new baseline")
+    args = parser.parse_args()
+
+    for pages in args.pages:
+        if not MIN_PAGES <= pages <= MAX_PAGES:
+            parser.error(f"--pages must be between {MIN_PAGES} and {MAX_PAGES}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for pages in args.pages:
+            results[str(pages)] = bench_size(
+                pages,
+                workdir,
+                toc=args.toc,
+                explanations=args.explanations,
+                workers=args.workers,
+            )
+
+    header = (
+        f"{'pages':>6} {'sections':>9} {'pages/s':>9} {'extract MB':>11} "
+        f"{'chunks':>7} {'chunks/s':>10} {'chunk MB':>9}"
+    )
+    print(header)
+    for pages, m in results.items():
+        print(
+            f"{pages:>6} {m['sections']:>9} {m['extract_pages_per_sec']:>9.1f} "
+            f"{m['extract_peak_rss_mb']:>11.1f} {m['chunks']:>7} "
+            f"{m['chunk_chunks_per_sec']:>10.0f} {m['chunk_peak_rss_mb']:>9.1f}"
+        )
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        failures = check_regressions(results, baseline, args.tolerance)
+        if failures:
+            print("❌ Throughput regression:")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print("✅ No throughput regression against baseline")
+
+
+if __name__ == "__main__":
+    main()
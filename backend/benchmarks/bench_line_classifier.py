@@ -0,0 +1,190 @@
+"""Micro-benchmark for line classification in the extraction state machine.
+
+Compares the single-pass ``classify_line`` dispatch against the cascade of
+regex tests the state machine used to run on every line, and reports
+lines/sec for both plus the full ``iter_sections`` state machine.
+
+Usage (from ``backend/``)::
+
+    python benchmarks/bench_line_classifier.py
+    python benchmarks/bench_line_classifier.py --pdf ../data/raw/civil_code.pdf
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "rag_pipeline", "extraction")
+)
+
+from extractor import iter_sections  # noqa: E402
+from patterns import (  # noqa: E402
+    CHAPTER,
+    CLAUSE,
+    CONTINUATION,
+    METADATA,
+    METADATA_KEY,
+    PAGE_NUMBER,
+    PART,
+    PREAMBLE,
+    SECTION,
+    SUB_SECTION,
+    chapter_pattern,
+    classify_line,
+    metadata_key_pattern,
+    metadata_pattern,
+    page_number_pattern,
+    part_pattern,
+    preamble_start_pattern,
+    section_like_pattern,
+    section_pattern,
+    subclause_pattern,
+    subsection_pattern,
+)
+
+
+def legacy_classify(line):
+    """Reproduce the per-line regex cascade of the previous state machine.
+
+    Mirrors a body line of a section whose title is still being completed,
+    which is where the old code also rebuilt and ran the five-pattern ``any``
+    list before reaching the clause and sub-section checks.
+    """
+    if page_number_pattern.match(line):
+        return PAGE_NUMBER
+    if metadata_key_pattern.match(line):
+        return METADATA_KEY
+    if metadata_pattern.match(line):
+        return METADATA
+    if preamble_start_pattern.match(line):
+        return PREAMBLE
+    if part_pattern.match(line):
+        return PART
+    if chapter_pattern.match(line):
+        return CHAPTER
+    if section_pattern.match(line):
+        return SECTION
+    return legacy_classify_body(line)
+
+
+def legacy_classify_body(line):
+    """Classify a line the old cascade did not recognise as a heading."""
+    if not any(
+        p.match(line)
+        for p in [
+            subsection_pattern,
+            subclause_pattern,
+            section_like_pattern,
+            part_pattern,
+            chapter_pattern,
+        ]
+    ):
+        return CONTINUATION
+    if subclause_pattern.match(line):
+        return CLAUSE
+    if subsection_pattern.match(line):
+        return SUB_SECTION
+    return CONTINUATION
+
+
+def synthetic_lines(count, seed=0):
+    rng = random.Random(seed)
+    words = [
+        "the",
+        "person",
+        "shall",
+        "be",
+        "liable",
+        "to",
+        "punishment",
+        "of",
+        "imprisonment",
+        "for",
+        "a",
+        "term",
+        "not",
+        "exceeding",
+        "three",
+        "years",
+        "or",
+        "fine",
+        "or",
+        "both",
+        "provided",
+        "that",
+        "court",
+        "may",
+        "order",
+    ]
+
+    def text(n):
+        return " ".join(rng.choice(words) for _ in range(n))
+
+    makers = [
+        (2, lambda i: f"Part-{i % 9 + 1}"),
+        (3, lambda i: f"Chapter-{i % 30 + 1}"),
+        (20, lambda i: f"{i % 900 + 1}. {text(4).capitalize()}: {text(8)}"),
+        (25, lambda i: f"({i % 9 + 1}) {text(12)}"),
+        (20, lambda i: f"({'abcdefgh'[i % 8]}) {text(10)}"),
+        (4, lambda i: str(i % 400 + 1)),
+        (1, lambda i: "Explanation: " + text(10)),
+        (60, lambda i: text(14)),
+    ]
+    weights = [w for w, _ in makers]
+    choices = rng.choices([m for _, m in makers], weights=weights, k=count)
+    return [make(i) for i, make in enumerate(choices)]
+
+
+def pdf_lines(pdf_path):
+    import pdfplumber
+    from extractor import iter_page_lines
+
+    with pdfplumber.open(pdf_path) as pdf:
+        return [line for line in iter_page_lines(pdf) if line]
+
+
+def lines_per_sec(func, lines, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            func(line)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", help="Benchmark the lines of a real PDF instead")
+    parser.add_argument("--lines", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    lines = pdf_lines(args.pdf) if args.pdf else synthetic_lines(args.lines)
+
+    mismatches = [
+        line for line in lines if legacy_classify(line) != classify_line(line)[0]
+    ]
+    if mismatches:
+        raise SystemExit(f"classify_line disagrees on {len(mismatches)} lines")
+
+    legacy = lines_per_sec(legacy_classify, lines, args.repeat)
+    single_pass = lines_per_sec(classify_line, lines, args.repeat)
+
+    start = time.perf_counter()
+    sections = sum(1 for _ in iter_sections(lines))
+    state_machine = len(lines) / (time.perf_counter() - start)
+
+    print(f"lines:                       {len(lines)}")
+    print(f"regex cascade (before):      {legacy:>12,.0f} lines/sec")
+    print(f"classify_line (after):       {single_pass:>12,.0f} lines/sec")
+    print(f"speed-up:                    {single_pass / legacy:>12.2f}x")
+    print(f"state machine end-to-end:    {state_machine:>12,.0f} lines/sec")
+    print(f"sections produced:           {sections}")
+
+
+if __name__ == "__main__":
+    main()
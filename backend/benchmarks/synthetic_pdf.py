@@ -0,0 +1,242 @@
+"""Generate synthetic legal PDFs for extraction benchmarks.
+
+Documents follow the layout ``extract_from_pdf`` expects: optional metadata
+and table-of-contents pages, a preamble, then Parts, Chapters and Sections
+with numbered Sub-sections, lettered Clauses and optional Explanation blocks.
+The PDF is written directly (Helvetica text, no extra dependencies) one page
+at a time, so even 5000-page documents are produced in constant memory.
+
+Usage (from ``backend/``)::
+
+    python benchmarks/synthetic_pdf.py /tmp/act_500.pdf --pages 500 --toc
+"""
+
+import argparse
+import random
+
+WORDS = [
+    "the",
+    "person",
+    "shall",
+    "be",
+    "liable",
+    "to",
+    "punishment",
+    "of",
+    "imprisonment",
+    "for",
+    "a",
+    "term",
+    "not",
+    "exceeding",
+    "three",
+    "years",
+    "or",
+    "fine",
+    "or",
+    "both",
+    "provided",
+    "that",
+    "court",
+    "may",
+    "order",
+    "any",
+    "property",
+    "contract",
+    "marriage",
+    "employer",
+    "worker",
+    "wage",
+    "notice",
+    "government",
+    "office",
+    "authority",
+    "prescribed",
+    "manner",
+    "within",
+    "period",
+    "of",
+    "days",
+    "after",
+    "receipt",
+]
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+FONT_SIZE = 10
+LEADING = 14
+LINES_PER_PAGE = 52
+
+
+def sentence(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def iter_body_lines(rng, explanations):
+    """Yield the lines of an endless Part/Chapter/Section document body."""
+    part = chapter = section = 0
+    while True:
+        part += 1
+        yield f"Part-{part}"
+        yield sentence(rng, 3).title()
+        for _ in range(rng.randint(2, 4)):
+            chapter += 1
+            yield f"Chapter-{chapter}"
+            yield sentence(rng, 4).title()
+            for _ in range(rng.randint(4, 10)):
+                section += 1
+                title = sentence(rng, rng.randint(2, 5)).capitalize()
+                if rng.random() < 0.3:
+                    yield f"{section}. {title}: {sentence(rng, 12)}"
+                    yield sentence(rng, 14)
+                    continue
+                yield f"{section}. {title}:"
+                for sub in range(1, rng.randint(2, 5)):
+                    yield f"({sub}) {sentence(rng, 14).capitalize()}"
+                    yield sentence(rng, 14)
+                    if rng.random() < 0.4:
+                        for letter in "abcd"[: rng.randint(2, 4)]:
+                            yield f"({letter}) {sentence(rng, 10)},"
+                    if explanations and rng.random() < 0.15:
+                        yield f"Explanation: For the purposes of {sentence(rng, 8)}"
+                        yield sentence(rng, 12)
+
+
+def iter_document_pages(pages, *, toc=False, explanations=False, seed=0):
+    """Yield ``pages`` lists of text lines, numbered like the real codes."""
+    rng = random.Random(seed)
+    front = [
+        "The National Code (Synthetic), 2074 (2017)",
+        "Date of Authentication:",
+        "16 October 2017",
+        "Act number: 34 of the year 2074",
+    ]
+    if toc:
+        toc_pages = max(1, pages // 50)
+        front += [
+            f"{n}. {sentence(rng, 4).capitalize()}"
+            for n in range(1, toc_pages * LINES_PER_PAGE)
+        ]
+    front += [
+        "Preamble:",
+        f"Whereas it is expedient to {sentence(rng, 20)};",
+        "Now, therefore, the Legislature has enacted this Act.",
+    ]
+
+    body = iter_body_lines(rng, explanations)
+    page_lines = []
+    number = 1
+    for line in front:
+        page_lines.append(line)
+        if len(page_lines) == LINES_PER_PAGE - 1:
+            yield page_lines + [str(number)]
+            page_lines, number = [], number + 1
+    while number <= pages:
+        page_lines.append(next(body))
+        if len(page_lines) == LINES_PER_PAGE - 1:
+            yield page_lines + [str(number)]
+            page_lines, number = [], number + 1
+
+
+def pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def page_stream(lines):
+    ops = [f"BT /F1 {FONT_SIZE} Tf {LEADING} TL 50 {PAGE_HEIGHT - 50} Td"]
+    ops += [f"({pdf_escape(line)}) Tj T*" for line in lines]
+    ops.append("ET")
+    return "\n".join(ops).encode("latin-1", "replace")
+
+
+def write_pdf(path, page_iter):
+    """Write pages of text lines as a minimal single-font PDF.
+
+    Objects 1-3 are the catalog, page tree and font; each page then takes
+    two objects (page and content stream). The page tree is written last
+    since it needs the final page list.
+    """
+    offsets = {}
+    page_ids = []
+    box = f"[0 0 {PAGE_WIDTH} {PAGE_HEIGHT}]"
+    with open(path, "wb") as f:
+
+        def write_object(obj_id, body):
+            offsets[obj_id] = f.tell()
+            f.write(f"{obj_id} 0 obj\n".encode() + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n")
+        write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        write_object(
+            3,
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+            b"/Encoding /WinAnsiEncoding >>",
+        )
+        next_id = 4
+        for lines in page_iter:
+            page_id, content_id = next_id, next_id + 1
+            next_id += 2
+            stream = page_stream(lines)
+            write_object(
+                page_id,
+                (
+                    f"<< /Type /Page /Parent 2 0 R /MediaBox {box} /CropBox {box} "
+                    f"/Resources << /Font << /F1 3 0 R >> >> "
+                    f"/Contents {content_id} 0 R >>"
+                ).encode(),
+            )
+            write_object(
+                content_id,
+                f"<< /Length {len(stream)} >>\nstream\n".encode()
+                + stream
+                + b"\nendstream",
+            )
+            page_ids.append(page_id)
+        kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+        write_object(
+            2,
+            f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode(),
+        )
+
+        xref_offset = f.tell()
+        f.write(f"xref\n0 {next_id}\n0000000000 65535 f \n".encode())
+        for obj_id in range(1, next_id):
+            f.write(f"{offsets[obj_id]:010d} 00000 n \n".encode())
+        f.write(
+            f"trailer\n<< /Size {next_id} /Root 1 0 R >>\n"
+            f"startxref\n{xref_offset}\n%%EOF\n".encode()
+        )
+    return len(page_ids)
+
+
+def generate_legal_pdf(path, pages, *, toc=False, explanations=False, seed=0):
+    """Write a synthetic legal act of ``pages`` pages to ``path``."""
+    return write_pdf(
+        path,
+        iter_document_pages(pages, toc=toc, explanations=explanations, seed=seed),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic legal PDF")
+    parser.add_argument("output")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--toc", action="store_true", help="Add TOC pages")
+    parser.add_argument(
+        "--explanations", action="store_true", help="Add Explanation blocks"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    written = generate_legal_pdf(
+        args.output,
+        args.pages,
+        toc=args.toc,
+        explanations=args.explanations,
+        seed=args.seed,
+    )
+    print(f"✅ Wrote {written} pages to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
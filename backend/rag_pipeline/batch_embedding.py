@@ -0,0 +1,148 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import google.generativeai as genai
+import numpy as np
+from dotenv import load_dotenv
+from google.api_core import exceptions as api_exceptions
+from rag_pipeline.logger_config import get_logger
+
+load_dotenv()
+logger = get_logger(__name__)
+
+EMBEDDING_MODEL = "models/embedding-001"
+# batchEmbedContents accepts at most 100 texts per request.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))
+EMBED_REQUESTS_PER_MINUTE = float(os.getenv("EMBED_REQUESTS_PER_MINUTE", "150"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+
+# Errors worth retrying: quota/throttling and transient server failures.
+RETRYABLE_ERRORS = (
+    api_exceptions.ResourceExhausted,
+    api_exceptions.TooManyRequests,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.InternalServerError,
+    api_exceptions.DeadlineExceeded,
+)
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``acquire`` blocks until a token is free.
+
+    Refills at ``rate`` tokens per second up to ``capacity``, so short bursts
+    are allowed while the long-run rate stays under the quota.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Take ``tokens`` from the bucket, sleeping until enough have refilled."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait_for = (tokens - self.tokens) / self.rate
+            time.sleep(wait_for)
+
+
+# Shared by every ingestion in the process so concurrent jobs split one quota.
+RATE_LIMITER = TokenBucket(
+    EMBED_REQUESTS_PER_MINUTE / 60, capacity=max(EMBED_MAX_IN_FLIGHT, 1)
+)
+
+
+def embed_batch(texts, task_type="RETRIEVAL_DOCUMENT", model=EMBEDDING_MODEL):
+    """Embed up to ``EMBED_BATCH_SIZE`` texts in one request.
+
+    Returns a ``(len(texts), dim)`` float32 array.
+    """
+    response = genai.embed_content(model=model, content=texts, task_type=task_type)
+    return np.asarray(response["embedding"], dtype=np.float32)
+
+
+def embed_batch_with_retry(
+    texts, task_type, rate_limiter, model=EMBEDDING_MODEL, max_retries=EMBED_MAX_RETRIES
+):
+    for attempt in range(max_retries):
+        rate_limiter.acquire()
+        try:
+            return embed_batch(texts, task_type, model)
+        except RETRYABLE_ERRORS as e:
+            if attempt + 1 == max_retries:
+                raise
+            # Exponential backoff with jitter so throttled workers spread out
+            delay = min(2**attempt, 60) * (0.5 + random.random())
+            logger.warning(
+                f"Embedding batch of {len(texts)} throttled or failed "
+                f"(attempt {attempt + 1}/{max_retries}): {e}; retrying in {delay:.1f}s"
+            )
+            time.sleep(delay)
+
+
+def embed_texts(
+    texts,
+    task_type="RETRIEVAL_DOCUMENT",
+    batch_size=EMBED_BATCH_SIZE,
+    max_in_flight=EMBED_MAX_IN_FLIGHT,
+    rate_limiter=None,
+    model=EMBEDDING_MODEL,
+    on_batch=None,
+):
+    """Embed ``texts`` with batched, concurrent Gemini requests.
+
+    At most ``max_in_flight`` requests run at once and each waits for a
+    ``rate_limiter`` token first. Returns a float32 array with one row per
+    text, in input order.
+    ``on_batch(start, vectors)`` is called from the calling thread as each
+    batch finishes; if it raises (e.g. the ingestion job was cancelled),
+    queued batches are dropped and the exception propagates.
+    """
+    rate_limiter = rate_limiter or RATE_LIMITER
+    texts = list(texts)
+    vectors = None
+
+    with ThreadPoolExecutor(
+        max_workers=max_in_flight, thread_name_prefix="embed"
+    ) as executor:
+        pending = {
+            executor.submit(
+                embed_batch_with_retry,
+                texts[start : start + batch_size],
+                task_type,
+                rate_limiter,
+                model,
+            ): start
+            for start in range(0, len(texts), batch_size)
+        }
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    start = pending.pop(future)
+                    batch_vectors = future.result()
+                    if vectors is None:
+                        dim = batch_vectors.shape[1]
+                        vectors = np.empty((len(texts), dim), dtype=np.float32)
+                    vectors[start : start + len(batch_vectors)] = batch_vectors
+                    if on_batch:
+                        on_batch(start, batch_vectors)
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+    return vectors if vectors is not None else np.empty((0, 0), dtype=np.float32)
@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+from dotenv import load_dotenv
+from rag_pipeline.logger_config import get_logger
+
+load_dotenv()
+logger = get_logger(__name__)
+
+BM25_INDEX_DIR = os.getenv("BM25_INDEX_DIR", os.path.join(os.getcwd(), "bm25_indexes"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Unfinished index versions older than this are left over from a failed build
+BM25_STALE_BUILD_SECONDS = 3600
+
+# Words, and section/clause numbers such as "302" or "3.1"
+TOKEN_RE = re.compile(r"\w+(?:\.\d+)*", re.UNICODE)
+STOPWORDS = frozenset(
+    [
+        "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has",
+        "have", "in", "is", "it", "its", "of", "on", "or", "shall", "such",
+        "that", "the", "this", "to", "was", "which", "with",
+    ]
+)
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def write_index(path, doc_ids, documents, k1=BM25_K1, b=BM25_B):
+    """Write a BM25 index over ``documents`` (token lists) to ``path``.
+
+    Postings are stored term by term in flat arrays: ``offsets[t]`` to
+    ``offsets[t + 1]`` delimit term ``t``'s slice of ``postings_docs`` (doc
+    numbers) and ``postings_tf`` (term frequencies).
+    """
+    postings = {}
+    doc_lengths = np.zeros(len(documents), dtype=np.float32)
+    for doc, tokens in enumerate(documents):
+        doc_lengths[doc] = len(tokens)
+        for term, tf in Counter(tokens).items():
+            postings.setdefault(term, []).append((doc, tf))
+
+    terms = sorted(postings)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+    postings_docs = np.empty(offsets[-1], dtype=np.int32)
+    postings_tf = np.empty(offsets[-1], dtype=np.float32)
+    for i, term in enumerate(terms):
+        entries = np.asarray(postings[term], dtype=np.int64)
+        postings_docs[offsets[i] : offsets[i + 1]] = entries[:, 0]
+        postings_tf[offsets[i] : offsets[i + 1]] = entries[:, 1]
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "offsets.npy"), offsets)
+    np.save(os.path.join(path, "postings_docs.npy"), postings_docs)
+    np.save(os.path.join(path, "postings_tf.npy"), postings_tf)
+    np.save(os.path.join(path, "doc_lengths.npy"), doc_lengths)
+    with open(os.path.join(path, "terms.json"), "w", encoding="utf-8") as f:
+        json.dump(terms, f, ensure_ascii=False)
+    with open(os.path.join(path, "doc_ids.json"), "w", encoding="utf-8") as f:
+        json.dump([str(doc_id) for doc_id in doc_ids], f)
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        avgdl = float(doc_lengths.mean()) if len(documents) else 0.0
+        json.dump({"documents": len(documents), "avgdl": avgdl, "k1": k1, "b": b}, f)
+
+
+class BM25Index:
+    """A BM25 index whose arrays are memory-mapped from disk."""
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = self.load_array("offsets.npy")
+        self.postings_docs = self.load_array("postings_docs.npy")
+        self.postings_tf = self.load_array("postings_tf.npy")
+        self.doc_lengths = self.load_array("doc_lengths.npy")
+        with open(os.path.join(path, "terms.json"), encoding="utf-8") as f:
+            self.term_ids = {term: i for i, term in enumerate(json.load(f))}
+        with open(os.path.join(path, "doc_ids.json"), encoding="utf-8") as f:
+            self.doc_ids = json.load(f)
+        self.doc_numbers = {doc_id: doc for doc, doc_id in enumerate(self.doc_ids)}
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.documents = meta["documents"]
+        self.avgdl = meta["avgdl"] or 1.0
+        self.k1 = meta["k1"]
+        self.b = meta["b"]
+        # Per-document length normalization is query independent.
+        self.length_norm = self.k1 * (
+            1 - self.b + self.b * np.asarray(self.doc_lengths) / self.avgdl
+        )
+
+    def load_array(self, name):
+        """Memory-map one of the index's arrays read-only."""
+        return np.load(os.path.join(self.path, name), mmap_mode="r")
+
+    def search(self, query, limit=10, allowed_ids=None):
+        """Return ``(point_id, score)`` pairs for the best ``limit`` documents.
+
+        With ``allowed_ids``, only those point IDs can be returned.
+        """
+        scores = np.zeros(self.documents, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start, stop = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.postings_docs[start:stop]
+            tf = self.postings_tf[start:stop]
+            df = stop - start
+            idf = np.log(1 + (self.documents - df + 0.5) / (df + 0.5))
+            # Each document appears once per term, so fancy-index += is safe.
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + self.length_norm[docs])
+
+        if allowed_ids is not None:
+            allowed = np.zeros(self.documents, dtype=bool)
+            allowed[
+                [self.doc_numbers[i] for i in allowed_ids if i in self.doc_numbers]
+            ] = True
+            scores[~allowed] = 0
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        if len(matched) > limit:
+            top = np.argpartition(scores[matched], -limit)[-limit:]
+            matched = matched[top]
+        matched = matched[np.argsort(scores[matched])[::-1]]
+        return [(self.doc_ids[doc], float(scores[doc])) for doc in matched]
+
+
+def index_root(collection):
+    return os.path.join(BM25_INDEX_DIR, collection)
+
+
+def iter_collection_contents(client, collection, page_size=1000):
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection,
+            limit=page_size,
+            offset=offset,
+            with_payload=["content"],
+            with_vectors=False,
+        )
+        for point in points:
+            yield str(point.id), (point.payload or {}).get("content", "")
+        if offset is None:
+            return
+
+
+def publish_version(root, version):
+    pointer = os.path.join(root, "CURRENT")
+    previous = None
+    if os.path.exists(pointer):
+        with open(pointer, encoding="utf-8") as f:
+            previous = f.read().strip()
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer + ".tmp", pointer)
+    return previous
+
+
+def remove_old_versions(root, keep):
+    """Delete finished versions older than every version in ``keep``.
+
+    A version is finished once its meta.json exists; unfinished ones may
+    still be written by another process and are only removed once stale.
+    """
+    oldest_kept = min(keep)
+    stale = time.time() - BM25_STALE_BUILD_SECONDS
+    for entry in os.listdir(root):
+        path = os.path.join(root, entry)
+        if not entry.startswith("v") or entry >= oldest_kept:
+            continue
+        finished = os.path.exists(os.path.join(path, "meta.json"))
+        if finished or os.path.getmtime(path) < stale:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def build_collection_index(client, collection):
+    """Rebuild ``collection``'s BM25 index from every point's content.
+
+    The index is written to a new version directory and then published by
+    atomically replacing the ``CURRENT`` pointer, so readers never see a
+    half-written index. The previous version is kept for readers that read
+    the old pointer but have not opened its files yet; older ones are
+    removed. Builds of the same collection in this process are serialized.
+    """
+    with collection_build_lock(collection):
+        start = time.perf_counter()
+        doc_ids, documents = [], []
+        for point_id, content in iter_collection_contents(client, collection):
+            doc_ids.append(point_id)
+            documents.append(tokenize(content))
+
+        root = index_root(collection)
+        version = f"v{time.time_ns()}"
+        write_index(os.path.join(root, version), doc_ids, documents)
+        previous = publish_version(root, version)
+        remove_old_versions(root, keep=[version, previous or version])
+    logger.info(
+        f"Built BM25 index for {collection}: {len(documents)} documents in "
+        f"{time.perf_counter() - start:.2f}s"
+    )
+    return len(documents)
+
+
+_build_locks = {}
+_build_locks_lock = threading.Lock()
+
+
+def collection_build_lock(collection):
+    with _build_locks_lock:
+        return _build_locks.setdefault(collection, threading.Lock())
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def load_collection_index(collection):
+    """Return the current BM25 index of ``collection``, or None if none was built.
+
+    Reopened automatically after ``build_collection_index`` publishes a new
+    version.
+    """
+    pointer = os.path.join(index_root(collection), "CURRENT")
+    with _indexes_lock:
+        for _ in range(2):
+            try:
+                with open(pointer, encoding="utf-8") as f:
+                    version = f.read().strip()
+            except FileNotFoundError:
+                return None
+            cached = _indexes.get(collection)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            try:
+                index = BM25Index(os.path.join(index_root(collection), version))
+            except FileNotFoundError:
+                # Two builds were published since the pointer was read and
+                # the version is gone; read the pointer again.
+                continue
+            _indexes[collection] = (version, index)
+            return index
+        return cached[1] if cached is not None else None
+
+
+def main():
+    """Build BM25 indexes for hybrid search, e.g. for existing collections."""
+    from rag_pipeline.retriever.routing import COLLECTION_MAP
+    from rag_pipeline.vector_store import get_vector_store
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--collection",
+        action="append",
+        help="Collection to index (repeatable); defaults to every domain collection",
+    )
+    args = parser.parse_args()
+
+    client = get_vector_store()
+    for collection in args.collection or COLLECTION_MAP.values():
+        if not client.collection_exists(collection_name=collection):
+            print(f"⚠️ Skipping missing collection {collection}")
+            continue
+        documents = build_collection_index(client, collection)
+        print(f"✅ Indexed {documents} documents of {collection}")
+
+
+if __name__ == "__main__":
+    main()
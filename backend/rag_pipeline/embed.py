@@ -1,14 +1,242 @@
-# embeddings.py or similar file
 import os
+import threading
+from abc import ABC, abstractmethod
+
 import google.generativeai as genai
+import numpy as np
+from dotenv import load_dotenv
+from rag_pipeline.batch_embedding import EMBEDDING_MODEL, embed_texts
+from rag_pipeline.embedding_cache import get_embedding_cache
+from rag_pipeline.logger_config import get_logger
+
+load_dotenv()
+logger = get_logger(__name__)
+
+# Embedder spec as "<backend>:<model>", e.g. "gemini:models/embedding-001" or
+# "local:sentence-transformers/all-MiniLM-L6-v2". A collection can override it
+# with EMBEDDER_<COLLECTION>, e.g. EMBEDDER_LABOUR_ACT=local:BAAI/bge-small-en-v1.5.
+# Ingestion and querying must use the same embedder for a collection.
+EMBEDDER = os.getenv("EMBEDDER", f"gemini:{EMBEDDING_MODEL}")
+
+# Local (sentence-transformers) inference settings
+LOCAL_EMBED_BATCH_SIZE = int(os.getenv("LOCAL_EMBED_BATCH_SIZE", "32"))
+LOCAL_EMBED_THREADS = int(os.getenv("LOCAL_EMBED_THREADS", str(os.cpu_count() or 1)))
+# "torch" or "onnx" (needs optimum[onnxruntime])
+LOCAL_EMBED_BACKEND = os.getenv("LOCAL_EMBED_BACKEND", "torch")
+# Set to "int8" for dynamically quantized weights
+LOCAL_EMBED_QUANTIZE = os.getenv("LOCAL_EMBED_QUANTIZE", "")
+
+
+class Embedder(ABC):
+    """Turns texts into vectors, going through the shared embedding cache.
+
+    Subclasses implement ``embed_uncached``; ``model_id`` namespaces their
+    vectors in the cache.
+    """
+
+    model_id = None
+
+    @abstractmethod
+    def embed_uncached(self, texts, task_type, on_batch=None):
+        """Embed ``texts`` in order into a float32 array.
+
+        ``on_batch(start, vectors)`` is called as each batch finishes.
+        """
+
+    def embed(self, texts, task_type, progress=None):
+        """Embed ``texts`` into a ``(len(texts), dim)`` float32 array."""
+        texts = list(texts)
+        cache = get_embedding_cache()
+        cached = cache.get_many(self.model_id, task_type, texts)
+        # Only cache misses are embedded; positions map them back.
+        positions = [i for i, vector in enumerate(cached) if vector is None]
+        if progress and len(positions) < len(texts):
+            progress(len(texts) - len(positions))
+        misses = [texts[i] for i in positions]
+
+        def on_batch(start, batch_vectors):
+            batch_texts = misses[start : start + len(batch_vectors)]
+            cache.put_many(self.model_id, task_type, batch_texts, batch_vectors)
+            if progress:
+                progress(len(batch_vectors))
+
+        fresh = self.embed_uncached(misses, task_type, on_batch) if misses else []
+        for position, vector in zip(positions, fresh, strict=True):
+            cached[position] = vector
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.vstack(cached).astype(np.float32, copy=False)
+
+    def embed_documents(self, texts, progress=None):
+        """Embed documents for indexing."""
+        return self.embed(texts, "RETRIEVAL_DOCUMENT", progress)
+
+    def embed_query(self, text):
+        """Embed one search query into a 1-D float32 vector."""
+        return self.embed([text], "RETRIEVAL_QUERY")[0]
+
+
+class GeminiEmbedder(Embedder):
+    """Remote Gemini embeddings via batched, rate-limited requests."""
+
+    def __init__(self, model=EMBEDDING_MODEL):
+        # Keeps the ID vectors were cached under before embedders existed.
+        self.model_id = model
+        self.model = model
+
+    def embed_uncached(self, texts, task_type, on_batch=None):
+        """Embed ``texts`` with the Gemini API."""
+        return embed_texts(texts, task_type, model=self.model, on_batch=on_batch)
+
+
+class SentenceTransformerEmbedder(Embedder):
+    """Local CPU embeddings with sentence-transformers.
+
+    Texts are encoded in batches of ``batch_size`` on ``threads`` CPU threads.
+    ``quantize="int8"`` applies dynamic int8 quantization to the linear layers;
+    ``backend="onnx"`` runs the model with ONNX Runtime through optimum
+    instead of torch (mean pooling, L2-normalized).
+    """
+
+    def __init__(
+        self,
+        model_name,
+        batch_size=LOCAL_EMBED_BATCH_SIZE,
+        threads=LOCAL_EMBED_THREADS,
+        backend=LOCAL_EMBED_BACKEND,
+        quantize=LOCAL_EMBED_QUANTIZE,
+    ):
+        if backend not in ("torch", "onnx"):
+            raise ValueError(f"Unknown local embedding backend: {backend}")
+        if quantize not in ("", "int8"):
+            raise ValueError(f"Unsupported quantization: {quantize}")
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.threads = threads
+        self.backend = backend
+        self.quantize = quantize
+        # Quantized and ONNX vectors differ slightly, so cache them separately.
+        self.model_id = ":".join(
+            part for part in ("local", model_name, backend, quantize) if part
+        )
+        self.lock = threading.Lock()
+        if backend == "onnx":
+            self.load_onnx()
+        else:
+            self.load_torch()
+        logger.info(
+            f"Loaded local embedder {model_name} ({backend}"
+            f"{', ' + quantize if quantize else ''}, {threads} threads)"
+        )
+
+    def load_torch(self):
+        """Load the sentence-transformers model, int8-quantized if requested."""
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        torch.set_num_threads(self.threads)
+        self.model = SentenceTransformer(self.model_name, device="cpu")
+        if self.quantize == "int8":
+            self.model = torch.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+
+    def load_onnx(self):
+        """Export the model to ONNX, int8-quantized if requested."""
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        from transformers import AutoTokenizer
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.threads
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        model = ORTModelForFeatureExtraction.from_pretrained(
+            self.model_name, export=True, session_options=options
+        )
+        if self.quantize == "int8":
+            export_dir = os.path.join(
+                os.getenv("LOCAL_EMBED_ONNX_DIR", os.path.join(os.getcwd(), "onnx")),
+                self.model_name.replace("/", "__"),
+            )
+            quantizer = ORTQuantizer.from_pretrained(model)
+            quantizer.quantize(
+                save_dir=export_dir,
+                quantization_config=AutoQuantizationConfig.avx2(
+                    is_static=False, per_channel=False
+                ),
+            )
+            model = ORTModelForFeatureExtraction.from_pretrained(
+                export_dir,
+                file_name="model_quantized.onnx",
+                session_options=options,
+            )
+        self.model = model
+
+    def encode(self, texts):
+        """Encode one batch of texts into float32 vectors."""
+        if self.backend == "torch":
+            vectors = self.model.encode(
+                texts, batch_size=len(texts), convert_to_numpy=True
+            )
+            return vectors.astype(np.float32, copy=False)
+
+        inputs = self.tokenizer(
+            texts, padding=True, truncation=True, return_tensors="np"
+        )
+        hidden = self.model(**inputs).last_hidden_state
+        mask = inputs["attention_mask"][..., None].astype(hidden.dtype)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled.astype(np.float32, copy=False)
+
+    def embed_uncached(self, texts, task_type, on_batch=None):
+        """Encode ``texts`` in batches, one batch at a time."""
+        batches = []
+        for start in range(0, len(texts), self.batch_size):
+            # One inference at a time; the model already uses every thread.
+            with self.lock:
+                batch_vectors = self.encode(texts[start : start + self.batch_size])
+            batches.append(batch_vectors)
+            if on_batch:
+                on_batch(start, batch_vectors)
+        return np.vstack(batches)
+
+
+def create_embedder(spec):
+    backend, _, model = spec.partition(":")
+    if backend == "gemini":
+        setup_gemini()
+        return GeminiEmbedder(model or EMBEDDING_MODEL)
+    if backend == "local" and model:
+        return SentenceTransformerEmbedder(model)
+    raise ValueError(f"Invalid embedder spec: {spec!r}")
+
+
+def embedder_spec(collection=None):
+    if collection:
+        override = os.getenv(f"EMBEDDER_{collection.upper()}")
+        if override:
+            return override
+    return EMBEDDER
+
+
+_embedders = {}
+_embedders_lock = threading.Lock()
+
+
+def get_embedder(collection=None):
+    """Embedder configured for ``collection``, created once per process."""
+    spec = embedder_spec(collection)
+    with _embedders_lock:
+        if spec not in _embedders:
+            _embedders[spec] = create_embedder(spec)
+        return _embedders[spec]
 
 
 def setup_gemini():
     genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
 
-def embed_query(query):
-    result = genai.embed_content(
-        model="models/embedding-001", content=query, task_type="RETRIEVAL_QUERY"
-    )
-    return result["embedding"]  # This must be a list[float]
+def embed_query(query, collection=None):
+    return get_embedder(collection).embed_query(query)  # 1-D float32 array
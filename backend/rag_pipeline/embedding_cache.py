@@ -0,0 +1,252 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+from dotenv import load_dotenv
+from rag_pipeline.logger_config import get_logger
+
+load_dotenv()
+logger = get_logger(__name__)
+
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", os.path.join(os.getcwd(), "embedding_cache.sqlite3")
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024"))
+# Hot entries (e.g. frequent questions) are also kept in process memory.
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(
+    os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "1024")
+)
+# Hits are recorded in memory and their last_used written in batches of this
+# many keys, or after this many seconds, instead of one UPDATE per lookup.
+EMBEDDING_CACHE_TOUCH_BATCH = 256
+EMBEDDING_CACHE_TOUCH_SECONDS = 60
+# The size is tracked per put; the table is only recounted (catching up with
+# other processes' writes) after this many rows or when over a limit.
+EMBEDDING_CACHE_RECOUNT_ROWS = 1000
+
+
+def normalize_text(text):
+    """NFC-normalize and collapse whitespace so trivial variants share a key."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def embedding_key(model, task_type, text):
+    raw = f"{model}\0{task_type}\0{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding cache with LRU eviction.
+
+    Vectors are stored as float32 blobs keyed by model, task type and the
+    hash of the normalized text. Entries beyond ``max_entries`` or
+    ``max_bytes`` of vector data are evicted least recently used first.
+    Recency is written back in batches, so it lags behind by up to
+    EMBEDDING_CACHE_TOUCH_SECONDS.
+    """
+
+    def __init__(
+        self,
+        path=EMBEDDING_CACHE_PATH,
+        max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+        max_bytes=int(EMBEDDING_CACHE_MAX_MB * 1024 * 1024),
+        memory_entries=EMBEDDING_CACHE_MEMORY_ENTRIES,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # key -> last use not yet written to SQLite
+        self.touched = {}
+        self.touched_flushed = time.monotonic()
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # WAL lets the ingestion and chat processes share the file.
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT, task_type TEXT, "
+            "vector BLOB, last_used REAL)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self.conn.commit()
+        self.entries, self.bytes = self.count()
+        self.unchecked_rows = 0
+
+    def count(self):
+        """Count the stored rows and their vector bytes with a full scan."""
+        return self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()
+
+    def touch(self, keys):
+        """Record a use of ``keys``, writing recency back in batches."""
+        now = time.time()
+        for key in keys:
+            self.touched[key] = now
+        due = time.monotonic() - self.touched_flushed >= EMBEDDING_CACHE_TOUCH_SECONDS
+        if len(self.touched) >= EMBEDDING_CACHE_TOUCH_BATCH or due:
+            self.flush_touched()
+
+    def flush_touched(self):
+        """Write pending recency updates to SQLite."""
+        if self.touched:
+            self.conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self.touched.items()],
+            )
+            self.conn.commit()
+            self.touched.clear()
+        self.touched_flushed = time.monotonic()
+
+    def remember(self, key, vector):
+        """Keep ``vector`` in the in-memory LRU tier (read-only)."""
+        vector.flags.writeable = False
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def get_many(self, model, task_type, texts):
+        """Return cached float32 vectors for ``texts``, with None for each miss.
+
+        Returned arrays are shared with the in-memory tier; don't modify them.
+        """
+        keys = [embedding_key(model, task_type, text) for text in texts]
+        found = {}
+        with self.lock:
+            for key in keys:
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[key] = self.memory[key]
+            missing = list({key for key in keys if key not in found})
+            # Stay under SQLite's bound-parameter limit.
+            for i in range(0, len(missing), 500):
+                batch = missing[i : i + 500]
+                rows = self.conn.execute(
+                    "SELECT key, vector FROM embeddings WHERE key IN "
+                    f"({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+                    self.remember(key, found[key])
+            self.touch(found)
+            vectors = [found.get(key) for key in keys]
+            hits = sum(vector is not None for vector in vectors)
+            self.hits += hits
+            self.misses += len(vectors) - hits
+        return vectors
+
+    def get(self, model, task_type, text):
+        """Return the cached vector for ``text``, or None."""
+        return self.get_many(model, task_type, [text])[0]
+
+    def put_many(self, model, task_type, texts, vectors):
+        """Store ``vectors`` for ``texts``, evicting if a limit is exceeded."""
+        now = time.time()
+        rows = []
+        with self.lock:
+            for text, vector in zip(texts, vectors, strict=True):
+                key = embedding_key(model, task_type, text)
+                vector = np.array(vector, dtype=np.float32)
+                self.remember(key, vector)
+                self.touched.pop(key, None)
+                rows.append((key, model, task_type, vector.tobytes(), now))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings "
+                "(key, model, task_type, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.conn.commit()
+            # Replaced keys are counted again, so this only overestimates.
+            self.entries += len(rows)
+            self.bytes += sum(len(row[3]) for row in rows)
+            self.unchecked_rows += len(rows)
+            self.evict()
+
+    def put(self, model, task_type, text, vector):
+        """Store one vector."""
+        self.put_many(model, task_type, [text], [vector])
+
+    def evict(self):
+        """Drop least recently used rows once either limit is exceeded.
+
+        Evicts down to 90% of the limits so a full cache doesn't pay for an
+        eviction on every insert. The table is only counted when the tracked
+        size is over a limit or EMBEDDING_CACHE_RECOUNT_ROWS rows were added.
+        """
+        over = self.entries > self.max_entries or self.bytes > self.max_bytes
+        if not over and self.unchecked_rows < EMBEDDING_CACHE_RECOUNT_ROWS:
+            return
+        entries, size = self.entries, self.bytes = self.count()
+        self.unchecked_rows = 0
+        if entries <= self.max_entries and size <= self.max_bytes:
+            return
+        # Evict by up-to-date recency.
+        self.flush_touched()
+        excess = entries - int(self.max_entries * 0.9)
+        if size > self.max_bytes:
+            # Rows are about the same size, so estimate how many must go.
+            row_size = size / entries
+            excess = max(excess, int((size - self.max_bytes * 0.9) / row_size) + 1)
+        keys = [
+            key
+            for (key,) in self.conn.execute(
+                "SELECT key FROM embeddings ORDER BY last_used LIMIT ?", (excess,)
+            )
+        ]
+        self.conn.executemany(
+            "DELETE FROM embeddings WHERE key = ?", [(key,) for key in keys]
+        )
+        self.conn.commit()
+        for key in keys:
+            self.memory.pop(key, None)
+        self.entries, self.bytes = self.count()
+        logger.info(f"Evicted {len(keys)} embeddings from {self.path}")
+
+    def stats(self, exact=False):
+        """Hit rate and size of the cache.
+
+        The size is the running estimate kept by ``put_many``, which counts
+        replaced keys again; ``exact=True`` recounts the table instead.
+        """
+        with self.lock:
+            if exact:
+                self.entries, self.bytes = self.count()
+                self.unchecked_rows = 0
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": self.entries,
+                "bytes": self.bytes,
+                "memory_entries": len(self.memory),
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """Process-wide cache shared by ingestion and query embedding."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
@@ -1,23 +1,27 @@
+import hashlib
 import os
 import tempfile
 from datetime import datetime
 
-from chunks import chunk_legal_sections
-from data_embedding import (
-    connect_qdrant,
-    embed_with_gemini,
-    load_embedder_gemini,
-    upload_chunks,
-)
 from dotenv import load_dotenv
-from extractor import extract_from_pdf
 from fastapi import FastAPI, File, HTTPException, Query, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from ingest import ingest_pdf
+from jobs import FINISHED_STATES, JobManager
 from rag_pipeline.logger_config import get_logger
 
 load_dotenv()
 logger = get_logger(__name__)
 
+# Ingestion jobs run in the background; at most this many at a time.
+INGEST_MAX_CONCURRENCY = int(os.getenv("INGEST_MAX_CONCURRENCY", "2"))
+# Uploads are streamed to disk in blocks of this size and rejected past the cap.
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+UPLOAD_BLOCK_SIZE = int(os.getenv("UPLOAD_BLOCK_SIZE", str(1024 * 1024)))
+
 app = FastAPI()
+job_manager = JobManager(max_workers=INGEST_MAX_CONCURRENCY)
 
 
 @app.get("/")
@@ -29,13 +33,27 @@ async def root():
 async def upload_pdf(
     file: UploadFile = File(...),
     save_extract: bool = Query(False, description="Save extracted JSON"),
-    save_chunks: bool = Query(False, description="Save chunked JSON"),
+    save_chunks: bool = Query(False, description="Save chunks as JSONL"),
+    use_cache: bool = Query(True, description="Reuse cached extraction/chunks"),
+    act: str | None = Query(None, description="Act name (defaults to file name)"),
+    incremental: bool = Query(
+        False, description="Only embed changed sections and drop removed ones"
+    ),
 ):
     """
-    Upload a PDF file for processing.
+    Upload a PDF file for background processing.
+
+    Returns 202 with a job ID right away; poll ``/jobs/{job_id}`` for the
+    status, current stage and progress, and the result once it has finished.
 
     - save_extract: If true, the extracted content will be saved as JSON.
-    - save_chunks: If true, the chunked content will be saved as JSON.
+    - save_chunks: If true, the chunked content will be saved as JSONL.
+    - use_cache: If true, extraction and chunking are skipped when the same PDF
+      was already processed by the current extractor, patterns and chunker.
+    - act: Identifies the act; chunk IDs are derived from it and the section
+      IDs, so an amended act keeps the IDs of its unchanged sections.
+    - incremental: If true, only new or changed sections are embedded and
+      upserted, and sections no longer in the act are deleted.
     """
     # validation for the uploaded file type(only pdf supported!)
     if file.content_type != "application/pdf":
@@ -44,6 +62,7 @@ async def upload_pdf(
 
     # Validation for output paths if write_outputs is True
     filename_base = os.path.splitext(file.filename)[0]
+    act = act or filename_base
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     output_dir = os.path.join(os.getcwd(), "saved_outputs")
     os.makedirs(output_dir, exist_ok=True)
@@ -54,73 +73,105 @@ async def upload_pdf(
         else None
     )
     chunked_path = (
-        os.path.join(output_dir, f"{filename_base}_{timestamp}_chunks.json")
+        os.path.join(output_dir, f"{filename_base}_{timestamp}_chunks.jsonl")
         if save_chunks
         else None
     )
 
-    temp_file_path = None
-    try:
-        max_file_size = 10 * 1024 * 1024  # 10MB
-        # Save the uploaded PDF to a temporary file
-        content = await file.read()
-        if len(content) > max_file_size:
-            raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail="File size exceeds 10MB limit",
-            )
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-
-        # Step 1: Extract structured content from the PDF
-        logger.info(f"Extracting structured content from PDF...{file.filename}")
-        data = extract_from_pdf(temp_file_path, output_path=extracted_path)
-        if not data:
-            logger.error("Failed to extract data.")
-            return {"error": "Failed to extract data"}
-
-        # Step 2: Chunk the extracted sections
-        logger.info(" Chunking extracted sections...")
-        chunks = chunk_legal_sections(data, output_file=chunked_path)
-        if not chunks:
-            logger.error(" No chunks produced.")
-            return {"error": "No chunks produced"}
-        logger.info(f"Chunked {len(chunks)} sections.")
-
-        # Step 3: Embed chunks using Gemini
-        gemini_api_key = os.getenv("GEMINI_API_KEY")
-        logger.info(" Loading Gemini embedder...")
-        model = load_embedder_gemini(gemini_api_key)
-
-        logger.info(" Embedding chunks...")
-        for chunk in chunks:
-            chunk["vector"] = embed_with_gemini(chunk["content"], model)
-
-        # Step 4: Connect to Qdrant
-        qdrant_api_key = os.getenv("QDRANT_API_KEY")
-        qdrant_url = os.getenv("QDRANT_URL")
-        collection = "test_criminal_civil_code"
-        vector_dim = len(chunks[0]["vector"])
-
-        logger.info(" Connecting to Qdrant...")
-        client = connect_qdrant(qdrant_api_key, qdrant_url, collection, vector_dim)
-
-        # Step 5: Upload embedded chunks to Qdrant
-        logger.info("Uploading embedded chunks to Qdrant...")
-        upload_chunks(client, collection, chunks)
-
-        logger.info("All done!")
-        return {"status": "success", "chunks_uploaded": len(chunks)}
-
-    except Exception as e:
-        logger.error(f"Error during processing: {e}")
-        raise HTTPException(
-            status_code=500, detail=f"Processing error: {str(e)}"
-        ) from e
+    temp_file_path, pdf_sha256 = await spool_upload(file)
+
+    job = job_manager.submit(
+        ingest_pdf,
+        temp_file_path,
+        description=file.filename,
+        pdf_sha256=pdf_sha256,
+        filename=file.filename,
+        act=act,
+        extracted_path=extracted_path,
+        chunked_path=chunked_path,
+        use_cache=use_cache,
+        incremental=incremental,
+    )
+    # Runs on completion and on cancellation while still queued.
+    job.future.add_done_callback(lambda _: remove_temp_file(temp_file_path))
+
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/jobs/{job.id}",
+        },
+    )
+
+
+async def spool_upload(file):
+    """Copy an upload to a temp file in fixed-size blocks.
 
-    finally:
-        # Clean up the temporary file
-        if temp_file_path and os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
+    The SHA-256 and size are computed as the blocks go by, so the upload is
+    never held in memory and an oversized one is rejected as soon as it
+    crosses ``MAX_UPLOAD_BYTES``. Disk writes run in the threadpool so a slow
+    disk does not stall the event loop. Returns ``(path, sha256)``.
+    """
+    limit_mb = MAX_UPLOAD_BYTES / (1024 * 1024)
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File size exceeds {limit_mb:g}MB limit",
+    )
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise too_large
+
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
+        try:
+            while block := await file.read(UPLOAD_BLOCK_SIZE):
+                size += len(block)
+                if size > MAX_UPLOAD_BYTES:
+                    raise too_large
+                digest.update(block)
+                await run_in_threadpool(temp_file.write, block)
+        except BaseException:
+            temp_file.close()
+            remove_temp_file(temp_file.name)
+            raise
+    return temp_file.name, digest.hexdigest()
+
+
+def remove_temp_file(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+@app.get("/jobs")
+async def list_jobs():
+    return [job.to_dict() for job in job_manager.list_jobs()]
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Poll an ingestion job's status, current stage and per-stage progress."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Cancel an ingestion job.
+
+    Queued jobs are dropped immediately; running jobs stop at the next
+    progress checkpoint, so their status may stay "running" briefly.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status in FINISHED_STATES:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job already {job.status}",
+        )
+    job_manager.cancel(job_id)
+    return job.to_dict()
@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+import patterns
+from chunks import CHUNKER_VERSION
+from extractor import EXTRACTOR_VERSION
+
+CACHE_DIR = os.getenv(
+    "EXTRACTION_CACHE_DIR", os.path.join(os.getcwd(), "extraction_cache")
+)
+
+
+def file_sha256(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def pattern_fingerprint():
+    """Hash every compiled regex in ``patterns`` (source and flags)."""
+    digest = hashlib.sha256()
+    for name, value in sorted(vars(patterns).items()):
+        if isinstance(value, re.Pattern):
+            digest.update(f"{name}\0{value.pattern}\0{value.flags}\n".encode())
+    return digest.hexdigest()
+
+
+def extraction_cache_key(pdf_sha256):
+    """Key for ``extract_from_pdf`` output: PDF bytes, extractor and patterns."""
+    raw = f"{pdf_sha256}:{EXTRACTOR_VERSION}:{pattern_fingerprint()}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def chunks_cache_key(extraction_key, **options):
+    """Key for ``chunk_legal_sections`` output: its input plus chunk options."""
+    rendered = ",".join(f"{name}={value}" for name, value in sorted(options.items()))
+    raw = f"{extraction_key}:{rendered}:{CHUNKER_VERSION}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def cache_path(stage, key):
+    return os.path.join(CACHE_DIR, stage, key[:2], f"{key}.json")
+
+
+def load_cached(stage, key):
+    """Return the cached payload for ``stage``/``key`` or None on a miss."""
+    path = cache_path(stage, key)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # Missing, truncated or unreadable entries are a miss and get rebuilt.
+        return None
+
+
+def store_cached(stage, key, data):
+    """Atomically write ``data`` so concurrent readers never see partial files."""
+    path = cache_path(stage, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
@@ -1,18 +1,224 @@
+import hashlib
 import json
+import math
 import os
+import re
 import uuid
 
+from utils import iter_jsonl
+
+# Bump whenever chunk layout or content changes so cached chunks are rebuilt.
+CHUNKER_VERSION = "3"
+
+# Chunk IDs are uuid5 names under this namespace. Never change it: every
+# indexed point would get a new ID and re-ingestion would duplicate the act.
+CHUNK_ID_NAMESPACE = uuid.UUID("6f1c2a54-3d0e-4b8f-9a5e-2c7d1e8b4f60")
+
+
+def make_chunk_id(act, original_id, occurrence=0, part=None):
+    """Stable point ID for a section of an act.
+
+    ``occurrence`` disambiguates sections that share Part/Chapter/Section IDs
+    within one document (e.g. a repeated section number in a schedule), and
+    ``part`` identifies a child chunk of a section that had to be split.
+    """
+    name = f"{act}:{original_id}"
+    if occurrence:
+        name += f":{occurrence}"
+    if part is not None:
+        name += f"#{part}"
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, name))
+
+
+def content_hash(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def approx_token_count(text):
+    """Estimate tokens as 4/3 per whitespace-separated word.
+
+    Legal English averages roughly 0.75 words per sub-word token, which keeps
+    the estimate on the safe side of the embedding model's input limit.
+    """
+    return math.ceil(len(text.split()) * 4 / 3)
+
+
+def split_oversized_unit(unit, budget, count_tokens):
+    """Cut a single unit that exceeds ``budget`` into word windows.
+
+    Returns ``(separator, piece)`` pairs where ``separator`` is the original
+    whitespace before the piece ("" for the first), so the pieces rejoin
+    into ``unit`` exactly.
+    """
+    words = list(re.finditer(r"\S+", unit))
+    words_per_piece = max(1, len(words) * budget // max(count_tokens(unit), 1))
+    pieces = []
+    previous_end = None
+    for i in range(0, len(words), words_per_piece):
+        start = words[i].start()
+        end = words[min(i + words_per_piece, len(words)) - 1].end()
+        separator = "" if previous_end is None else unit[previous_end:start]
+        pieces.append((separator, unit[start:end]))
+        previous_end = end
+    return pieces
+
+
+def pack_units(units, budget, overlap, count_tokens):
+    r"""Group body units into windows of at most ``budget`` tokens.
+
+    Units are sub-section/clause paragraphs, so windows always break on those
+    boundaries unless a unit alone exceeds the budget and is split at word
+    boundaries. Each window after the first repeats up to ``overlap``
+    trailing pieces of the previous one. Returns ``(pieces, overlap_count)``
+    pairs; each piece is ``(offset, separator, text)`` with ``offset`` its
+    position in ``"\n\n".join(units)`` and ``separator`` the text before it
+    there, so ``window_text`` of a window is an exact slice of that body.
+    """
+    pieces = []
+    offset = 0
+    for unit in units:
+        if count_tokens(unit) > budget:
+            parts = split_oversized_unit(unit, budget, count_tokens)
+        else:
+            parts = [("", unit)]
+        for i, (separator, text) in enumerate(parts):
+            if i == 0:
+                separator = "\n\n" if pieces else ""
+            offset += len(separator)
+            pieces.append((offset, separator, text))
+            offset += len(text)
+
+    windows = []
+    current, carried, used = [], 0, 0
+    for piece in pieces:
+        tokens = count_tokens(piece[2])
+        if current and used + tokens > budget and len(current) > carried:
+            windows.append((current, carried))
+            tail = current[len(current) - overlap :] if overlap else []
+            # Only carry the overlap if it leaves room for the next piece.
+            while tail and sum(count_tokens(p[2]) for p in tail) + tokens > budget:
+                tail = tail[1:]
+            current, carried = list(tail), len(tail)
+            used = sum(count_tokens(p[2]) for p in current)
+        current.append(piece)
+        used += tokens
+    if current:
+        windows.append((current, carried))
+    return windows
+
+
+def window_text(pieces):
+    """Join a window's pieces with the separators they had in the section."""
+    return pieces[0][2] + "".join(separator + text for _, separator, text in pieces[1:])
+
+
+def write_chunks_jsonl(chunks, output_file):
+    """Write chunks one JSON object per line; returns the number written."""
+    count = 0
+    for _ in tee_chunks_jsonl(chunks, output_file):
+        count += 1
+    return count
+
+
+def tee_chunks_jsonl(chunks, output_file):
+    """Yield chunks unchanged while writing each one to a JSONL file.
+
+    Lets a streaming pipeline persist chunks without buffering them.
+    """
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    with open(output_file, "w", encoding="utf-8") as f:
+        for chunk in chunks:
+            f.write(json.dumps(chunk, ensure_ascii=False))
+            f.write("\n")
+            yield chunk
+
+
+def iter_chunks_jsonl(input_file):
+    """Lazily read chunks back from a JSONL file, one line at a time."""
+    return iter_jsonl(input_file)
+
+
+def iter_extracted_sections(input_file):
+    """Yield the sections of an extraction output file.
+
+    ``.jsonl`` files (one section per line, as the extractor CLI writes them)
+    are read lazily; a legacy ``.json`` result is loaded whole.
+    """
+    if input_file.endswith(".jsonl"):
+        yield from iter_jsonl(input_file)
+        return
+    with open(input_file, encoding="utf-8") as f:
+        yield from json.load(f).get("sections", [])
 
-def chunk_legal_sections(data=None, input_file=None, output_file=None):
-    if input_file:
-        with open(input_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
 
-    chunks = []
+def write_chunks(chunks, output_file):
+    """Write chunks as JSONL for ``.jsonl`` paths, else as a JSON list."""
+    if output_file.endswith(".jsonl"):
+        return write_chunks_jsonl(chunks, output_file)
+    chunks = list(chunks)
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(chunks, f, indent=2, ensure_ascii=False)
+    return len(chunks)
 
-    for section in data.get("sections", []):
-        chunk_id = str(uuid.uuid4())
-        original_id = f"{section.get('PartID', 'None')}_{section.get('ChapterID', 'None')}_{section.get('SectionID', 'None')}"
+
+def section_body_units(section):
+    """Paragraphs of a section's body: description, clauses and sub-sections."""
+    units = []
+    if section.get("Description", "").strip():
+        units.append(section["Description"].strip())
+
+    for clause in section.get("Clauses", []):
+        clause_id = clause.get("ClauseID", "NA").strip("()")
+        if clause.get("Description", "").strip():
+            units.append(f"Clause {clause_id}: {clause['Description'].strip()}")
+
+    for sub in section.get("Sub-sections", []):
+        sub_id = sub.get("Sub-sectionID", "NA").strip("()")
+        if sub.get("Description", "").strip():
+            units.append(f"Sub-section {sub_id}: {sub['Description'].strip()}")
+
+        for clause in sub.get("Clauses", []):
+            clause_id = clause.get("ClauseID", "NA").strip("()")
+            if clause.get("Description", "").strip():
+                units.append(f"clause {clause_id}: {clause['Description'].strip()}")
+    return units
+
+
+def iter_legal_chunks(
+    sections,
+    act="default",
+    max_tokens=None,
+    overlap_units=1,
+    count_tokens=approx_token_count,
+):
+    """Yield chunks for an iterable of extracted sections, one section at a time.
+
+    Chunk IDs are derived from ``act`` and the section's Part/Chapter/Section
+    IDs, so re-chunking the same act yields the same IDs and each chunk's
+    metadata carries a ``content_hash`` for change detection.
+
+    With ``max_tokens`` set, sections longer than the budget are split at
+    sub-section/clause boundaries into child chunks that repeat the metadata
+    header, overlap by ``overlap_units`` paragraphs and record their parent
+    section's ID in ``ParentID`` along with ``ChunkIndex``/``ChunkCount``.
+    Each child's body (its content after the header) is an exact slice of
+    the parent's body starting at ``BodyOffset``, preceded there by
+    ``BodySeparator``, so the parent text can be rebuilt from its children.
+
+    ``sections`` may be a generator (e.g. ``iter_extract_from_pdf``), so
+    chunking can start before the PDF has been fully parsed.
+    """
+    seen_ids = {}
+
+    for section in sections:
+        original_id = "_".join(
+            str(section.get(key, "None"))
+            for key in ("PartID", "ChapterID", "SectionID")
+        )
+        occurrence = seen_ids.get(original_id, 0)
+        seen_ids[original_id] = occurrence + 1
+        chunk_id = make_chunk_id(act, original_id, occurrence)
 
         # === Metadata block
         metadata = {
@@ -23,6 +229,7 @@ def chunk_legal_sections(data=None, input_file=None, output_file=None):
             "SectionID": section.get("SectionID"),
             "SectionTitle": section.get("SectionTitle"),
             "OriginalID": original_id,
+            "act": act,
         }
 
         # === Add metadata context to content
@@ -34,53 +241,108 @@ def chunk_legal_sections(data=None, input_file=None, output_file=None):
             ]
         )
 
-        content_parts = [metadata_text]  # Include metadata at the top
-
-        if section.get("Description", "").strip():
-            content_parts.append(section["Description"].strip())
+        units = section_body_units(section)
+        title = (
+            f"{metadata['PartTitle']} | {metadata['ChapterTitle']} | "
+            f"Section {metadata['SectionID']} - {metadata['SectionTitle']}"
+        )
+        content = "\n\n".join([metadata_text, *units])  # Metadata at the top
 
-        for clause in section.get("Clauses", []):
-            clause_id = clause.get("ClauseID", "NA").strip("()")
-            if clause.get("Description", "").strip():
-                content_parts.append(
-                    f"Clause {clause_id}: {clause['Description'].strip()}"
-                )
-
-        for sub in section.get("Sub-sections", []):
-            sub_id = sub.get("Sub-sectionID", "NA").strip("()")
-            if sub.get("Description", "").strip():
-                content_parts.append(
-                    f"Sub-section {sub_id}: {sub['Description'].strip()}"
-                )
-
-            for clause in sub.get("Clauses", []):
-                clause_id = clause.get("ClauseID", "NA").strip("()")
-                if clause.get("Description", "").strip():
-                    content_parts.append(
-                        f"clause {clause_id}: {clause['Description'].strip()}"
-                    )
-
-        if content_parts:
-            chunks.append(
-                {
-                    "id": chunk_id,
-                    "title": f"{metadata['PartTitle']} | {metadata['ChapterTitle']} | Section {metadata['SectionID']} - {metadata['SectionTitle']}",
-                    "content": "\n\n".join(content_parts),
-                    "metadata": metadata,
+        if max_tokens and count_tokens(content) > max_tokens:
+            budget = max(max_tokens - count_tokens(metadata_text), 1)
+            windows = pack_units(units, budget, overlap_units, count_tokens)
+            for index, (pieces, carried) in enumerate(windows):
+                child_content = "\n\n".join([metadata_text, window_text(pieces)])
+                child_metadata = {
+                    **metadata,
+                    "ParentID": chunk_id,
+                    "ParentTitle": title,
+                    "ChunkIndex": index,
+                    "ChunkCount": len(windows),
+                    "OverlapUnits": carried,
+                    "BodyOffset": pieces[0][0],
+                    "BodySeparator": pieces[0][1],
+                    "content_hash": content_hash(child_content),
                 }
-            )
+                yield {
+                    "id": make_chunk_id(act, original_id, occurrence, index),
+                    "title": f"{title} (part {index + 1}/{len(windows)})",
+                    "content": child_content,
+                    "metadata": child_metadata,
+                }
+            continue
+
+        metadata["content_hash"] = content_hash(content)
+        yield {
+            "id": chunk_id,
+            "title": title,
+            "content": content,
+            "metadata": metadata,
+        }
+
+
+def chunk_legal_sections(
+    data=None,
+    input_file=None,
+    output_file=None,
+    act="default",
+    max_tokens=None,
+    overlap_units=1,
+    count_tokens=approx_token_count,
+):
+    """Chunk every section of an extraction result and return the list.
+
+    See ``iter_legal_chunks`` for the chunking rules; use it directly to
+    process chunks as a stream. ``output_file`` is written as JSONL when it
+    ends in ``.jsonl``.
+    """
+    if input_file:
+        sections = iter_extracted_sections(input_file)
+    else:
+        sections = data.get("sections", [])
+
+    chunks = list(
+        iter_legal_chunks(
+            sections,
+            act=act,
+            max_tokens=max_tokens,
+            overlap_units=overlap_units,
+            count_tokens=count_tokens,
+        )
+    )
 
     if output_file:
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(chunks, f, indent=2, ensure_ascii=False)
+        write_chunks(chunks, output_file)
 
     print(f"✅ Chunked {len(chunks)} items into '{output_file}'")
-    print(chunks)
     return chunks
 
 
+def chunk_file(
+    input_file,
+    output_file,
+    act="default",
+    max_tokens=None,
+    overlap_units=1,
+    count_tokens=approx_token_count,
+):
+    """Stream an extraction output file into a JSONL chunk file.
+
+    Neither the sections nor the chunks are held in memory. Returns the
+    number of chunks written.
+    """
+    chunks = iter_legal_chunks(
+        iter_extracted_sections(input_file),
+        act=act,
+        max_tokens=max_tokens,
+        overlap_units=overlap_units,
+        count_tokens=count_tokens,
+    )
+    return write_chunks_jsonl(chunks, output_file)
+
+
 if __name__ == "__main__":
-    input_path = "extraction/test_extraction.json"
-    output_path = "extraction/criminal_code_chunked_with_metadata.json"
-    chunk_legal_sections(input_file=input_path, output_file=output_path)
+    input_path = "extraction/test_extraction.jsonl"
+    output_path = "extraction/criminal_code_chunked_with_metadata.jsonl"
+    count = chunk_file(input_path, output_path)
+    print(f"✅ Chunked {count} items into '{output_path}'")
@@ -1,12 +1,31 @@
 import json
 import os
 import time
+from itertools import islice
 
 import google.generativeai as genai
+from chunks import iter_chunks_jsonl
 from dotenv import load_dotenv
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, PointStruct, VectorParams
+from qdrant_client.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Distance,
+    FieldCondition,
+    Filter,
+    HnswConfigDiff,
+    MatchValue,
+    PayloadSchemaType,
+    PointIdsList,
+    PointStruct,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    VectorParams,
+)
+from rag_pipeline.bm25 import build_collection_index
+from rag_pipeline.embed import get_embedder
 from rag_pipeline.logger_config import get_logger
+from rag_pipeline.vector_store import get_vector_store
 from tqdm import tqdm
 
 load_dotenv()
@@ -14,19 +33,38 @@ load_dotenv()
 # Set up logging
 logger = get_logger(__name__)
 
+# Collection storage settings, applied when a collection is created.
+# "scalar" (int8, ~4x smaller) or "binary" (1 bit/dim, ~32x smaller) quantization
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "")
+# Keep quantized vectors in RAM even when the originals are on disk
+QUANTIZATION_ALWAYS_RAM = os.getenv("QUANTIZATION_ALWAYS_RAM", "true").lower() == "true"
+VECTORS_ON_DISK = os.getenv("VECTORS_ON_DISK", "false").lower() == "true"
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCT = int(os.getenv("HNSW_EF_CONSTRUCT", "100"))
 
-# Load chunks from JSON
+
+# Lazily load chunks from JSONL (or a legacy JSON list), validating each one
 def load_chunks(path):
-    with open(path, encoding="utf-8") as f:
-        chunks = json.load(f)
-    if not isinstance(chunks, list):
-        raise ValueError("Chunked JSON file must contain a list of chunks")
+    if path.endswith(".jsonl"):
+        chunks = iter_chunks_jsonl(path)
+    else:
+        with open(path, encoding="utf-8") as f:
+            chunks = json.load(f)
+        if not isinstance(chunks, list):
+            raise ValueError("Chunked JSON file must contain a list of chunks")
     for chunk in chunks:
         if not all(key in chunk for key in ["id", "content", "metadata", "title"]):
             raise ValueError(
                 f"Chunk missing required fields (id, content, metadata, title): {chunk}"
             )
-    return chunks
+        yield chunk
+
+
+# Group an iterable into lists of at most batch_size items
+def batched(iterable, batch_size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
 
 
 # Load Gemini embedding model
@@ -35,31 +73,144 @@ def load_embedder_gemini(api_key):
     return True
 
 
-# Embed a single chunk with Gemini
-def embed_with_gemini(text, model):
-    response = genai.embed_content(
-        model="models/embedding-001", content=text, task_type="RETRIEVAL_DOCUMENT"
+# Embed a single chunk with the collection's embedder (Gemini by default);
+# use embed_chunks for many
+def embed_with_gemini(text, collection=None):
+    return get_embedder(collection).embed_documents([text])[0]
+
+
+# Set chunk["vector"] (a float32 row) on every chunk with the collection's embedder
+def embed_chunks(chunks, collection=None, progress=None):
+    vectors = get_embedder(collection).embed_documents(
+        (chunk["content"] for chunk in chunks), progress=progress
     )
-    return response["embedding"]
+    for chunk, vector in zip(chunks, vectors, strict=True):
+        chunk["vector"] = vector
+    return chunks
+
+
+# Connect to Qdrant; the collection is only created when vector_dim is known
+def connect_qdrant(api_key, url, collection_name, vector_dim=None):
+    client = get_vector_store(url=url, api_key=api_key)
+    if vector_dim:
+        ensure_collection(client, collection_name, vector_dim)
+    return client
+
 
+# Build the quantization config for VECTOR_QUANTIZATION ("", "scalar", "binary")
+def quantization_config(kind=VECTOR_QUANTIZATION):
+    if not kind:
+        return None
+    if kind == "scalar":
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8, quantile=0.99, always_ram=QUANTIZATION_ALWAYS_RAM
+            )
+        )
+    if kind == "binary":
+        return BinaryQuantization(
+            binary=BinaryQuantizationConfig(always_ram=QUANTIZATION_ALWAYS_RAM)
+        )
+    raise ValueError(f"Unknown vector quantization: {kind}")
 
-# Connect to Qdrant
-def connect_qdrant(api_key, url, collection_name, vector_dim):
-    logger.info(f"Connecting to Qdrant at {url}")
-    client = QdrantClient(url=url, api_key=api_key, timeout=60)
+
+def ensure_collection(
+    client,
+    collection_name,
+    vector_dim,
+    quantization=VECTOR_QUANTIZATION,
+    on_disk=VECTORS_ON_DISK,
+    hnsw_m=HNSW_M,
+    hnsw_ef_construct=HNSW_EF_CONSTRUCT,
+):
+    """Create the collection if missing.
+
+    With quantization, the original float32 vectors can live on disk
+    (``on_disk``) while the int8/binary copies stay in RAM for search, with
+    results rescored against the originals.
+    """
     if not client.collection_exists(collection_name=collection_name):
         logger.info(
-            f"Creating collection {collection_name} with vector size {vector_dim}"
+            f"Creating collection {collection_name} with vector size {vector_dim} "
+            f"(quantization={quantization or 'none'}, on_disk={on_disk})"
         )
         client.create_collection(
             collection_name=collection_name,
-            vectors_config=VectorParams(size=vector_dim, distance=Distance.COSINE),
+            vectors_config=VectorParams(
+                size=vector_dim, distance=Distance.COSINE, on_disk=on_disk
+            ),
+            hnsw_config=HnswConfigDiff(m=hnsw_m, ef_construct=hnsw_ef_construct),
+            quantization_config=quantization_config(quantization),
+        )
+        # Incremental ingestion looks up an act's points by "act", parent
+        # expansion gathers the children of a split section by "ParentID" and
+        # cited provisions are fetched by their Section/Chapter/Part IDs
+        for field_name in ("act", "ParentID", "SectionID", "ChapterID", "PartID"):
+            client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=PayloadSchemaType.KEYWORD,
+            )
+
+
+# Map point ID -> content_hash for everything already indexed for an act
+def fetch_indexed_hashes(client, collection_name, act, page_size=1000):
+    if not client.collection_exists(collection_name=collection_name):
+        return {}
+    act_filter = Filter(must=[FieldCondition(key="act", match=MatchValue(value=act))])
+    indexed = {}
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            scroll_filter=act_filter,
+            limit=page_size,
+            offset=offset,
+            with_payload=["content_hash"],
+            with_vectors=False,
+        )
+        for point in points:
+            indexed[str(point.id)] = (point.payload or {}).get("content_hash")
+        if offset is None:
+            return indexed
+
+
+# Split chunks into new/changed ones and IDs of sections that disappeared
+def plan_incremental_update(chunks, indexed):
+    changed = [
+        chunk
+        for chunk in chunks
+        if indexed.get(chunk["id"]) != chunk["metadata"]["content_hash"]
+    ]
+    current_ids = {chunk["id"] for chunk in chunks}
+    removed = [point_id for point_id in indexed if point_id not in current_ids]
+    return changed, removed
+
+
+def delete_points(client, collection_name, point_ids, batch_size=1000):
+    logger.info(f"Deleting {len(point_ids)} stale points from {collection_name}")
+    for i in range(0, len(point_ids), batch_size):
+        client.delete(
+            collection_name=collection_name,
+            points_selector=PointIdsList(points=point_ids[i : i + batch_size]),
         )
-    return client
 
 
 # Upload chunks to Qdrant
-def upload_chunks(client, collection_name, chunks, batch_size=100, max_retries=3):
+def upload_chunks(
+    client,
+    collection_name,
+    chunks,
+    batch_size=100,
+    max_retries=3,
+    progress=None,
+    ordering=None,
+    wait=True,
+):
+    """Upsert chunks in batches; ``progress(n)`` is called after each batch.
+
+    ``ordering`` and ``wait`` are passed through to Qdrant's upsert.
+    """
     logger.info(f"Uploading {len(chunks)} chunks to collection {collection_name}")
     for i in range(0, len(chunks), batch_size):
         batch = chunks[i : i + batch_size]
@@ -80,7 +231,12 @@ def upload_chunks(client, collection_name, chunks, batch_size=100, max_retries=3
                 logger.info(
                     f"Uploading batch {i // batch_size + 1} ({len(points)} points)"
                 )
-                client.upsert(collection_name=collection_name, points=points)
+                client.upsert(
+                    collection_name=collection_name,
+                    points=points,
+                    wait=wait,
+                    ordering=ordering,
+                )
                 break
             except Exception as e:
                 logger.error(
@@ -89,39 +245,42 @@ def upload_chunks(client, collection_name, chunks, batch_size=100, max_retries=3
                 if attempt + 1 == max_retries:
                     raise
                 time.sleep(2**attempt)  # Exponential backoff
+        if progress:
+            progress(len(points))
     logger.info("Upload complete")
 
 
 # Main pipeline
 def main():
-    chunked_path = "./extraction/criminal_code_chunked_with_all.json"
+    # Written by chunks.py; JSONL is read one chunk at a time
+    chunked_path = "./extraction/criminal_code_chunked_with_metadata.jsonl"
     gemini_api_key = os.getenv("GEMINI_API_KEY")
     qdrant_api_key = os.getenv("QDRANT_API_KEY")
     qdrant_url = os.getenv("QDRANT_URL")
     collection = "test_criminal_civil_code"
 
+    # pipeline builds on this module's helpers, so import it lazily
+    from pipeline import IngestionPipeline
+
     try:
+        # Chunks are streamed from disk through the loading, embedding and
+        # upsert stages concurrently, so memory use does not grow with the
+        # size of the corpus and neither Gemini nor Qdrant sits idle.
         chunks = load_chunks(chunked_path)
-        logger.info(f"Loaded {len(chunks)} chunks from {chunked_path}")
-
-        model = load_embedder_gemini(gemini_api_key)
-        logger.info("Embedding chunks with Gemini...")
-
-        embedded = []
-        for chunk in tqdm(chunks, desc="Embedding"):
-            vec = embed_with_gemini(chunk["content"], model)
-            chunk["vector"] = vec
-            embedded.append(chunk)
+        logger.info(f"Streaming chunks from {chunked_path}")
 
+        load_embedder_gemini(gemini_api_key)
         logger.info("Connecting to Qdrant...")
-        client = connect_qdrant(
-            qdrant_api_key, qdrant_url, collection, len(embedded[0]["vector"])
-        )
+        client = connect_qdrant(qdrant_api_key, qdrant_url, collection)
 
-        logger.info("Uploading to Qdrant...")
-        upload_chunks(client, collection, embedded)
+        progress = tqdm(desc="Uploading", unit="chunk")
+        stats = IngestionPipeline(
+            client, collection, upsert_progress=progress.update
+        ).run(chunks)
+        progress.close()
+        build_collection_index(client, collection)
 
-        logger.info("✅ Done!")
+        logger.info(f"✅ Done! Uploaded {stats['upsert']['items']} chunks")
     except Exception as e:
         logger.error(f"Pipeline failed: {e}")
         raise
@@ -1,352 +1,417 @@
+import argparse
+import math
 import os
 import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import pdfplumber
 from patterns import (
-    chapter_pattern,
-    metadata_key_pattern,
-    metadata_pattern,
-    page_number_pattern,
-    part_pattern,
-    preamble_start_pattern,
-    section_like_pattern,
-    section_pattern,
-    subclause_pattern,
+    CHAPTER,
+    CLAUSE,
+    CONTINUATION,
+    METADATA,
+    METADATA_KEY,
+    PAGE_NUMBER,
+    PART,
+    PREAMBLE,
+    SECTION,
+    SUB_SECTION,
+    classify_line,
     subsection_pattern,
 )
-from utils import flush_section, is_title_complete, reset_state, write_output
-
-
-def extract_from_pdf(pdf_path, output_path=None):
-    # State dictionary
-    state = {
-        "metadata": [],
-        "sections": [],
-        "current_part": None,
-        "current_part_title": None,
-        "current_chapter": None,
-        "current_chapter_title": None,
-        "current_section": None,
-        "current_section_title": "",
-        "current_description": "",
-        "current_clauses": [],
-        "subsections": [],
-        "current_subsection": None,
-        "in_table_of_contents": True,
-        "title_buffer": [],
-        "awaiting_title_completion": False,
-        "in_subsection_description": False,
-        "in_explanation": False,
-        "last_subsection_number": 0,
-        "in_clause_context": False,
-    }
-    current_meta_key = None
+from utils import (
+    Clause,
+    flush_section,
+    is_title_complete,
+    new_state,
+    reset_state,
+    write_jsonl,
+    write_output,
+)
 
-    try:
-        if not os.path.exists(pdf_path):
-            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
-
-        with pdfplumber.open(pdf_path) as pdf:
-            lines = [
-                line.strip()
-                for page in pdf.pages
-                for line in page.extract_text().split("\n")
-                if page.extract_text()
-            ]
-
-            next_is_part_title = next_is_chapter_title = in_preamble = False
-            preamble_lines = []
-
-            for line in lines:
-                if not line or page_number_pattern.match(line):
-                    continue
-
-                # Check for metadata key lines (no value yet)
-                if key_match := metadata_key_pattern.match(line):
-                    current_meta_key = key_match.group(1)
-                    continue
-
-                # If previous line was a metadata key, this is its value
-                if current_meta_key:
-                    state["metadata"].append(
-                        {current_meta_key.replace(" ", "_").lower(): line.strip()}
-                    )
-                    current_meta_key = None
-                    continue
+# Bump whenever a change to the state machine alters extraction output, so
+# cached extractions of previously uploaded PDFs are not reused.
+EXTRACTOR_VERSION = "1"
 
-                if meta := metadata_pattern.match(line):
-                    state["metadata"].append(
-                        {meta.group(1).replace(" ", "_").lower(): meta.group(2).strip()}
-                    )
-                    continue
-
-                if state["in_table_of_contents"]:
-                    if (
-                        preamble_start_pattern.match(line)
-                        or part_pattern.match(line)
-                        or chapter_pattern.match(line)
-                    ):
-                        state["in_table_of_contents"] = False
-                    else:
-                        continue
-
-                if preamble_start_pattern.match(line):
-                    in_preamble = True
-                    preamble_lines.append(line)
-                    continue
-                elif in_preamble:
-                    if part_pattern.match(line) or chapter_pattern.match(line):
-                        state["sections"].append(
-                            {
-                                "PartID": None,
-                                "PartTitle": None,
-                                "ChapterID": None,
-                                "ChapterTitle": None,
-                                "SectionID": "Preamble",
-                                "SectionTitle": "Preamble",
-                                "Description": " ".join(preamble_lines).strip(),
-                            }
-                        )
-                        in_preamble = False
-                        preamble_lines = []
-                    else:
-                        preamble_lines.append(line)
-                        continue
-
-                if match := part_pattern.match(line):
-                    flush_section(state)
-                    reset_state(state, "part")
-                    state["current_part"] = f"Part-{match.group(1)}"
-                    next_is_part_title = True
-                    continue
-                if next_is_part_title:
-                    state["current_part_title"] = line
-                    next_is_part_title = False
-                    continue
-
-                if match := chapter_pattern.match(line):
-                    flush_section(state)
-                    reset_state(state, "chapter")
-                    state["current_chapter"] = f"Chapter-{match.group(1)}"
-                    next_is_chapter_title = True
-                    continue
-                if next_is_chapter_title:
-                    state["current_chapter_title"] = line.strip()
-                    next_is_chapter_title = False
-                    continue
-
-                if match := section_pattern.match(line):
-                    flush_section(state)
-                    reset_state(state, "section")
-                    state["current_section"] = f"{match.group(1)}."
-                    state["current_section_title"] = match.group(2).strip()
-                    raw_text = match.group(3).strip() if match.group(3) else ""
-                    state["title_buffer"] = [state["current_section_title"]]
-                    state["awaiting_title_completion"] = not is_title_complete(line)
-
-                    if first_sub := subsection_pattern.match(raw_text):
-                        state["current_subsection"] = {
-                            "Sub-sectionID": f"({first_sub.group(1)})",
-                            "Description": first_sub.group(2).strip(),
-                            "Clauses": [],
-                        }
-                        state["subsections"].append(state["current_subsection"])
-                        state["last_subsection_number"] = int(first_sub.group(1))
-                    else:
-                        state["current_description"] = raw_text
-                    continue
-
-                if (
-                    state["current_section"]
-                    and state["awaiting_title_completion"]
-                    and not any(
-                        p.match(line)
-                        for p in [
-                            subsection_pattern,
-                            subclause_pattern,
-                            section_like_pattern,
-                            part_pattern,
-                            chapter_pattern,
-                        ]
-                    )
-                ):
-                    parts = line.split(":", 1)
-                    state["title_buffer"].append(parts[0].strip())
-                    state["current_section_title"] = " ".join(
-                        state["title_buffer"]
-                    ).strip()
-                    if is_title_complete(line):
-                        state["awaiting_title_completion"] = False
-                        if len(parts) > 1 and parts[1].strip():
-                            if sub_match := subsection_pattern.match(parts[1].strip()):
-                                state["current_subsection"] = {
-                                    "Sub-sectionID": f"({sub_match.group(1)})",
-                                    "Description": sub_match.group(2).strip(),
-                                    "Clauses": [],
-                                }
-                                state["subsections"].append(state["current_subsection"])
-                                state["last_subsection_number"] = int(
-                                    sub_match.group(1)
-                                )
-                            else:
-                                state["current_description"] = parts[1].strip()
-                    continue
-
-                if match := subclause_pattern.match(line):
-                    clause = {
-                        "ClauseID": f"({match.group(1)})",
-                        "Description": match.group(2).strip(),
-                    }
-                    (
-                        state["current_subsection"]["Clauses"]
-                        if state["current_subsection"]
-                        else state["current_clauses"]
-                    ).append(clause)
-                    state["awaiting_title_completion"] = False
-                    state["in_subsection_description"] = True
-                    state["in_explanation"] = False
-                    state["in_clause_context"] = True
-                    continue
-
-                # Explanation
-                if "Explanation:" in line:
-                    state["in_explanation"] = True
-                    state["in_clause_context"] = False
-                    explanation_text = line.strip()
-                    if state["current_subsection"] and state["current_subsection"].get(
-                        "Clauses"
-                    ):
-                        state["current_subsection"]["Clauses"][-1]["Description"] += (
-                            " " + explanation_text
-                        )
-                    elif state["current_clauses"]:
-                        state["current_clauses"][-1]["Description"] += (
-                            " " + explanation_text
-                        )
-                    elif state["current_subsection"]:
-                        state["current_subsection"]["Description"] += (
-                            " " + explanation_text
-                        )
-                    elif state["current_section"]:
-                        state["current_description"] += " " + explanation_text
-                    continue
-
-                # Sub-section or bullet point
-                if match := subsection_pattern.match(line):
-                    subsection_number = int(match.group(1))
-                    subsection_text = match.group(2).strip()
-
-                    if state["in_explanation"]:
-                        # Stop explanation if this is long or looks like a new sub-section
-                        if (
-                            len(subsection_text.split()) > 12
-                            or subsection_text[0].isupper()
-                        ):
-                            state["in_explanation"] = False
-                        else:
-                            if state["current_subsection"] and state[
-                                "current_subsection"
-                            ].get("Clauses"):
-                                state["current_subsection"]["Clauses"][-1][
-                                    "Description"
-                                ] += f" ({subsection_number}) {subsection_text}"
-                            elif state["current_clauses"]:
-                                state["current_clauses"][-1]["Description"] += (
-                                    f" ({subsection_number}) {subsection_text}"
-                                )
-                            elif state["current_subsection"]:
-                                state["current_subsection"]["Description"] += (
-                                    f" ({subsection_number}) {subsection_text}"
-                                )
-                            continue
-
-                    # If we're in a clause, these are just nested points
-                    if state["in_clause_context"] and state["current_clauses"]:
-                        state["current_clauses"][-1]["Description"] += (
-                            f" ({subsection_number}) {subsection_text}"
-                        )
-                        continue
-
-                    # Otherwise start a real new sub-section
-                    state["in_explanation"] = False
-                    state["in_clause_context"] = False
-                    if subsection_number > state["last_subsection_number"]:
-                        state["current_subsection"] = {
-                            "Sub-sectionID": f"({match.group(1)})",
-                            "Description": subsection_text,
-                            "Clauses": [],
-                        }
-                        state["subsections"].append(state["current_subsection"])
-                        state["last_subsection_number"] = subsection_number
-                        state["awaiting_title_completion"] = False
-                        state["in_subsection_description"] = True
-                    else:
-                        (
-                            state["current_subsection"]
-                            or {"Description": state["current_description"]}
-                        )["Description"] += " " + line
-                    continue
-
-                if section_like_pattern.match(line):
-                    flush_section(state)
-                    match = section_pattern.match(line) or section_like_pattern.match(
-                        line
-                    )
-                    state["current_section"] = f"{match.group(1)}."
-                    state["current_section_title"] = (
-                        line[len(state["current_section"]) :].rstrip(":").strip()
-                    )
-                    reset_state(state, "section")
-                    continue
-
-                # Continuation lines
-                if state["in_explanation"]:
-                    if state["current_subsection"] and state["current_subsection"].get(
-                        "Clauses"
-                    ):
-                        state["current_subsection"]["Clauses"][-1]["Description"] += (
-                            " " + line
-                        )
-                    elif state["current_clauses"]:
-                        state["current_clauses"][-1]["Description"] += " " + line
-                    elif state["current_subsection"]:
-                        state["current_subsection"]["Description"] += " " + line
-                    elif state["current_section"]:
-                        state["current_description"] += " " + line
-                    continue
-
-                if state["current_subsection"] and state["current_subsection"].get(
-                    "Clauses"
-                ):
-                    state["current_subsection"]["Clauses"][-1]["Description"] += (
-                        " " + line
+
+def iter_page_lines(pdf):
+    """Yield stripped text lines one page at a time.
+
+    Each page's text is extracted exactly once and the page's layout cache is
+    released before moving on, so only the current page is held in memory.
+    """
+    for page in pdf.pages:
+        text = page.extract_text()
+        page.close()
+        if not text:
+            continue
+        for line in text.split("\n"):
+            yield line.strip()
+
+
+def extract_page_range(pdf_path, start, stop):
+    """Return the raw text of pages ``start`` to ``stop - 1`` (0-based).
+
+    Runs inside a worker process, so it opens its own handle on the PDF and
+    only builds the pages it was asked for.
+    """
+    with pdfplumber.open(pdf_path, pages=range(start + 1, stop + 1)) as pdf:
+        texts = []
+        for page in pdf.pages:
+            texts.append(page.extract_text())
+            page.close()
+        return texts
+
+
+def iter_page_lines_parallel(pdf_path, workers, pages_per_task=None):
+    """Yield stripped text lines in page order, extracting pages in a pool.
+
+    The document is split into contiguous page ranges that are extracted by
+    ``workers`` processes. Results are consumed strictly in submission order
+    and at most ``2 * workers`` ranges are in flight, so the merged stream is
+    identical to ``iter_page_lines`` while memory stays bounded.
+    """
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+    if not pages_per_task:
+        pages_per_task = max(1, math.ceil(page_count / (workers * 4)))
+    ranges = [
+        (start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    ]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for start, stop in ranges:
+            pending.append(executor.submit(extract_page_range, pdf_path, start, stop))
+            if len(pending) >= 2 * workers:
+                yield from split_page_texts(pending.popleft().result())
+        while pending:
+            yield from split_page_texts(pending.popleft().result())
+
+
+def split_page_texts(texts):
+    for text in texts:
+        if not text:
+            continue
+        for line in text.split("\n"):
+            yield line.strip()
+
+
+def process_line(state, line):
+    """Advance the section state machine by a single line."""
+    if not line:
+        return
+    kind, match = classify_line(line)
+    if kind == PAGE_NUMBER:
+        return
+
+    # Check for metadata key lines (no value yet)
+    if kind == METADATA_KEY:
+        state["current_meta_key"] = match.group(1)
+        return
+
+    # If previous line was a metadata key, this is its value
+    if state["current_meta_key"]:
+        state["metadata"].append(
+            {state["current_meta_key"].replace(" ", "_").lower(): line.strip()}
+        )
+        state["current_meta_key"] = None
+        return
+
+    if kind == METADATA:
+        state["metadata"].append(
+            {match.group(1).replace(" ", "_").lower(): match.group(2).strip()}
+        )
+        return
+
+    if state["in_table_of_contents"]:
+        if kind in (PREAMBLE, PART, CHAPTER):
+            state["in_table_of_contents"] = False
+        else:
+            return
+
+    if kind == PREAMBLE:
+        state["in_preamble"] = True
+        state["preamble_lines"].append(line)
+        return
+    elif state["in_preamble"]:
+        if kind in (PART, CHAPTER):
+            state["sections"].append(
+                {
+                    "PartID": None,
+                    "PartTitle": None,
+                    "ChapterID": None,
+                    "ChapterTitle": None,
+                    "SectionID": "Preamble",
+                    "SectionTitle": "Preamble",
+                    "Description": " ".join(state["preamble_lines"]).strip(),
+                }
+            )
+            state["in_preamble"] = False
+            state["preamble_lines"] = []
+        else:
+            state["preamble_lines"].append(line)
+            return
+
+    if kind == PART:
+        flush_section(state)
+        reset_state(state, "part")
+        state["current_part"] = f"Part-{match.group(1)}"
+        state["next_is_part_title"] = True
+        return
+    if state["next_is_part_title"]:
+        state["current_part_title"] = line
+        state["next_is_part_title"] = False
+        return
+
+    if kind == CHAPTER:
+        flush_section(state)
+        reset_state(state, "chapter")
+        state["current_chapter"] = f"Chapter-{match.group(1)}"
+        state["next_is_chapter_title"] = True
+        return
+    if state["next_is_chapter_title"]:
+        state["current_chapter_title"] = line.strip()
+        state["next_is_chapter_title"] = False
+        return
+
+    section = state["section"]
+    if kind == SECTION:
+        flush_section(state)
+        reset_state(state, "section")
+        section = state["section"]
+        section.section_id = f"{match.group(1)}."
+        section.title = match.group(2).strip()
+        raw_text = match.group(3).strip() if match.group(3) else ""
+        section.title_buffer = [section.title]
+        state["awaiting_title_completion"] = not is_title_complete(line)
+
+        if first_sub := subsection_pattern.match(raw_text):
+            section.start_subsection(
+                f"({first_sub.group(1)})", first_sub.group(2).strip()
+            )
+            state["last_subsection_number"] = int(first_sub.group(1))
+        else:
+            section.set_description(raw_text)
+        return
+
+    if (
+        section.section_id
+        and state["awaiting_title_completion"]
+        and kind == CONTINUATION
+    ):
+        parts = line.split(":", 1)
+        section.title_buffer.append(parts[0].strip())
+        section.title = " ".join(section.title_buffer).strip()
+        if is_title_complete(line):
+            state["awaiting_title_completion"] = False
+            if len(parts) > 1 and parts[1].strip():
+                if sub_match := subsection_pattern.match(parts[1].strip()):
+                    section.start_subsection(
+                        f"({sub_match.group(1)})", sub_match.group(2).strip()
                     )
-                elif state["current_subsection"]:
-                    state["current_subsection"]["Description"] += " " + line
-                elif state["current_clauses"]:
-                    state["current_clauses"][-1]["Description"] += " " + line
-                elif state["current_section"]:
-                    state["current_description"] += " " + line
-                    state["awaiting_title_completion"] = False
-
-            flush_section(state)
-            result = {"metadata": state["metadata"], "sections": state["sections"]}
-
-            if output_path:
-                write_output(
-                    output_path,
-                    {"metadata": state["metadata"], "sections": state["sections"]},
-                )
-                print(f"✅ JSON saved to {output_path}")
-
-            return result
+                    state["last_subsection_number"] = int(sub_match.group(1))
+                else:
+                    section.set_description(parts[1].strip())
+        return
+
+    if kind == CLAUSE:
+        clause = Clause(f"({match.group(1)})", match.group(2).strip())
+        (
+            section.current_subsection.clauses
+            if section.current_subsection
+            else section.clauses
+        ).append(clause)
+        state["awaiting_title_completion"] = False
+        state["in_subsection_description"] = True
+        state["in_explanation"] = False
+        state["in_clause_context"] = True
+        return
+
+    # Explanation
+    if "Explanation:" in line:
+        state["in_explanation"] = True
+        state["in_clause_context"] = False
+        if target := explanation_target(section):
+            target.append(line.strip())
+        return
+
+    # Sub-section or bullet point
+    if kind == SUB_SECTION:
+        subsection_number = int(match.group(1))
+        subsection_text = match.group(2).strip()
+
+        if state["in_explanation"]:
+            # Stop explanation if this is long or looks like a new sub-section
+            if len(subsection_text.split()) > 12 or subsection_text[0].isupper():
+                state["in_explanation"] = False
+            else:
+                target = explanation_target(section)
+                # Numbered points inside an explanation never attach to the
+                # section description itself.
+                if target and target is not section:
+                    target.append(f"({subsection_number}) {subsection_text}")
+                return
+
+        # If we're in a clause, these are just nested points
+        if state["in_clause_context"] and section.clauses:
+            section.clauses[-1].append(f"({subsection_number}) {subsection_text}")
+            return
+
+        # Otherwise start a real new sub-section
+        state["in_explanation"] = False
+        state["in_clause_context"] = False
+        if subsection_number > state["last_subsection_number"]:
+            section.start_subsection(f"({match.group(1)})", subsection_text)
+            state["last_subsection_number"] = subsection_number
+            state["awaiting_title_completion"] = False
+            state["in_subsection_description"] = True
+        elif section.current_subsection:
+            # Out-of-sequence numbering outside a sub-section is dropped.
+            section.current_subsection.append(line)
+        return
+
+    # Continuation lines
+    if state["in_explanation"]:
+        if target := explanation_target(section):
+            target.append(line)
+        return
+
+    current_subsection = section.current_subsection
+    if current_subsection and current_subsection.clauses:
+        current_subsection.clauses[-1].append(line)
+    elif current_subsection:
+        current_subsection.append(line)
+    elif section.clauses:
+        section.clauses[-1].append(line)
+    elif section.section_id:
+        section.append(line)
+        state["awaiting_title_completion"] = False
+
+
+def explanation_target(section):
+    """Return where explanation text attaches: the innermost open element."""
+    current_subsection = section.current_subsection
+    if current_subsection and current_subsection.clauses:
+        return current_subsection.clauses[-1]
+    if section.clauses:
+        return section.clauses[-1]
+    if current_subsection:
+        return current_subsection
+    if section.section_id:
+        return section
+    return None
+
+
+def iter_sections(lines, state=None):
+    """Feed lines through the state machine, yielding sections as they finish.
+
+    Completed sections are handed out as soon as ``flush_section`` produces
+    them instead of being accumulated, so ``state["sections"]`` never holds
+    more than the section that was just closed. Document metadata is still
+    collected in ``state["metadata"]``.
+    """
+    if state is None:
+        state = new_state()
+    for line in lines:
+        process_line(state, line)
+        if state["sections"]:
+            yield from state["sections"]
+            state["sections"].clear()
+    flush_section(state)
+    yield from state["sections"]
+    state["sections"].clear()
+
+
+def iter_extract_from_pdf(pdf_path, state=None, workers=1):
+    """Stream structured sections out of a PDF, page by page.
+
+    Pass a ``state`` from ``new_state()`` to read the document metadata once
+    the generator is exhausted. With ``workers > 1`` page text is extracted in
+    a process pool; the state machine still sees lines in page order, so the
+    sections are the same as in the serial path.
+    """
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+
+    if workers > 1:
+        yield from iter_sections(iter_page_lines_parallel(pdf_path, workers), state)
+        return
+
+    with pdfplumber.open(pdf_path) as pdf:
+        yield from iter_sections(iter_page_lines(pdf), state)
+
+
+def extract_from_pdf(pdf_path, output_path=None, workers=1):
+    try:
+        state = new_state()
+        sections = list(iter_extract_from_pdf(pdf_path, state, workers=workers))
+        result = {"metadata": state["metadata"], "sections": sections}
+
+        if output_path:
+            write_output(output_path, result)
+            print(f"✅ JSON saved to {output_path}")
+
+        return result
 
     except Exception as e:
         print(f"❌ Error: {str(e)}")
         traceback.print_exc()
 
 
+def metadata_path(output_path):
+    return os.path.splitext(output_path)[0] + ".metadata.json"
+
+
+def extract_to_jsonl(pdf_path, output_path, workers=1):
+    """Stream sections to ``output_path`` as JSONL, one section per line.
+
+    Sections are written as they are extracted, so memory does not grow with
+    the document. The metadata is only complete once every page was read, so
+    it goes to a ``.metadata.json`` file next to the output. Returns the
+    number of sections written.
+    """
+    state = new_state()
+    count = write_jsonl(
+        iter_extract_from_pdf(pdf_path, state, workers=workers), output_path
+    )
+    write_output(metadata_path(output_path), state["metadata"])
+    return count
+
+
 if __name__ == "__main__":
-    sample_path = "../data/raw/civil_code_debug.pdf"
-    result = extract_from_pdf(
-        sample_path, output_path="extraction/test_extraction.json"
+    parser = argparse.ArgumentParser(description="Extract sections from a legal PDF")
+    parser.add_argument(
+        "pdf_path", nargs="?", default="../data/raw/civil_code_debug.pdf"
     )
+    parser.add_argument(
+        "--output",
+        default="extraction/test_extraction.jsonl",
+        help="Sections are streamed to .jsonl paths; .json gets one JSON document",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used for page text extraction (default: 1)",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Also run the serial path and check both produce identical output",
+    )
+    args = parser.parse_args()
+
+    if args.output.endswith(".jsonl"):
+        count = extract_to_jsonl(args.pdf_path, args.output, workers=args.workers)
+        print(f"✅ Streamed {count} sections to {args.output}")
+    else:
+        extract_from_pdf(args.pdf_path, output_path=args.output, workers=args.workers)
+    if args.verify:
+        result = extract_from_pdf(args.pdf_path, workers=args.workers)
+        serial = extract_from_pdf(args.pdf_path, workers=1)
+        if result != serial:
+            raise SystemExit("❌ Parallel and serial extraction differ")
+        print(f"✅ Parallel ({args.workers} workers) output matches serial output")
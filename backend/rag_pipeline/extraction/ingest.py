@@ -0,0 +1,178 @@
+import os
+
+from cache import (
+    chunks_cache_key,
+    extraction_cache_key,
+    file_sha256,
+    load_cached,
+    store_cached,
+)
+from chunks import chunk_legal_sections, write_chunks
+from data_embedding import (
+    connect_qdrant,
+    delete_points,
+    fetch_indexed_hashes,
+    plan_incremental_update,
+)
+from dotenv import load_dotenv
+from extractor import iter_extract_from_pdf
+from pipeline import IngestionPipeline
+from rag_pipeline.bm25 import build_collection_index, load_collection_index
+from rag_pipeline.embedding_cache import get_embedding_cache
+from rag_pipeline.logger_config import get_logger
+from utils import new_state, write_output
+
+load_dotenv()
+logger = get_logger(__name__)
+
+# Number of processes used to extract page text; 1 keeps extraction serial.
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "1"))
+# Sections longer than this are split into overlapping child chunks.
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "1500"))
+CHUNK_OVERLAP_UNITS = int(os.getenv("CHUNK_OVERLAP_UNITS", "1"))
+COLLECTION_NAME = "test_criminal_civil_code"
+
+
+def extract_sections(job, pdf_path, extracted_path=None):
+    """Run extraction, counting sections on the job as they are produced."""
+    state = new_state()
+    sections = []
+    for section in iter_extract_from_pdf(pdf_path, state, workers=EXTRACTION_WORKERS):
+        sections.append(section)
+        job.advance()
+    data = {"metadata": state["metadata"], "sections": sections}
+    if extracted_path:
+        write_output(extracted_path, data)
+    return data
+
+
+def ingest_pdf(
+    job,
+    pdf_path,
+    *,
+    filename,
+    act,
+    extracted_path=None,
+    chunked_path=None,
+    use_cache=True,
+    incremental=False,
+    pdf_sha256=None,
+):
+    """Extract, chunk, embed and upsert one PDF, reporting progress on ``job``.
+
+    Stages are ``extract``, ``chunk``, then ``embed`` and ``upsert`` running
+    concurrently; each checks for cancellation as it advances. Pass
+    ``pdf_sha256`` when the file's hash is already known (e.g. computed while
+    the upload was spooled) to skip re-reading it.
+    """
+    pdf_sha256 = pdf_sha256 or file_sha256(pdf_path)
+    extract_key = extraction_cache_key(pdf_sha256)
+    chunk_key = chunks_cache_key(
+        extract_key,
+        act=act,
+        max_tokens=CHUNK_MAX_TOKENS,
+        overlap_units=CHUNK_OVERLAP_UNITS,
+    )
+
+    # Chunks only depend on the extraction, so a chunk-cache hit lets us skip
+    # extraction entirely unless the caller asked for the extracted JSON.
+    chunks = load_cached("chunks", chunk_key) if use_cache else None
+
+    # Step 1: Extract structured content from the PDF
+    job.start_stage("extract")
+    if chunks is None or extracted_path:
+        data = load_cached("extract", extract_key) if use_cache else None
+        if data is not None:
+            logger.info(f"Reusing cached extraction for {filename}")
+            if extracted_path:
+                write_output(extracted_path, data)
+        else:
+            logger.info(f"Extracting structured content from PDF...{filename}")
+            data = extract_sections(job, pdf_path, extracted_path)
+            if not data["sections"]:
+                raise ValueError("Failed to extract data")
+            store_cached("extract", extract_key, data)
+
+    # Step 2: Chunk the extracted sections
+    job.start_stage("chunk")
+    if chunks is not None:
+        logger.info("Reusing cached chunks")
+        if chunked_path:
+            write_chunks(chunks, chunked_path)
+    else:
+        logger.info(" Chunking extracted sections...")
+        chunks = chunk_legal_sections(
+            data,
+            output_file=chunked_path,
+            act=act,
+            max_tokens=CHUNK_MAX_TOKENS,
+            overlap_units=CHUNK_OVERLAP_UNITS,
+        )
+        if not chunks:
+            raise ValueError("No chunks produced")
+        store_cached("chunks", chunk_key, chunks)
+    job.set_total(len(chunks))
+    job.advance(len(chunks))
+    logger.info(f"Chunked {len(chunks)} sections.")
+
+    # Step 3: Connect to Qdrant and work out what needs (re)indexing
+    qdrant_api_key = os.getenv("QDRANT_API_KEY")
+    qdrant_url = os.getenv("QDRANT_URL")
+    collection = COLLECTION_NAME
+
+    logger.info(" Connecting to Qdrant...")
+    client = connect_qdrant(qdrant_api_key, qdrant_url, collection)
+
+    to_embed, removed = chunks, []
+    if incremental:
+        indexed = fetch_indexed_hashes(client, collection, act)
+        to_embed, removed = plan_incremental_update(chunks, indexed)
+        logger.info(
+            f"Incremental ingest of '{act}': {len(to_embed)} new or changed, "
+            f"{len(removed)} removed, {len(chunks) - len(to_embed)} unchanged"
+        )
+
+    # Step 4: Embed and upsert concurrently, then drop removed sections
+    throughput = update_collection(job, client, collection, to_embed, removed)
+
+    # Step 5: Rebuild the collection's BM25 index for hybrid search
+    refresh_bm25_index(job, client, collection, changed=bool(to_embed or removed))
+
+    logger.info("All done!")
+    return {
+        "status": "success",
+        "chunks_uploaded": len(to_embed),
+        "chunks_deleted": len(removed),
+        "chunks_unchanged": len(chunks) - len(to_embed),
+        "throughput": throughput,
+        "embedding_cache": get_embedding_cache().stats(),
+    }
+
+
+def update_collection(job, client, collection, to_embed, removed):
+    """Embed and upsert ``to_embed``, delete ``removed``; returns throughput."""
+    job.start_stages({"embed": len(to_embed), "upsert": len(to_embed) + len(removed)})
+    throughput = {}
+    if to_embed:
+        logger.info(" Embedding and uploading chunks...")
+        throughput = IngestionPipeline(
+            client,
+            collection,
+            embed_progress=lambda n: job.advance(n, stage="embed"),
+            upsert_progress=lambda n: job.advance(n, stage="upsert"),
+        ).run(to_embed)
+
+    if removed:
+        delete_points(client, collection, removed)
+        job.advance(len(removed), stage="upsert")
+    return throughput
+
+
+def refresh_bm25_index(job, client, collection, changed):
+    """Rebuild the BM25 index, unless nothing changed and one already exists."""
+    if not changed and load_collection_index(collection) is not None:
+        logger.info(f"No changes to '{collection}', keeping its BM25 index")
+        return
+    job.start_stage("bm25", total=1)
+    build_collection_index(client, collection)
+    job.advance()
@@ -0,0 +1,166 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from rag_pipeline.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = {SUCCEEDED, FAILED, CANCELLED}
+
+
+class JobCancelledError(Exception):
+    """Raised inside a running job once cancellation has been requested."""
+
+
+class IngestionJob:
+    """Status and per-stage progress of one background ingestion."""
+
+    def __init__(self, description=None):
+        self.id = uuid.uuid4().hex
+        self.description = description
+        self.status = QUEUED
+        self.stage = None
+        self.stages = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self.cancel_requested = threading.Event()
+        self.lock = threading.Lock()
+
+    def start_stage(self, stage, total=None):
+        """Enter ``stage``, whose progress counts up to ``total`` items."""
+        with self.lock:
+            self.stage = stage
+            self.stages[stage] = {"done": 0, "total": total}
+        self.raise_if_cancelled()
+
+    def set_total(self, total):
+        """Set the item count of the current stage once it is known."""
+        with self.lock:
+            self.stages[self.stage]["total"] = total
+
+    def start_stages(self, totals):
+        """Start several stages that run concurrently, e.g. embed and upsert."""
+        with self.lock:
+            self.stage = "+".join(totals)
+            for stage, total in totals.items():
+                self.stages[stage] = {"done": 0, "total": total}
+        self.raise_if_cancelled()
+
+    def advance(self, count=1, stage=None):
+        """Count ``count`` finished items of ``stage`` (the current one by default)."""
+        with self.lock:
+            self.stages[stage or self.stage]["done"] += count
+        self.raise_if_cancelled()
+
+    def raise_if_cancelled(self):
+        """Raise JobCancelledError if cancellation was requested."""
+        if self.cancel_requested.is_set():
+            raise JobCancelledError(f"Job {self.id} was cancelled")
+
+    def to_dict(self):
+        """Snapshot the job as JSON-serializable status."""
+        with self.lock:
+            return {
+                "job_id": self.id,
+                "description": self.description,
+                "status": self.status,
+                "stage": self.stage,
+                "progress": {name: dict(p) for name, p in self.stages.items()},
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobManager:
+    """Runs ingestion jobs on a bounded worker pool and tracks their state.
+
+    At most ``max_workers`` jobs run at once; the rest wait in the executor's
+    queue. Only the ``history_limit`` most recent finished jobs are kept.
+    """
+
+    def __init__(self, max_workers=2, history_limit=500):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ingest"
+        )
+        self.history_limit = history_limit
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, func, *args, description=None, **kwargs):
+        """Queue ``func(job, *args, **kwargs)`` and return its job right away."""
+        job = IngestionJob(description)
+        job.future = self.executor.submit(self.run, job, func, args, kwargs)
+        with self.lock:
+            self.jobs[job.id] = job
+            self.prune()
+        logger.info(f"Queued ingestion job {job.id} ({description})")
+        return job
+
+    def run(self, job, func, args, kwargs):
+        """Run one job in a worker thread, recording its outcome."""
+        with job.lock:
+            if job.cancel_requested.is_set():
+                job.status = CANCELLED
+                job.finished_at = time.time()
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+        try:
+            result = func(job, *args, **kwargs)
+            status, error = SUCCEEDED, None
+        except JobCancelledError:
+            result, status, error = None, CANCELLED, None
+            logger.info(f"Ingestion job {job.id} cancelled during {job.stage}")
+        except Exception as e:
+            result, status, error = None, FAILED, str(e)
+            logger.error(f"Ingestion job {job.id} failed during {job.stage}: {e}")
+        with job.lock:
+            job.result = result
+            job.status = status
+            job.error = error
+            job.finished_at = time.time()
+
+    def get(self, job_id):
+        """Return the job with ``job_id``, or None."""
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self):
+        """Return every tracked job."""
+        with self.lock:
+            return list(self.jobs.values())
+
+    def cancel(self, job_id):
+        """Request cancellation; running jobs stop at their next checkpoint."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_requested.set()
+        with job.lock:
+            if job.status == QUEUED and job.future.cancel():
+                job.status = CANCELLED
+                job.finished_at = time.time()
+        return job
+
+    def prune(self):
+        """Forget the oldest finished jobs beyond ``history_limit``; needs the lock."""
+        finished = sorted(
+            (job for job in self.jobs.values() if job.status in FINISHED_STATES),
+            key=lambda job: job.finished_at,
+        )
+        for job in finished[: max(len(finished) - self.history_limit, 0)]:
+            del self.jobs[job.id]
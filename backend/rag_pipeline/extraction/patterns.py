@@ -10,3 +10,46 @@ metadata_key_pattern = re.compile(r'^(Date of Authentication|Act number):$', re.
 preamble_start_pattern = re.compile(r'^Preamble:', re.I)
 page_number_pattern = re.compile(r'^\d{1,3}$')
 section_like_pattern = re.compile(r'(?<!\w)(\d+)\.\s+[^:\n]+')
+
+# === Line kinds produced by classify_line
+PAGE_NUMBER = 'page_number'
+METADATA_KEY = 'metadata_key'
+METADATA = 'metadata'
+PREAMBLE = 'preamble'
+PART = 'part'
+CHAPTER = 'chapter'
+SECTION = 'section'
+SUB_SECTION = 'sub_section'
+CLAUSE = 'clause'
+CONTINUATION = 'continuation'
+
+# Every structural pattern is anchored on a distinctive first character, so a
+# line only needs to be tried against the one or two patterns that can start
+# with it. Candidates are listed in the order the state machine gives them
+# precedence. Any decimal digit dispatches through the '0' entry.
+LINE_DISPATCH = {
+    '0': ((PAGE_NUMBER, page_number_pattern), (SECTION, section_pattern)),
+    '(': ((SUB_SECTION, subsection_pattern), (CLAUSE, subclause_pattern)),
+    'P': ((PART, part_pattern), (PREAMBLE, preamble_start_pattern)),
+    'C': ((CHAPTER, chapter_pattern),),
+    'D': ((METADATA_KEY, metadata_key_pattern), (METADATA, metadata_pattern)),
+    'A': ((METADATA_KEY, metadata_key_pattern), (METADATA, metadata_pattern)),
+}
+# The part, chapter, preamble and metadata patterns are case-insensitive.
+for letter in 'PCDA':
+    LINE_DISPATCH[letter.lower()] = LINE_DISPATCH[letter]
+
+
+def classify_line(line):
+    """Tag a stripped line with its kind in a single pass.
+
+    Returns ``(kind, match)``; ``match`` is the regex match for structural
+    kinds and None for continuation lines.
+    """
+    first = line[:1]
+    if first.isdecimal():
+        first = '0'
+    for kind, pattern in LINE_DISPATCH.get(first, ()):
+        if match := pattern.match(line):
+            return kind, match
+    return CONTINUATION, None
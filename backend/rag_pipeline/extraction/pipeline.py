@@ -0,0 +1,216 @@
+import os
+import queue
+import threading
+import time
+
+from data_embedding import batched, embed_chunks, ensure_collection, upload_chunks
+from dotenv import load_dotenv
+from qdrant_client.models import WriteOrdering
+from rag_pipeline.batch_embedding import EMBED_BATCH_SIZE, EMBED_MAX_IN_FLIGHT
+from rag_pipeline.logger_config import get_logger
+
+load_dotenv()
+logger = get_logger(__name__)
+
+# Points per upsert request and number of upserts sent in parallel.
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+UPSERT_WORKERS = int(os.getenv("UPSERT_WORKERS", "4"))
+# Qdrant write ordering: "weak", "medium" or "strong".
+UPSERT_ORDERING = os.getenv("UPSERT_ORDERING", "weak")
+# Wait for each upsert to be applied before acknowledging it.
+UPSERT_WAIT = os.getenv("UPSERT_WAIT", "true").lower() == "true"
+# Batches allowed to wait between two stages before the upstream one blocks.
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+
+_DONE = object()
+
+
+class StageStats:
+    """Items processed and time spent by one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.started = None
+        self.finished = None
+        self.lock = threading.Lock()
+
+    def record(self, items, seconds):
+        """Add ``items`` processed in ``seconds`` of work."""
+        with self.lock:
+            self.items += items
+            self.busy_seconds += seconds
+
+    def to_dict(self):
+        """Report items, busy and wall time, and throughput."""
+        if self.started is None:
+            return {
+                "items": 0,
+                "busy_seconds": 0.0,
+                "wall_seconds": 0.0,
+                "items_per_sec": 0.0,
+            }
+        wall = (self.finished or time.perf_counter()) - self.started
+        return {
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "wall_seconds": round(wall, 3),
+            "items_per_sec": round(self.items / wall, 1) if wall else 0.0,
+        }
+
+
+class IngestionPipeline:
+    """Chunk, embed and upsert concurrently, connected by bounded queues.
+
+    One thread pulls chunks from the source (which may be a generator that
+    loads or chunks lazily), one embeds groups large enough to keep every
+    in-flight embedding request busy, and ``upsert_workers`` threads upsert
+    batches of ``upsert_batch_size`` points in parallel. The collection is
+    created from the first embedded batch if needed.
+
+    ``embed_progress(n)`` and ``upsert_progress(n)`` are called as chunks get
+    through each stage; if any stage raises (including a progress callback,
+    e.g. on job cancellation), the others stop and ``run`` re-raises it.
+    """
+
+    def __init__(
+        self,
+        client,
+        collection,
+        *,
+        embed_group_size=EMBED_BATCH_SIZE * EMBED_MAX_IN_FLIGHT,
+        upsert_batch_size=UPSERT_BATCH_SIZE,
+        upsert_workers=UPSERT_WORKERS,
+        ordering=UPSERT_ORDERING,
+        wait=UPSERT_WAIT,
+        queue_size=PIPELINE_QUEUE_SIZE,
+        embed_progress=None,
+        upsert_progress=None,
+    ):
+        self.client = client
+        self.collection = collection
+        self.embed_group_size = embed_group_size
+        self.upsert_batch_size = upsert_batch_size
+        self.upsert_workers = upsert_workers
+        self.ordering = WriteOrdering(ordering) if ordering else None
+        self.wait = wait
+        self.embed_queue = queue.Queue(maxsize=queue_size)
+        self.upsert_queue = queue.Queue(maxsize=queue_size * upsert_workers)
+        self.embed_progress = embed_progress
+        self.upsert_progress = upsert_progress
+        self.stats = {name: StageStats(name) for name in ("chunk", "embed", "upsert")}
+        self.stop = threading.Event()
+        self.errors = []
+        self.collection_ready = False
+        self.collection_lock = threading.Lock()
+
+    def put(self, q, item):
+        """Put ``item`` on ``q``, giving up (returning False) once stopped."""
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, q):
+        """Take the next item from ``q``, or _DONE once stopped."""
+        while not self.stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def stage(self, name, target, *args):
+        """Run a stage body, recording its wall time and any failure."""
+        stats = self.stats[name]
+        if stats.started is None:
+            stats.started = time.perf_counter()
+        try:
+            target(*args)
+        except BaseException as e:
+            self.errors.append(e)
+            self.stop.set()
+        finally:
+            stats.finished = time.perf_counter()
+
+    def produce(self, chunks):
+        """Group chunks for the embed stage, then signal the end."""
+        iterator = batched(chunks, self.embed_group_size)
+        while True:
+            start = time.perf_counter()
+            group = next(iterator, None)
+            if group is None:
+                break
+            self.stats["chunk"].record(len(group), time.perf_counter() - start)
+            if not self.put(self.embed_queue, group):
+                return
+        self.put(self.embed_queue, _DONE)
+
+    def embed(self):
+        """Embed each group and split it into upsert batches."""
+        while (group := self.get(self.embed_queue)) is not _DONE:
+            start = time.perf_counter()
+            embed_chunks(group, self.collection, progress=self.embed_progress)
+            self.stats["embed"].record(len(group), time.perf_counter() - start)
+            for batch in batched(group, self.upsert_batch_size):
+                if not self.put(self.upsert_queue, batch):
+                    return
+        for _ in range(self.upsert_workers):
+            self.put(self.upsert_queue, _DONE)
+
+    def upsert(self):
+        """Upsert batches, creating the collection on the first one."""
+        while (batch := self.get(self.upsert_queue)) is not _DONE:
+            start = time.perf_counter()
+            if not self.collection_ready:
+                with self.collection_lock:
+                    if not self.collection_ready:
+                        dim = len(batch[0]["vector"])
+                        ensure_collection(self.client, self.collection, dim)
+                        self.collection_ready = True
+            upload_chunks(
+                self.client,
+                self.collection,
+                batch,
+                batch_size=len(batch),
+                ordering=self.ordering,
+                wait=self.wait,
+                progress=self.upsert_progress,
+            )
+            self.stats["upsert"].record(len(batch), time.perf_counter() - start)
+
+    def run(self, chunks):
+        """Push ``chunks`` through every stage; returns per-stage throughput."""
+        threads = [
+            threading.Thread(
+                target=self.stage, args=("chunk", self.produce, chunks), daemon=True
+            ),
+            threading.Thread(
+                target=self.stage, args=("embed", self.embed), daemon=True
+            ),
+        ] + [
+            threading.Thread(
+                target=self.stage, args=("upsert", self.upsert), daemon=True
+            )
+            for _ in range(self.upsert_workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self.errors:
+            raise self.errors[0]
+
+        stats = {name: stage.to_dict() for name, stage in self.stats.items()}
+        logger.info(
+            "Ingestion throughput: "
+            + ", ".join(
+                f"{name} {s['items_per_sec']}/s ({s['items']} in {s['wall_seconds']}s)"
+                for name, s in stats.items()
+            )
+        )
+        return stats
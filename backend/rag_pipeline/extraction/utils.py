@@ -1,15 +1,130 @@
 import json
 import os
 
+
+class Clause:
+    """Lettered clause of a section or sub-section, e.g. "(a) ..."."""
+
+    __slots__ = ('clause_id', 'fragments')
+
+    def __init__(self, clause_id, text):
+        self.clause_id = clause_id
+        self.fragments = [text]
+
+    def append(self, text):
+        """Add a continuation line to the clause's description."""
+        self.fragments.append(text)
+
+    def to_dict(self):
+        """Return the clause in the extracted JSON layout."""
+        return {'ClauseID': self.clause_id, 'Description': ' '.join(self.fragments)}
+
+
+class SubSection:
+    """Numbered sub-section of a section, with its own clauses."""
+
+    __slots__ = ('subsection_id', 'fragments', 'clauses')
+
+    def __init__(self, subsection_id, text):
+        self.subsection_id = subsection_id
+        self.fragments = [text]
+        self.clauses = []
+
+    def append(self, text):
+        """Add a continuation line to the sub-section's description."""
+        self.fragments.append(text)
+
+    def to_dict(self):
+        """Return the sub-section and its clauses in the extracted JSON layout."""
+        return {
+            'Sub-sectionID': self.subsection_id,
+            'Description': ' '.join(self.fragments),
+            'Clauses': [clause.to_dict() for clause in self.clauses],
+        }
+
+
+class Section:
+    """Section being assembled by the state machine.
+
+    Description text is collected as fragments and joined once in ``to_dict``
+    rather than grown with repeated string concatenation.
+    """
+
+    __slots__ = (
+        'section_id',
+        'title',
+        'title_buffer',
+        'fragments',
+        'clauses',
+        'subsections',
+        'current_subsection',
+    )
+
+    def __init__(self):
+        self.section_id = None
+        self.title = ''
+        self.title_buffer = []
+        self.fragments = []
+        self.clauses = []
+        self.subsections = []
+        self.current_subsection = None
+
+    def append(self, text):
+        """Add a line to the section's description."""
+        self.fragments.append(text)
+
+    def set_description(self, text):
+        """Replace the description collected so far with ``text``."""
+        self.fragments = [text]
+
+    def start_subsection(self, subsection_id, text):
+        """Open a new sub-section; later clauses and lines go to it."""
+        self.current_subsection = SubSection(subsection_id, text)
+        self.subsections.append(self.current_subsection)
+
+    def to_dict(self, state):
+        """Return the section, with its part and chapter from ``state``."""
+        section_data = {
+            'PartID': state['current_part'],
+            'PartTitle': state['current_part_title'],
+            'ChapterID': state['current_chapter'],
+            'ChapterTitle': state['current_chapter_title'],
+            'SectionID': self.section_id,
+            'SectionTitle': self.title.strip().rstrip(':'),
+            'Description': ' '.join(self.fragments).strip(),
+        }
+        if self.clauses:
+            section_data['Clauses'] = [clause.to_dict() for clause in self.clauses]
+        if self.subsections:
+            section_data['Sub-sections'] = [sub.to_dict() for sub in self.subsections]
+        return section_data
+
+
+def new_state():
+    return {
+        'metadata': [],
+        'sections': [],
+        'current_part': None,
+        'current_part_title': None,
+        'current_chapter': None,
+        'current_chapter_title': None,
+        'section': Section(),
+        'in_table_of_contents': True,
+        'awaiting_title_completion': False,
+        'in_subsection_description': False,
+        'in_explanation': False,
+        'last_subsection_number': 0,
+        'in_clause_context': False,
+        'current_meta_key': None,
+        'next_is_part_title': False,
+        'next_is_chapter_title': False,
+        'in_preamble': False,
+        'preamble_lines': [],
+    }
+
 def reset_state(state, level):
     if level in ['part', 'chapter', 'section']:
-        state['current_section'] = None
-        state['current_section_title'] = ''
-        state['current_description'] = ''
-        state['current_clauses'] = []
-        state['subsections'] = []
-        state['current_subsection'] = None
-        state['title_buffer'] = []
+        state['section'] = Section()
         state['awaiting_title_completion'] = False
         state['in_subsection_description'] = False
         state['in_explanation'] = False
@@ -22,21 +137,8 @@ def reset_state(state, level):
         state['current_part_title'] = ''
 
 def flush_section(state):
-    if state['current_section']:
-        section_data = {
-            'PartID': state['current_part'],
-            'PartTitle': state['current_part_title'],
-            'ChapterID': state['current_chapter'],
-            'ChapterTitle': state['current_chapter_title'],
-            'SectionID': state['current_section'],
-            'SectionTitle': state['current_section_title'].strip().rstrip(':'),
-            'Description': state['current_description'].strip()
-        }
-        if state['current_clauses']:
-            section_data['Clauses'] = state['current_clauses'].copy()
-        if state['subsections']:
-            section_data['Sub-sections'] = state['subsections'].copy()
-        state['sections'].append(section_data)
+    if state['section'].section_id:
+        state['sections'].append(state['section'].to_dict(state))
 
 def is_title_complete(line):
     return ':' in line or line.endswith(':')
@@ -44,4 +146,22 @@ def is_title_complete(line):
 def write_output(path, data):
     os.makedirs(os.path.dirname(path), exist_ok=True)
     with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
\ No newline at end of file
+        json.dump(data, f, ensure_ascii=False, indent=4)
+
+def write_jsonl(records, path):
+    """Write records one JSON object per line; returns the number written."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write('\n')
+            count += 1
+    return count
+
+def iter_jsonl(path):
+    """Lazily read records back from a JSONL file, one line at a time."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,199 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+import httpx
+from dotenv import load_dotenv
+from rag_pipeline.logger_config import get_logger
+
+load_dotenv()
+logger = get_logger(__name__)
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+# Seconds to wait for a generation, and for a connection to Ollama
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "120"))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+# Pooled keep-alive connections shared by every call
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "16"))
+# Requests in flight per model; Ollama queues anything beyond its
+# OLLAMA_NUM_PARALLEL anyway, so waiting here keeps timeouts meaningful.
+OLLAMA_MODEL_CONCURRENCY = int(os.getenv("OLLAMA_MODEL_CONCURRENCY", "4"))
+# Recent calls per model kept for latency percentiles
+LLM_LATENCY_WINDOW = 1000
+
+
+class LatencyStats:
+    """Call counts and latencies of one model."""
+
+    def __init__(self, window=LLM_LATENCY_WINDOW):
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.waiting = 0
+        self.total_seconds = 0.0
+        self.recent = deque(maxlen=window)
+        self.recent_waits = deque(maxlen=window)
+
+    def record(self, seconds, waited, ok):
+        """Add one finished call and how long it waited for a slot."""
+        self.calls += 1
+        self.errors += not ok
+        self.total_seconds += seconds
+        self.recent.append(seconds)
+        self.recent_waits.append(waited)
+
+    def to_dict(self):
+        """Summarize calls, errors, queue depth and latency percentiles."""
+        latencies = sorted(self.recent)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "mean_seconds": round(self.total_seconds / self.calls, 3)
+            if self.calls
+            else 0.0,
+            "p50_seconds": percentile(0.5),
+            "p95_seconds": percentile(0.95),
+            "max_wait_seconds": round(max(self.recent_waits, default=0.0), 3),
+        }
+
+
+class OllamaClient:
+    """Async Ollama client with a pooled connection and per-model limits.
+
+    The ``httpx.AsyncClient`` and its connection pool live on one event loop
+    in a background thread, so they are shared by async callers on any loop
+    (``generate``) and by sync callers in worker threads (``generate_sync``).
+    At most ``model_concurrency`` requests per model are in flight; the rest
+    wait on that model's semaphore.
+    """
+
+    def __init__(
+        self,
+        base_url=OLLAMA_URL,
+        timeout=OLLAMA_TIMEOUT,
+        connect_timeout=OLLAMA_CONNECT_TIMEOUT,
+        max_connections=OLLAMA_MAX_CONNECTIONS,
+        model_concurrency=OLLAMA_MODEL_CONCURRENCY,
+    ):
+        self.base_url = base_url
+        self.model_concurrency = model_concurrency
+        self.semaphores = {}
+        self.stats_by_model = {}
+        self.stats_lock = threading.Lock()
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name="ollama-client", daemon=True
+        )
+        self.thread.start()
+        self.client = self.call(
+            self.create_client(timeout, connect_timeout, max_connections)
+        ).result()
+
+    async def create_client(self, timeout, connect_timeout, max_connections):
+        """Create the pooled HTTP client; runs on the client's loop."""
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+
+    def call(self, coroutine):
+        """Schedule ``coroutine`` on the client's loop; returns a Future."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def model_stats(self, model):
+        """Return the latency stats of ``model``, creating them on first use."""
+        with self.stats_lock:
+            if model not in self.stats_by_model:
+                self.stats_by_model[model] = LatencyStats()
+            return self.stats_by_model[model]
+
+    async def request(self, model, prompt, options=None):
+        """Send one generation request, waiting for a slot for ``model``."""
+        # Runs on self.loop, so the semaphores belong to it.
+        if model not in self.semaphores:
+            self.semaphores[model] = asyncio.Semaphore(self.model_concurrency)
+        stats = self.model_stats(model)
+        queued = time.perf_counter()
+        with self.stats_lock:
+            stats.waiting += 1
+        async with self.semaphores[model]:
+            with self.stats_lock:
+                stats.waiting -= 1
+                stats.in_flight += 1
+            start = time.perf_counter()
+            ok = False
+            try:
+                response = await self.client.post(
+                    "/api/generate",
+                    json={
+                        "model": model,
+                        "prompt": prompt,
+                        "stream": False,
+                        "options": options or {},
+                    },
+                )
+                if response.status_code != 200:
+                    raise RuntimeError(f"Ollama error: {response.text}")
+                ok = True
+                return response.json()["response"].strip()
+            finally:
+                elapsed = time.perf_counter() - start
+                with self.stats_lock:
+                    stats.in_flight -= 1
+                    stats.record(elapsed, start - queued, ok)
+                logger.info(
+                    f"Ollama {model}: {elapsed:.2f}s"
+                    f" (waited {start - queued:.2f}s){'' if ok else ' failed'}"
+                )
+
+    async def generate(self, prompt, model, options=None):
+        """Generate a completion without blocking the caller's event loop.
+
+        ``options`` are Ollama model options, e.g. ``{"stop": [...]}``.
+        """
+        return await asyncio.wrap_future(
+            self.call(self.request(model, prompt, options))
+        )
+
+    def generate_sync(self, prompt, model, options=None):
+        """Blocking ``generate`` for sync code; don't call it on an event loop."""
+        return self.call(self.request(model, prompt, options)).result()
+
+    def stats(self):
+        """Latency stats of every model called so far."""
+        with self.stats_lock:
+            return {model: s.to_dict() for model, s in self.stats_by_model.items()}
+
+    def close(self):
+        """Close the connection pool and stop the background loop."""
+        self.call(self.client.aclose()).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    """Return the process-wide Ollama client, created on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient()
+        return _client
@@ -0,0 +1,396 @@
+import asyncio
+import contextlib
+import hashlib
+import os
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from dotenv import load_dotenv
+from rag_pipeline.embedding_cache import normalize_text
+from rag_pipeline.logger_config import get_logger
+
+load_dotenv()
+logger = get_logger(__name__)
+
+RERANK_MODEL = os.getenv("RERANK_MODEL", "mixedbread-ai/mxbai-rerank-base-v2")
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "8192"))
+# (query, document) pairs scored per forward pass
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+# How long the first request of a batch waits for others to join it
+RERANK_MAX_WAIT_MS = float(os.getenv("RERANK_MAX_WAIT_MS", "10"))
+# CPU threads used by the reranker's forward passes
+RERANK_THREADS = int(os.getenv("RERANK_THREADS", str(os.cpu_count() or 1)))
+# Cached (query, chunk) scores; 0 disables the cache
+RERANK_CACHE_MAX_ENTRIES = int(os.getenv("RERANK_CACHE_MAX_ENTRIES", "100000"))
+RERANK_CACHE_TTL = float(os.getenv("RERANK_CACHE_TTL", "86400"))
+# Seconds before a failed model load is retried by the next request
+RERANK_LOAD_RETRY_SECONDS = float(os.getenv("RERANK_LOAD_RETRY_SECONDS", "30"))
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class RerankCache:
+    """In-memory LRU cache of rerank scores with a time to live.
+
+    Entries are keyed by model, the hash of the normalized query, the point
+    ID and the chunk's content hash. Re-ingesting a changed chunk gives it a
+    new content hash, so its stale scores are never read again and simply
+    age out.
+    """
+
+    def __init__(self, max_entries=RERANK_CACHE_MAX_ENTRIES, ttl=RERANK_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model, query, point_id, chunk_hash):
+        """Build the cache key of one (query, chunk) pair."""
+        query_hash = content_hash(normalize_text(query))
+        return f"{model}\0{query_hash}\0{point_id}\0{chunk_hash}"
+
+    @staticmethod
+    def entry_size(key):
+        """Estimate the memory held by one entry."""
+        # key string + (score, expiry) tuple of floats + OrderedDict slot
+        return sys.getsizeof(key) + 2 * sys.getsizeof(0.0) + 120
+
+    def get_many(self, model, query, keys):
+        """Look up cached scores for ``(point_id, chunk_hash)`` keys, None on a miss."""
+        now = time.time()
+        scores = []
+        with self.lock:
+            for point_id, chunk_hash in keys:
+                key = self.make_key(model, query, point_id, chunk_hash)
+                entry = self.entries.get(key)
+                if entry is not None and entry[1] < now:
+                    self.remove(key)
+                    entry = None
+                if entry is None:
+                    scores.append(None)
+                    continue
+                self.entries.move_to_end(key)
+                scores.append(entry[0])
+            hits = sum(score is not None for score in scores)
+            self.hits += hits
+            self.misses += len(scores) - hits
+        return scores
+
+    def put_many(self, model, query, keys, scores):
+        """Store ``scores`` for their keys, evicting the least recently used."""
+        expires = time.time() + self.ttl
+        with self.lock:
+            for (point_id, chunk_hash), score in zip(keys, scores, strict=True):
+                key = self.make_key(model, query, point_id, chunk_hash)
+                if key not in self.entries:
+                    self.bytes += self.entry_size(key)
+                self.entries[key] = (score, expires)
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.remove(next(iter(self.entries)))
+
+    def remove(self, key):
+        """Drop ``key``; the caller holds the lock."""
+        del self.entries[key]
+        self.bytes -= self.entry_size(key)
+
+    def stats(self):
+        """Hit rate and size of the cache."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+            }
+
+
+class RerankStats:
+    """Counters describing how well requests are being batched."""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.requests = 0
+        self.pairs = 0
+        self.batches = 0
+        self.forward_passes = 0
+        self.queue_seconds = 0.0
+        self.busy_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, requests, pairs, passes, queue_seconds, busy_seconds):
+        """Add one scored batch to the counters."""
+        with self.lock:
+            self.requests += requests
+            self.pairs += pairs
+            self.batches += 1
+            self.forward_passes += passes
+            self.queue_seconds += queue_seconds
+            self.busy_seconds += busy_seconds
+
+    def to_dict(self):
+        """Totals plus the derived batching ratios."""
+        def ratio(numerator, denominator, digits=2):
+            return round(numerator / denominator, digits) if denominator else 0.0
+
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "pairs": self.pairs,
+                "batches": self.batches,
+                "forward_passes": self.forward_passes,
+                # Share of forward-pass slots filled; 1.0 means every pass ran
+                # a full RERANK_BATCH_SIZE.
+                "batch_fill": ratio(
+                    self.pairs, self.forward_passes * self.batch_size, 3
+                ),
+                "requests_per_batch": ratio(self.requests, self.batches),
+                "mean_queue_ms": ratio(1000 * self.queue_seconds, self.requests, 1),
+                "pairs_per_sec": ratio(self.pairs, self.busy_seconds, 1),
+            }
+
+
+class RerankService:
+    """Scores (query, document) pairs from concurrent callers in micro-batches.
+
+    Callers enqueue a query with its documents and wait on a future. One
+    worker thread owns the model: it takes the first waiting request, keeps
+    collecting requests until ``batch_size`` pairs are queued or ``max_wait``
+    has passed, and scores all their pairs together in forward passes of up
+    to ``batch_size``. A single worker also stops concurrent requests from
+    fighting over the same cores.
+    """
+
+    def __init__(
+        self,
+        model_name=RERANK_MODEL,
+        batch_size=RERANK_BATCH_SIZE,
+        max_wait=RERANK_MAX_WAIT_MS / 1000,
+        threads=RERANK_THREADS,
+        max_length=RERANK_MAX_LENGTH,
+        model=None,
+        cache_entries=RERANK_CACHE_MAX_ENTRIES,
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.threads = threads
+        self.max_length = max_length
+        self.model = model
+        self.cache = RerankCache(cache_entries) if cache_entries else None
+        self.requests = queue.Queue()
+        self.stats = RerankStats(batch_size)
+        self.loaded = False
+        self.load_error = None
+        self.retry_at = 0.0
+        self.inference_mode = contextlib.nullcontext
+        self.worker = threading.Thread(target=self.run, name="reranker", daemon=True)
+        self.worker.start()
+
+    def load_model(self):
+        """Load the reranker (unless one was injected) and size torch's pool."""
+        try:
+            import torch
+
+            torch.set_num_threads(self.threads)
+            self.inference_mode = torch.inference_mode
+        except ImportError:
+            pass
+        if self.model is None:
+            from mxbai_rerank import MxbaiRerankV2
+
+            self.model = MxbaiRerankV2(self.model_name, max_length=self.max_length)
+            logger.info(
+                f"Loaded reranker {self.model_name} ({self.threads} threads, "
+                f"batch {self.batch_size}, wait {self.max_wait * 1000:.0f}ms)"
+            )
+
+    def score_pairs(self, queries, documents):
+        """Relevance scores of ``queries[i]`` vs ``documents[i]``."""
+        if hasattr(self.model, "_compute_scores"):
+            # The public rank() takes a single query, so a batch mixing
+            # several queries would need one forward pass per query.
+            # _compute_scores is the step rank() itself calls and scores any
+            # (query, document) pairs in one pass. It is private API, so
+            # mxbai-rerank is pinned in requirements.txt.
+            with self.inference_mode():
+                scores = self.model._compute_scores(
+                    queries=queries,
+                    documents=documents,
+                    batch_size=len(queries),
+                    show_progress=False,
+                )
+            return [float(score) for score in scores]
+        scores = [0.0] * len(queries)
+        by_query = {}
+        for i, query in enumerate(queries):
+            by_query.setdefault(query, []).append(i)
+        for query, positions in by_query.items():
+            results = self.model.rank(
+                query=query,
+                documents=[documents[i] for i in positions],
+                return_documents=False,
+            )
+            for result in results:
+                scores[positions[result.index]] = float(result.score)
+        return scores
+
+    def collect(self):
+        """Block for one request, then gather more until full or timed out."""
+        batch = [self.requests.get()]
+        pairs = len(batch[0][1])
+        deadline = time.perf_counter() + self.max_wait
+        while pairs < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            pairs += len(request[1])
+        return batch
+
+    def ensure_model(self):
+        """Load the model if needed, raising the last error while backing off.
+
+        A failed load is retried once RERANK_LOAD_RETRY_SECONDS have passed,
+        so a missing download or a full disk does not disable reranking
+        until the process restarts.
+        """
+        if self.loaded:
+            return
+        if self.load_error is not None and time.monotonic() < self.retry_at:
+            raise self.load_error
+        try:
+            self.load_model()
+        except Exception as e:
+            logger.error(f"Failed to load reranker {self.model_name}: {e}")
+            self.load_error = e
+            self.retry_at = time.monotonic() + RERANK_LOAD_RETRY_SECONDS
+            raise
+        self.loaded = True
+        self.load_error = None
+
+    def run(self):
+        """Worker loop: load the model, then score batches as they arrive."""
+        with contextlib.suppress(Exception):
+            self.ensure_model()
+
+        while True:
+            batch = self.collect()
+            try:
+                self.ensure_model()
+            except Exception as e:
+                for _, _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            started = time.perf_counter()
+            queries = [query for query, docs, _, _ in batch for _ in docs]
+            documents = [doc for _, docs, _, _ in batch for doc in docs]
+            try:
+                scores = []
+                for i in range(0, len(documents), self.batch_size):
+                    scores.extend(
+                        self.score_pairs(
+                            queries[i : i + self.batch_size],
+                            documents[i : i + self.batch_size],
+                        )
+                    )
+            except Exception as e:
+                logger.error(f"Reranking batch of {len(documents)} pairs failed: {e}")
+                for _, _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+
+            offset = 0
+            for _, docs, future, _ in batch:
+                future.set_result(scores[offset : offset + len(docs)])
+                offset += len(docs)
+            self.stats.record(
+                requests=len(batch),
+                pairs=len(documents),
+                passes=-(-len(documents) // self.batch_size),
+                queue_seconds=sum(started - enqueued for _, _, _, enqueued in batch),
+                busy_seconds=finished - started,
+            )
+
+    def submit(self, query, documents):
+        """Queue ``documents`` for scoring; the Future yields scores in order."""
+        future = Future()
+        documents = list(documents)
+        if not documents:
+            future.set_result([])
+            return future
+        self.requests.put((query, documents, future, time.perf_counter()))
+        return future
+
+    def lookup(self, query, documents, keys):
+        """Split into cached scores and the positions that need the model."""
+        if self.cache is None or keys is None:
+            return [None] * len(documents), list(range(len(documents)))
+        cached = self.cache.get_many(self.model_name, query, keys)
+        return cached, [i for i, score in enumerate(cached) if score is None]
+
+    def merge(self, query, keys, cached, misses, fresh):
+        """Cache the ``fresh`` scores and fill them in at the missed positions."""
+        if self.cache is not None and keys is not None and misses:
+            miss_keys = [keys[i] for i in misses]
+            self.cache.put_many(self.model_name, query, miss_keys, fresh)
+        for position, score in zip(misses, fresh, strict=True):
+            cached[position] = score
+        return cached
+
+    def score(self, query, documents, keys=None):
+        """Scores of ``documents`` for ``query``, in order.
+
+        With ``keys`` (one ``(point_id, content_hash)`` per document), cached
+        scores are reused and only the other documents reach the model.
+        """
+        documents = list(documents)
+        cached, misses = self.lookup(query, documents, keys)
+        miss_documents = [documents[i] for i in misses]
+        fresh = self.submit(query, miss_documents).result()
+        return self.merge(query, keys, cached, misses, fresh)
+
+    async def ascore(self, query, documents, keys=None):
+        """Await ``score`` without blocking the event loop."""
+        documents = list(documents)
+        cached, misses = self.lookup(query, documents, keys)
+        miss_documents = [documents[i] for i in misses]
+        fresh = await asyncio.wrap_future(self.submit(query, miss_documents))
+        return self.merge(query, keys, cached, misses, fresh)
+
+    def metrics(self):
+        """Batching and cache statistics."""
+        return {
+            **self.stats.to_dict(),
+            "cache": self.cache.stats() if self.cache else None,
+        }
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_rerank_service():
+    """Return the process-wide reranking service, started on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = RerankService()
+        return _service
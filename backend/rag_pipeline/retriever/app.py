@@ -1,30 +1,39 @@
 import argparse
+import asyncio
 import datetime
 import json
 import os
-import requests
 from dotenv import load_dotenv
 from langchain.memory import ConversationSummaryBufferMemory
 from langchain.schema import messages_to_dict
-from langchain_community.llms import Ollama
-from mxbai_rerank import MxbaiRerankV2
 from langchain_core.language_models import BaseLLM
-from langchain_core.outputs import LLMResult
-from qdrant_client import QdrantClient
+from langchain_core.outputs import Generation, LLMResult
 from transformers import AutoTokenizer, pipeline
 
 from rag_pipeline.embed import setup_gemini
+from rag_pipeline.llm import get_llm_client
 from rag_pipeline.logger_config import get_logger
-from rag_pipeline.retriever.routing import retrieve_routed_context
+from rag_pipeline.rerank import content_hash, get_rerank_service
+from rag_pipeline.retriever.routing import (
+    aretrieve_context,
+    retrieve_cited_sections,
+    retrieve_context,
+)
 from rag_pipeline.retriever.db import (
     connect_db,
     get_or_create_user,
     create_conversation,
     insert_message,
 )
+from rag_pipeline.vector_store import (
+    acheck_health,
+    get_async_vector_store,
+    get_vector_store,
+)
 
 # === FastAPI imports ===
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
 # === Load environment & setup logger ===
@@ -55,28 +64,54 @@ def display_token_stats(name, text, max_tokens=8192):
     )
 
 
-summarizer_llm = Ollama(model=OLLAMA_MODEL)
+class PooledOllama(BaseLLM):
+    """LangChain LLM backed by the shared pooled Ollama client."""
+
+    model: str = OLLAMA_MODEL
+
+    @property
+    def _llm_type(self):
+        """Name LangChain reports for this LLM."""
+        return "pooled-ollama"
+
+    def _generate(self, prompts, stop=None, run_manager=None, **kwargs):
+        """Generate one completion per prompt through the shared client."""
+        client = get_llm_client()
+        options = {"stop": stop} if stop else None
+        return LLMResult(
+            generations=[
+                [Generation(text=client.generate_sync(prompt, self.model, options))]
+                for prompt in prompts
+            ]
+        )
+
+    async def _agenerate(self, prompts, stop=None, run_manager=None, **kwargs):
+        """Generate completions for all prompts concurrently."""
+        client = get_llm_client()
+        options = {"stop": stop} if stop else None
+        texts = await asyncio.gather(
+            *(client.generate(prompt, self.model, options) for prompt in prompts)
+        )
+        return LLMResult(generations=[[Generation(text=text)] for text in texts])
+
+
+summarizer_llm = PooledOllama(model=OLLAMA_MODEL)
 memory = ConversationSummaryBufferMemory(
     llm=summarizer_llm, max_token_limit=500, return_messages=True
 )
 
 
-def connect_qdrant():
-    return QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+def generate_with_ollama(prompt, model=OLLAMA_MODEL):
+    return get_llm_client().generate_sync(prompt, model)
 
 
-def generate_with_ollama(prompt, model=OLLAMA_MODEL):
-    url = "http://localhost:11434/api/generate"
-    response = requests.post(
-        url, json={"model": model, "prompt": prompt, "stream": False}
-    )
-    if response.status_code == 200:
-        return response.json()["response"].strip()
-    else:
-        raise RuntimeError(f"Ollama error: {response.text}")
+async def agenerate_with_ollama(prompt, model=OLLAMA_MODEL):
+    """Generate a completion without blocking the event loop."""
+    return await get_llm_client().generate(prompt, model)
 
 
-def generate_answer(context_chunks, user_query, chat_history):
+def build_answer_prompt(context_chunks, user_query, chat_history):
+    """Build the answer prompt from ``(hit, score)`` pairs and the chat history."""
     context_text = ""
     for i, (chunk, score) in enumerate(context_chunks, start=1):
         context_text += (
@@ -106,9 +141,20 @@ def generate_answer(context_chunks, user_query, chat_history):
         User Question: {user_query}
         Answer:"""
 
+    return prompt
+
+
+def generate_answer(context_chunks, user_query, chat_history):
+    prompt = build_answer_prompt(context_chunks, user_query, chat_history)
     return generate_with_ollama(prompt)
 
 
+async def agenerate_answer(context_chunks, user_query, chat_history):
+    """Async ``generate_answer``, used by the /chat endpoint."""
+    prompt = build_answer_prompt(context_chunks, user_query, chat_history)
+    return await agenerate_with_ollama(prompt)
+
+
 def save_memory_as_json(memory, log_dir="logs"):
     os.makedirs(log_dir, exist_ok=True)
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
@@ -131,17 +177,38 @@ def save_memory_as_json(memory, log_dir="logs"):
         print(f" Summary saved to: {summary_path}")
 
 
-reranker = MxbaiRerankV2("mixedbread-ai/mxbai-rerank-base-v2", max_length=8192)
+# Concurrent requests are scored together in micro-batches by one worker
+reranker = get_rerank_service()
 
 
-def rerank_results_v2(query: str, hits: list, text_key="content"):
-    docs = [hit.payload[text_key] for hit in hits]
-    results = reranker.rank(query=query, documents=docs, return_documents=False)
-    scored = [(hits[result.index], result.score) for result in results]
+def sort_by_score(hits: list, scores: list):
+    scored = list(zip(hits, scores, strict=True))
     scored.sort(key=lambda x: x[1], reverse=True)
     return scored
 
 
+def rerank_cache_keys(hits: list, text_key="content"):
+    """``(point_id, content_hash)`` per hit for the rerank score cache."""
+    keys = []
+    for hit in hits:
+        # content_hash describes "content"; expanded parent sections have none.
+        chunk_hash = hit.payload.get("content_hash") if text_key == "content" else None
+        keys.append((str(hit.id), chunk_hash or content_hash(hit.payload[text_key])))
+    return keys
+
+
+def rerank_results_v2(query: str, hits: list, text_key="content"):
+    docs = [hit.payload[text_key] for hit in hits]
+    keys = rerank_cache_keys(hits, text_key)
+    return sort_by_score(hits, reranker.score(query, docs, keys))
+
+
+async def arerank_results_v2(query: str, hits: list, text_key="content"):
+    docs = [hit.payload[text_key] for hit in hits]
+    keys = rerank_cache_keys(hits, text_key)
+    return sort_by_score(hits, await reranker.ascore(query, docs, keys))
+
+
 def save_turn_to_memory_and_db(memory, conn, conversation_id, user_input, answer):
     memory.chat_memory.add_user_message(user_input)
     memory.chat_memory.add_ai_message(answer)
@@ -225,7 +292,7 @@ app.add_middleware(
 
 # Setup clients once
 setup_gemini()
-qdrant_client = connect_qdrant()
+qdrant_client = get_vector_store()
 db_conn = connect_db()
 user_id = get_or_create_user(db_conn, "api-user")
 # conversation_id = create_conversation(db_conn, user_id)
@@ -273,12 +340,21 @@ async def chat_endpoint(request: QueryRequest):
                 db_conn.commit()
 
         history = memory.chat_memory.messages
-        context = retrieve_routed_context(qdrant_client, user_query, history=history)
-        if not context:
-            return {"answer": None, "message": "No relevant context found."}
-
-        reranked = rerank_results_v2(user_query, context, text_key="content")
-        answer = generate_answer(reranked, user_query, history)
+        # Cited sections are exact matches: no embedding or reranking needed
+        # The citation lookup is sync, so it runs in the threadpool
+        cited = await run_in_threadpool(
+            retrieve_cited_sections, qdrant_client, user_query
+        )
+        if cited:
+            reranked = [(hit, hit.score) for hit in cited]
+        else:
+            context = await aretrieve_context(
+                await get_async_vector_store(), user_query, history=history
+            )
+            if not context:
+                return {"answer": None, "message": "No relevant context found."}
+            reranked = await arerank_results_v2(user_query, context, text_key="content")
+        answer = await agenerate_answer(reranked, user_query, history)
 
         save_turn_to_memory_and_db(memory, db_conn, conversation_id, user_query, answer)
 
@@ -291,6 +367,27 @@ async def chat_endpoint(request: QueryRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/health")
+async def health():
+    try:
+        collections = await acheck_health(await get_async_vector_store())
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Vector store unavailable: {e}")
+    return {"status": "ok", "collections": collections}
+
+
+@app.get("/rerank/stats")
+async def rerank_stats():
+    """Reranker batching efficiency and score cache hit rate and memory."""
+    return reranker.metrics()
+
+
+@app.get("/llm/stats")
+async def llm_stats():
+    """Per-model Ollama call counts, latencies and queueing."""
+    return get_llm_client().stats()
+
+
 # === CLI mode ===
 def main():
     import argparse
@@ -304,7 +401,7 @@ def main():
 
     if args.mode == "cli":
         setup_gemini()
-        client = connect_qdrant()
+        client = get_vector_store()
         conn = connect_db()
         user_id = get_or_create_user(conn, "test-user")
         conversation_id = create_conversation(conn, user_id)
@@ -314,9 +411,14 @@ def main():
             if user_query.lower() in {"exit", "quit"}:
                 break
             history = memory.chat_memory.messages
-            context = retrieve_routed_context(client, user_query, history=history)
-            logger.info("Reranking context...")
-            reranked = rerank_results_v2(user_query, context, text_key="content")
+            cited = retrieve_cited_sections(client, user_query)
+            if cited:
+                context = cited
+                reranked = [(hit, hit.score) for hit in cited]
+            else:
+                context = retrieve_context(client, user_query, history=history)
+                logger.info("Reranking context...")
+                reranked = rerank_results_v2(user_query, context, text_key="content")
             if not context:
                 print("No relevant context found.")
                 continue
@@ -0,0 +1,114 @@
+import os
+import re
+
+from dotenv import load_dotenv
+from qdrant_client import QdrantClient
+from qdrant_client.models import FieldCondition, Filter, MatchAny, ScoredPoint
+from rag_pipeline.logger_config import get_logger
+
+load_dotenv()
+logger = get_logger(__name__)
+
+# Most chunks a citation lookup returns per collection, e.g. for a whole chapter
+CITATION_MAX_CHUNKS = int(os.getenv("CITATION_MAX_CHUNKS", "20"))
+# Most cited sections passed on to the answer, across every searched collection
+CITATION_MAX_SECTIONS = int(os.getenv("CITATION_MAX_SECTIONS", "10"))
+
+# Numbers such as "145", "145, 146 and 150" or "12 & 13"
+NUMBER_LIST = r"(\d+(?:\s*(?:,|and|&|or)\s*\d+)*)"
+# "s. 145" must not follow a letter or dot, so "U.S. 5" is no match
+SECTION_RE = re.compile(
+    rf"(?<![\w.])(?:sections?|secs?\.?|s\.)\s*{NUMBER_LIST}", re.I
+)
+# "Part"/"Chapter" must be capitalized or hyphenated like the stored IDs
+# ("part-2"), so prose such as "I work part 2 days" is no match. Roman
+# numerals and letters must be upper case, so "Chapter a ..." is no match.
+HEADING_KEYWORD = r"\b(?:{title}\s*[–\-]?\s*|(?i:{title})\s*[–\-]\s*)"
+CHAPTER_RE = re.compile(
+    HEADING_KEYWORD.format(title="(?:Chapter|CHAPTER)")
+    + r"(\d+\b|[IVX]+\b|[A-Z]\b)"
+)
+PART_RE = re.compile(HEADING_KEYWORD.format(title="(?:Part|PART)") + r"(\d+)\b")
+# Payload fields a citation can match; Part/Chapter only narrow a search
+CITATION_FIELDS = ("SectionID", "ChapterID", "PartID")
+SCOPE_FIELDS = ("ChapterID", "PartID")
+# "civil code", "Criminal Act", "labour law", ... name the domain
+ACT_RE = re.compile(r"\b(criminal|civil|labou?r)\s+(?:code|act|law)\b", re.I)
+
+
+def detect_citation(query):
+    """Find an explicit reference to a provision in ``query``.
+
+    Returns a dict with the payload values to match (``SectionID`` as a
+    list, ``ChapterID``, ``PartID``) and the cited ``domain``, if any, or
+    None when the query names no section, chapter or part. Values are
+    formatted the way the extractor stores them ("145.", "Chapter-3",
+    "Part-2").
+    """
+    citation = {}
+    if match := SECTION_RE.search(query):
+        citation["SectionID"] = [f"{n}." for n in re.findall(r"\d+", match.group(1))]
+    if match := CHAPTER_RE.search(query):
+        citation["ChapterID"] = f"Chapter-{match.group(1)}"
+    if match := PART_RE.search(query):
+        citation["PartID"] = f"Part-{match.group(1)}"
+    if not citation:
+        return None
+    act = ACT_RE.search(query)
+    domain = act.group(1).lower() if act else None
+    citation["domain"] = "labour" if domain == "labor" else domain
+    return citation
+
+
+def citation_filter(citation, fields=CITATION_FIELDS):
+    return Filter(
+        must=[
+            FieldCondition(
+                key=field,
+                match=MatchAny(any=value if isinstance(value, list) else [value]),
+            )
+            for field, value in citation.items()
+            if field in fields
+        ]
+    )
+
+
+def scope_filter(citation):
+    """Filter narrowing a search to the Part/Chapter ``citation`` names.
+
+    Returns None when ``citation`` is None or names neither.
+    """
+    if citation is None or not any(field in citation for field in SCOPE_FIELDS):
+        return None
+    return citation_filter(citation, SCOPE_FIELDS)
+
+
+def section_order(point):
+    number = (point.payload.get("SectionID") or "").rstrip(".")
+    return (
+        int(number) if number.isdigit() else -1,
+        point.payload.get("ChunkIndex", 0),
+    )
+
+
+def lookup_citation(
+    client: QdrantClient, collection, citation, limit=CITATION_MAX_CHUNKS
+):
+    """Fetch the chunks matching ``citation`` with an exact filtered scroll.
+
+    Uses the SectionID/ChapterID/PartID payload indexes, so no embedding or
+    vector search is involved. Hits come back in section order with a score
+    of 1.0.
+    """
+    points, _ = client.scroll(
+        collection_name=collection,
+        scroll_filter=citation_filter(citation),
+        limit=limit,
+        with_payload=True,
+        with_vectors=False,
+    )
+    points.sort(key=section_order)
+    return [
+        ScoredPoint(id=point.id, version=0, score=1.0, payload=point.payload)
+        for point in points
+    ]
@@ -0,0 +1,209 @@
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+from rag_pipeline.embed import embedder_spec, get_embedder
+from rag_pipeline.logger_config import get_logger
+from rag_pipeline.vector_store import get_vector_store
+
+load_dotenv()
+logger = get_logger(__name__)
+
+ROUTER_CENTROIDS_PATH = os.getenv(
+    "ROUTER_CENTROIDS_PATH", os.path.join(os.getcwd(), "domain_centroids.npz")
+)
+# Points sampled per collection to compute its centroid
+ROUTER_SAMPLE_SIZE = int(os.getenv("ROUTER_SAMPLE_SIZE", "2000"))
+# Softmax temperature over cosine similarities; domains of one legal corpus are
+# close in embedding space, so a low temperature is needed to separate them.
+ROUTER_TEMPERATURE = float(os.getenv("ROUTER_TEMPERATURE", "0.02"))
+# Below this probability the LLM classifier decides instead.
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.6"))
+# Seconds between checks that the collections still hold as many points as
+# when the centroids were built; a changed count (e.g. after an ingest in
+# another process) rebuilds them. 0 checks on every query.
+ROUTER_RECHECK_SECONDS = float(os.getenv("ROUTER_RECHECK_SECONDS", "300"))
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class DomainRouter:
+    """Routes a query embedding to the domain with the nearest centroid.
+
+    Each domain's centroid is the normalized mean of its collection's section
+    embeddings. Cosine similarities to the centroids are turned into
+    probabilities with a temperature softmax, and the top probability is the
+    routing confidence. ``counts`` holds each domain's collection size at
+    build time, to tell when the centroids are out of date.
+    """
+
+    def __init__(
+        self,
+        domains,
+        centroids,
+        model_id,
+        counts=None,
+        temperature=ROUTER_TEMPERATURE,
+    ):
+        self.domains = list(domains)
+        self.centroids = normalize(centroids)
+        self.model_id = model_id
+        self.counts = counts
+        self.temperature = temperature
+
+    def probabilities(self, query_vector):
+        """Softmax of the query's cosine similarities to each centroid."""
+        similarities = self.centroids @ normalize(query_vector)
+        logits = (similarities - similarities.max()) / self.temperature
+        weights = np.exp(logits)
+        return dict(zip(self.domains, (weights / weights.sum()).tolist(), strict=True))
+
+    def route(self, query_vector):
+        """Return ``(domain, confidence, probabilities)`` for a query vector."""
+        probabilities = self.probabilities(query_vector)
+        domain = max(probabilities, key=probabilities.get)
+        return domain, probabilities[domain], probabilities
+
+    def save(self, path=ROUTER_CENTROIDS_PATH):
+        """Write the centroids, embedder ID and collection counts to ``path``."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(
+            path,
+            domains=np.array(self.domains),
+            centroids=self.centroids,
+            model_id=np.array(self.model_id),
+            counts=np.array([self.counts[domain] for domain in self.domains]),
+        )
+
+    @classmethod
+    def load(cls, path=ROUTER_CENTROIDS_PATH):
+        """Read a router written by ``save``."""
+        with np.load(path) as data:
+            domains = data["domains"].tolist()
+            counts = None
+            if "counts" in data:
+                counts = dict(zip(domains, data["counts"].tolist(), strict=True))
+            return cls(domains, data["centroids"], str(data["model_id"]), counts)
+
+
+def sample_collection(client, collection, with_vectors, limit=ROUTER_SAMPLE_SIZE):
+    """Scroll up to ``limit`` points with their content and/or vectors."""
+    points, offset = [], None
+    while len(points) < limit:
+        page, offset = client.scroll(
+            collection_name=collection,
+            limit=min(256, limit - len(points)),
+            offset=offset,
+            with_payload=["content"],
+            with_vectors=with_vectors,
+        )
+        points.extend(page)
+        if offset is None:
+            break
+    return points
+
+
+def collection_centroid(client, collection, embedder):
+    """Mean normalized embedding of a collection in ``embedder``'s space.
+
+    Stored vectors are used directly when the collection was indexed with
+    the routing embedder; otherwise sampled contents are re-embedded.
+    """
+    same_space = embedder_spec(collection) == embedder_spec()
+    points = sample_collection(client, collection, with_vectors=same_space)
+    if not points:
+        raise ValueError(f"Collection '{collection}' has no points to route to")
+    if same_space:
+        vectors = [point.vector for point in points]
+    else:
+        texts = [(point.payload or {}).get("content", "") for point in points]
+        vectors = embedder.embed_documents(texts)
+    return normalize(normalize(vectors).mean(axis=0))
+
+
+def collection_counts(client, collection_map):
+    """Point count of each domain's collection, skipping missing ones."""
+    return {
+        domain: client.count(collection_name=collection, exact=True).count
+        for domain, collection in collection_map.items()
+        if client.collection_exists(collection_name=collection)
+    }
+
+
+def build_domain_router(client, collection_map):
+    """Compute a centroid for every ``domain -> collection`` in the map."""
+    embedder = get_embedder()
+    counts = collection_counts(client, collection_map)
+    domains, centroids = [], []
+    for domain, collection in collection_map.items():
+        if domain not in counts:
+            logger.warning(f"Skipping domain '{domain}': no collection '{collection}'")
+            continue
+        domains.append(domain)
+        centroids.append(collection_centroid(client, collection, embedder))
+        logger.info(f"Computed routing centroid for '{domain}' from '{collection}'")
+    if not domains:
+        raise ValueError("No collections available to build a domain router")
+    return DomainRouter(domains, np.stack(centroids), embedder.model_id, counts)
+
+
+_router = None
+_router_checked = 0.0
+_router_lock = threading.Lock()
+
+
+def get_domain_router(client, collection_map):
+    """Load the saved router, or build and save it on first use.
+
+    A router built with a different embedder, or from collections whose
+    point counts have changed since, is rebuilt. The counts are checked at
+    most every ROUTER_RECHECK_SECONDS.
+    """
+    global _router, _router_checked
+    with _router_lock:
+        now = time.monotonic()
+        if _router is not None and now - _router_checked < ROUTER_RECHECK_SECONDS:
+            return _router
+        _router_checked = now
+        counts = collection_counts(client, collection_map)
+        if _router is not None and _router.counts == counts:
+            return _router
+        model_id = get_embedder().model_id
+        if os.path.exists(ROUTER_CENTROIDS_PATH):
+            router = DomainRouter.load(ROUTER_CENTROIDS_PATH)
+            if router.model_id == model_id and router.counts == counts:
+                _router = router
+                return _router
+            logger.info(
+                "Routing centroids are out of date "
+                "(another embedder or changed collections)"
+            )
+        _router = build_domain_router(client, collection_map)
+        _router.save(ROUTER_CENTROIDS_PATH)
+        logger.info(f"Saved routing centroids to {ROUTER_CENTROIDS_PATH}")
+        return _router
+
+
+def main():
+    """Rebuild the routing centroids, e.g. after re-ingesting a collection."""
+    from rag_pipeline.retriever.routing import COLLECTION_MAP
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--output", default=ROUTER_CENTROIDS_PATH)
+    args = parser.parse_args()
+
+    client = get_vector_store()
+    router = build_domain_router(client, COLLECTION_MAP)
+    router.save(args.output)
+    print(f"✅ Saved centroids for {', '.join(router.domains)} to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,81 @@
+import asyncio
 import os
-import requests
 import google.generativeai as genai
 from dotenv import load_dotenv
 import logging
 from langchain_core.messages import BaseMessage
-from typing import Dict, Optional
+from collections import Counter
+from itertools import chain, zip_longest
+from concurrent.futures import ThreadPoolExecutor
 from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    FieldCondition,
+    Filter,
+    MatchValue,
+    QuantizationSearchParams,
+    ScoredPoint,
+    SearchParams,
+)
 from rag_pipeline.logger_config import get_logger
 
-from rag_pipeline.embed import embed_query
+from rag_pipeline.bm25 import load_collection_index
+from rag_pipeline.embed import embed_query, embedder_spec, get_embedder
+from rag_pipeline.llm import get_llm_client
+from rag_pipeline.retriever.citations import (
+    CITATION_MAX_SECTIONS,
+    detect_citation,
+    lookup_citation,
+    scope_filter,
+)
+from rag_pipeline.vector_store import get_vector_store
+from rag_pipeline.retriever.domain_router import (
+    ROUTER_MIN_CONFIDENCE,
+    get_domain_router,
+)
 
 
 logger = get_logger()
 
+# === Vector search settings ===
+# Candidates fetched from quantized vectors per result before rescoring them
+# with the original float32 vectors (ignored for unquantized collections).
+SEARCH_OVERSAMPLING = float(os.getenv("SEARCH_OVERSAMPLING", "2.0"))
+# HNSW beam width at query time; unset uses the collection's default.
+SEARCH_HNSW_EF = int(os.getenv("SEARCH_HNSW_EF", "0")) or None
+
+SEARCH_PARAMS = SearchParams(
+    hnsw_ef=SEARCH_HNSW_EF,
+    quantization=QuantizationSearchParams(
+        rescore=True, oversampling=SEARCH_OVERSAMPLING
+    ),
+)
+
+# === Hybrid search ===
+# Fuse dense results with the collection's BM25 index (built at ingestion)
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+# Dense and sparse candidates fetched per result before fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "4"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# === Retrieval mode ===
+# "routed" searches the one collection picked by the router; "fanout" searches
+# every collection concurrently and fuses the results by router priors.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "routed")
+# Fan-out fetches top_k * FANOUT_CANDIDATES hits per collection before fusing.
+FANOUT_CANDIDATES = int(os.getenv("FANOUT_CANDIDATES", "2"))
+# Added to every domain's prior so unlikely domains can still contribute.
+FANOUT_PRIOR_FLOOR = float(os.getenv("FANOUT_PRIOR_FLOOR", "0.05"))
+FANOUT_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="fanout")
+
 # === Collection mapping ===
-COLLECTION_MAP: Dict[str, str] = {
+COLLECTION_MAP: dict[str, str] = {
     "criminal": "criminal_code",
     "civil": "civil_code",
     "labour": "labour_act",
 }
 
 # === Domain-specific keywords ===
-DOMAIN_KEYWORDS: Dict[str, list[str]] = {
+DOMAIN_KEYWORDS: dict[str, list[str]] = {
     "criminal": ["crime", "theft", "murder", "punishment", "jail", "rape", "arrest"],
     "civil": [
         "divorce",
@@ -65,20 +119,13 @@ OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1:latest")
 def classify_with_ollama(prompt: str, model: str = OLLAMA_MODEL) -> str:
     """Use LLaMA via Ollama to classify domain from prompt."""
     try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={"model": model, "prompt": prompt, "stream": False},
-        )
-        if response.status_code == 200:
-            return response.json()["response"].strip()
-        else:
-            raise RuntimeError(f"Ollama error: {response.text}")
+        return get_llm_client().generate_sync(prompt, model)
     except Exception as e:
         logger.error(f"Ollama classification error: {e}")
         return "criminal"
 
 
-def build_domain_prompt(user_query: str, history: Optional[list[BaseMessage]]) -> str:
+def build_domain_prompt(user_query: str, history: list[BaseMessage] | None) -> str:
     history_text = ""
     if history:
         for msg in history[-4:]:
@@ -105,7 +152,7 @@ def build_domain_prompt(user_query: str, history: Optional[list[BaseMessage]]) -
 
 
 def classify_query_domain_llama(
-    user_query: str, history: Optional[list[BaseMessage]]
+    user_query: str, history: list[BaseMessage] | None
 ) -> str:
     prompt = build_domain_prompt(user_query, history)
     response = classify_with_ollama(prompt)
@@ -120,39 +167,636 @@ def classify_query_domain_llama(
     return domain
 
 
-def retrieve_routed_context(
+def route_query(
     client: QdrantClient,
     user_query: str,
-    history: Optional[list[BaseMessage]] = None,
-    top_k: int = 5,
+    history: list[BaseMessage] | None,
+    llm_fallback: bool = True,
 ):
+    """Pick a domain from the query embedding, asking the LLM only if unsure.
+
+    Returns ``(domain, confidence, probabilities, query_vector)``; the vector
+    is in the routing embedder's space and can be reused for collections
+    indexed with the same embedder.
+    """
+    query_vector = get_embedder().embed_query(user_query)
     try:
-        domain = classify_query_domain_llama(user_query, history)
-        collection = COLLECTION_MAP.get(domain)
+        router = get_domain_router(client, COLLECTION_MAP)
+        domain, confidence, probabilities = router.route(query_vector)
+    except Exception as e:
+        logger.warning(f"Embedding router unavailable, falling back to LLM: {e}")
+        domain, confidence, probabilities = None, 0.0, {}
 
-        if not collection:
-            logger.warning(
-                f"No collection mapped for domain '{domain}', defaulting to 'criminal_code'"
+    if llm_fallback and confidence < ROUTER_MIN_CONFIDENCE:
+        llm_domain = classify_query_domain_llama(user_query, history)
+        logger.info(
+            f"Low routing confidence ({confidence:.2f} for '{domain}'), "
+            f"LLM classified as '{llm_domain}'"
+        )
+        domain = llm_domain
+    return domain, confidence, probabilities, query_vector
+
+
+# Payload fields that only describe a child chunk of a split section
+CHILD_FIELDS = {
+    "ParentID",
+    "ParentTitle",
+    "ChunkIndex",
+    "ChunkCount",
+    "OverlapUnits",
+    "BodyOffset",
+    "BodySeparator",
+}
+
+
+# Retrieval steps that talk to the vector store are written once, as
+# generators that yield ``(method, kwargs)`` client calls (or a list of them
+# to run concurrently) and are sent back the results. ``run_steps`` drives
+# them with a sync client and ``arun_steps`` with an async one, so the
+# scoring, fusion and expansion logic is shared by both APIs.
+def run_steps(client: QdrantClient, steps):
+    """Drive ``steps`` to completion with blocking client calls."""
+    result = None
+    while True:
+        try:
+            request = steps.send(result)
+        except StopIteration as done:
+            return done.value
+        if isinstance(request, list):
+            result = [getattr(client, method)(**kwargs) for method, kwargs in request]
+        else:
+            method, kwargs = request
+            result = getattr(client, method)(**kwargs)
+
+
+async def arun_steps(client, steps):
+    """Drive ``steps`` to completion, awaiting the client calls."""
+    result = None
+    while True:
+        try:
+            request = steps.send(result)
+        except StopIteration as done:
+            return done.value
+        if isinstance(request, list):
+            result = await asyncio.gather(
+                *(getattr(client, method)(**kwargs) for method, kwargs in request)
+            )
+        else:
+            method, kwargs = request
+            result = await getattr(client, method)(**kwargs)
+
+
+def children_scroll(collection: str, parent_id: str):
+    """Scroll arguments that fetch every child chunk of a split section."""
+    return dict(
+        collection_name=collection,
+        scroll_filter=Filter(
+            must=[FieldCondition(key="ParentID", match=MatchValue(value=parent_id))]
+        ),
+        limit=1000,
+        with_payload=True,
+        with_vectors=False,
+    )
+
+
+def fetch_parent_sections(collection: str, parent_ids: list[str]):
+    """Yield the scrolls that rebuild each split section from its children."""
+    results = yield [
+        ("scroll", children_scroll(collection, parent_id)) for parent_id in parent_ids
+    ]
+    return {
+        parent_id: merge_child_chunks(children)
+        for parent_id, (children, _) in zip(parent_ids, results, strict=True)
+    }
+
+
+def merge_child_chunks(children: list):
+    children = sorted(children, key=lambda child: child.payload["ChunkIndex"])
+
+    # Child content is the metadata header, "\n\n", then the slice of the
+    # parent's body that starts at BodyOffset, right after BodySeparator.
+    # Overlapping slices agree, so each child overwrites the body from there.
+    header, _, body = children[0].payload["content"].partition("\n\n")
+    if all("BodyOffset" in child.payload for child in children):
+        for child in children[1:]:
+            separator = child.payload.get("BodySeparator", "")
+            start = child.payload["BodyOffset"] - len(separator)
+            rest = child.payload["content"].partition("\n\n")[2]
+            body = body[:start] + separator + rest
+    else:
+        # Chunked before BodyOffset existed: "\n\n"-separated paragraphs,
+        # the first OverlapUnits of which repeat the previous child.
+        units = body.split("\n\n")
+        for child in children[1:]:
+            paragraphs = child.payload["content"].split("\n\n")[1:]
+            units.extend(paragraphs[child.payload.get("OverlapUnits", 0) :])
+        body = "\n\n".join(units)
+
+    payload = {
+        key: value
+        for key, value in children[0].payload.items()
+        if key not in CHILD_FIELDS and key != "content_hash"
+    }
+    payload["title"] = children[0].payload["ParentTitle"]
+    payload["content"] = "\n\n".join([header, body])
+    return payload
+
+
+def expansion_steps(collection: str, hits: list, min_siblings: int):
+    """Swap child chunks for their whole section when the section looks central.
+
+    Small child chunks keep prompts and reranking cheap, so a section is only
+    expanded when at least ``min_siblings`` of its children were retrieved.
+    The parent takes the position and score of its best-ranked child.
+    """
+    to_expand = sections_to_expand(hits, min_siblings)
+    if not to_expand:
+        return hits
+    parents = yield from fetch_parent_sections(collection, sorted(to_expand))
+    return replace_with_parents(hits, parents)
+
+
+def expand_parent_sections(
+    client: QdrantClient, collection: str, hits: list, min_siblings: int = 2
+):
+    """Run ``expansion_steps`` on a sync client."""
+    return run_steps(client, expansion_steps(collection, hits, min_siblings))
+
+
+async def aexpand_parent_sections(
+    client, collection: str, hits: list, min_siblings: int = 2
+):
+    """Run ``expansion_steps`` on an async client."""
+    return await arun_steps(client, expansion_steps(collection, hits, min_siblings))
+
+
+def sections_to_expand(hits: list, min_siblings: int):
+    counts = Counter(
+        hit.payload.get("ParentID") for hit in hits if hit.payload.get("ParentID")
+    )
+    return {parent_id for parent_id, n in counts.items() if n >= min_siblings}
+
+
+def replace_with_parents(hits: list, parents: dict[str, dict]):
+    """Put each parent payload in place of its first child, dropping the rest."""
+    expanded = []
+    emitted = set()
+    for hit in hits:
+        parent_id = hit.payload.get("ParentID")
+        if parent_id not in parents:
+            expanded.append(hit)
+            continue
+        if parent_id in emitted:
+            continue
+        emitted.add(parent_id)
+        expanded.append(
+            ScoredPoint(
+                id=parent_id,
+                version=hit.version,
+                score=hit.score,
+                payload=parents[parent_id],
             )
-            collection = "criminal_code"
+        )
+    logger.info(f"Expanded {len(parents)} split sections to their parent")
+    return expanded
+
+
+def collection_query_vector(user_query: str, collection: str, routing_vector):
+    """Reuse the routing embedding unless the collection has its own embedder."""
+    if embedder_spec(collection) == embedder_spec():
+        return routing_vector
+    return embed_query(user_query, collection)  # 1-D float32 array
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = RRF_K):
+    """Fuse ranked ID lists: each ID scores the sum of 1 / (k + rank)."""
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, point_id in enumerate(ranking, start=1):
+            scores[point_id] = scores.get(point_id, 0.0) + 1 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def fusion_steps(collection: str, dense_hits: list, sparse: list, limit: int):
+    """RRF-fuse dense hits with BM25 ``(point_id, score)`` results.
+
+    Points only found by BM25 are fetched from the vector store for their
+    payload.
+    """
+    by_id = {str(hit.id): hit for hit in dense_hits}
+    sparse_ids = [point_id for point_id, _ in sparse]
+    fused = reciprocal_rank_fusion([list(by_id), sparse_ids])[:limit]
+    missing = [point_id for point_id, _ in fused if point_id not in by_id]
+    if missing:
+        points = yield (
+            "retrieve",
+            dict(collection_name=collection, ids=missing, with_payload=True),
+        )
+        for point in points:
+            by_id[str(point.id)] = ScoredPoint(
+                id=point.id, version=0, score=0.0, payload=point.payload
+            )
+    return [
+        by_id[point_id].model_copy(update={"score": score})
+        for point_id, score in fused
+        if point_id in by_id
+    ]
+
+
+def scoped_id_steps(collection: str, query_filter: Filter):
+    """Yield the scrolls that collect every point ID matching ``query_filter``."""
+    ids, offset = set(), None
+    while True:
+        points, offset = yield (
+            "scroll",
+            dict(
+                collection_name=collection,
+                scroll_filter=query_filter,
+                limit=1000,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            ),
+        )
+        ids.update(str(point.id) for point in points)
+        if offset is None:
+            return ids
+
+
+def hybrid_steps(
+    collection: str,
+    user_query: str,
+    query_vector,
+    limit: int,
+    query_filter: Filter | None = None,
+):
+    """Dense search, fused with the collection's BM25 index when it has one.
+
+    A ``query_filter`` also scopes BM25, to the IDs of the points it matches.
+    """
+    index = load_collection_index(collection) if HYBRID_SEARCH else None
+    candidates = limit * HYBRID_CANDIDATES if index is not None else limit
+    hits = yield (
+        "search",
+        dense_search(collection, query_vector, candidates, query_filter),
+    )
+    if index is not None:
+        allowed = None
+        if query_filter is not None:
+            allowed = yield from scoped_id_steps(collection, query_filter)
+        sparse = index.search(user_query, candidates, allowed)
+        hits = yield from fusion_steps(collection, hits, sparse, limit)
+    return hits
+
+
+def search_steps(
+    collection: str,
+    user_query: str,
+    query_vector,
+    limit: int,
+    expand_min_siblings: int = 2,
+):
+    """Hybrid search of ``collection``, expanding central split sections.
 
+    A Part or Chapter cited in the query filters the search to it; when
+    nothing there matches, the whole collection is searched instead.
+    """
+    scope = scope_filter(detect_citation(user_query))
+    hits = yield from hybrid_steps(collection, user_query, query_vector, limit, scope)
+    if not hits and scope is not None:
+        logger.info(f"Nothing in the cited Part/Chapter of '{collection}' matched")
+        hits = yield from hybrid_steps(collection, user_query, query_vector, limit)
+    return (yield from expansion_steps(collection, hits, expand_min_siblings))
+
+
+def search_collection(
+    client: QdrantClient,
+    collection: str,
+    user_query: str,
+    query_vector,
+    limit: int,
+    expand_min_siblings: int = 2,
+):
+    """Run ``search_steps`` on a sync client."""
+    steps = search_steps(
+        collection, user_query, query_vector, limit, expand_min_siblings
+    )
+    return run_steps(client, steps)
+
+
+async def asearch_collection(
+    client,
+    collection: str,
+    user_query: str,
+    query_vector,
+    limit: int,
+    expand_min_siblings: int = 2,
+):
+    """Run ``search_steps`` on an async client."""
+    steps = search_steps(
+        collection, user_query, query_vector, limit, expand_min_siblings
+    )
+    return await arun_steps(client, steps)
+
+
+def dense_search(
+    collection: str, query_vector, limit: int, query_filter: Filter | None = None
+):
+    return dict(
+        collection_name=collection,
+        query_vector=query_vector,
+        query_filter=query_filter,
+        limit=limit,
+        with_payload=True,
+        search_params=SEARCH_PARAMS,
+    )
+
+
+def domain_priors(probabilities: dict[str, float]) -> dict[str, float]:
+    """Router probabilities smoothed by FANOUT_PRIOR_FLOOR, summing to 1."""
+    priors = {
+        domain: probabilities.get(domain, 1 / len(COLLECTION_MAP)) + FANOUT_PRIOR_FLOOR
+        for domain in COLLECTION_MAP
+    }
+    total = sum(priors.values())
+    return {domain: prior / total for domain, prior in priors.items()}
+
+
+def fuse_collection_hits(hits_by_domain: dict[str, list], priors, top_k: int):
+    """Merge each collection's hits into one ranking of ``top_k`` hits.
+
+    Each collection's scores are min-max normalized, then weighted by the
+    domain prior: scores from different collections (and possibly different
+    embedders) are not comparable as-is.
+    """
+    fused = []
+    for domain, hits in hits_by_domain.items():
+        if not hits:
+            continue
+        scores = [hit.score for hit in hits]
+        low, high = min(scores), max(scores)
+        for hit in hits:
+            normalized = (hit.score - low) / (high - low) if high > low else 1.0
+            payload = {**(hit.payload or {}), "collection": COLLECTION_MAP[domain]}
+            fused.append(
+                hit.model_copy(
+                    update={"score": priors[domain] * normalized, "payload": payload}
+                )
+            )
+    fused.sort(key=lambda hit: hit.score, reverse=True)
+    return fused[:top_k]
+
+
+def retrieve_fanout_context(
+    client: QdrantClient,
+    user_query: str,
+    history: list[BaseMessage] | None = None,
+    top_k: int = 5,
+    expand_min_siblings: int = 2,
+):
+    """Search every domain collection concurrently and fuse the results.
+
+    The router's domain probabilities weight each collection's hits, so a
+    confident route behaves like routed search while an uncertain one still
+    surfaces the best sections of the other domains. No LLM call is made.
+    """
+    _, _, probabilities, routing_vector = route_query(
+        client, user_query, history, llm_fallback=False
+    )
+    priors = domain_priors(probabilities)
+    domains = [
+        domain
+        for domain, collection in COLLECTION_MAP.items()
+        if client.collection_exists(collection_name=collection)
+    ]
+    futures = {
+        domain: FANOUT_EXECUTOR.submit(
+            search_collection,
+            client,
+            COLLECTION_MAP[domain],
+            user_query,
+            collection_query_vector(user_query, COLLECTION_MAP[domain], routing_vector),
+            top_k * FANOUT_CANDIDATES,
+            expand_min_siblings,
+        )
+        for domain in domains
+    }
+    results = [future.exception() or future.result() for future in futures.values()]
+    return fuse_fanout_results(domains, results, priors, top_k)
+
+
+def fuse_fanout_results(domains: list[str], results: list, priors, top_k: int):
+    """Fuse per-domain search results, logging (and skipping) failed searches."""
+    hits_by_domain = {}
+    for domain, result in zip(domains, results, strict=True):
+        if isinstance(result, Exception):
+            logger.error(
+                f"Fan-out search of '{COLLECTION_MAP[domain]}' failed: {result}"
+            )
+        else:
+            hits_by_domain[domain] = result
+    logger.info(
+        "Fan-out search priors: "
+        + ", ".join(f"{domain} {prior:.2f}" for domain, prior in priors.items())
+    )
+    return fuse_collection_hits(hits_by_domain, priors, top_k)
+
+
+def retrieve_cited_sections(client: QdrantClient, user_query: str):
+    """Resolve an explicit "Section 145 of the civil code" style reference.
+
+    Returns the cited sections, found by exact payload lookup, or None when
+    the query cites no section (or none it cites exists) and should go
+    through routed retrieval. A Part or Chapter alone only narrows that
+    search (see ``search_collection``). Without a named act every
+    collection is searched. Split sections are returned whole.
+
+    At most CITATION_MAX_SECTIONS sections are returned, taken in turn from
+    each collection so that every act citing the section is represented.
+    """
+    citation = detect_citation(user_query)
+    if citation is None or "SectionID" not in citation:
+        return None
+    domains = [citation["domain"]] if citation["domain"] else list(COLLECTION_MAP)
+    hits_by_collection = []
+    for domain in domains:
+        collection = COLLECTION_MAP.get(domain)
+        if not collection:
+            continue
+        try:
+            if not client.collection_exists(collection_name=collection):
+                continue
+            found = lookup_citation(client, collection, citation)
+            found = expand_parent_sections(client, collection, found, min_siblings=1)
+        except Exception as e:
+            logger.error(f"Citation lookup in '{collection}' failed: {e}")
+            continue
+        tagged = []
+        for hit in found:
+            payload = {**(hit.payload or {}), "collection": collection}
+            tagged.append(hit.model_copy(update={"payload": payload}))
+        hits_by_collection.append(tagged)
+    hits = [
+        hit for hit in chain.from_iterable(zip_longest(*hits_by_collection)) if hit
+    ]
+    if not hits:
+        logger.info(f"No sections found for citation {citation}")
+        return None
+    if len(hits) > CITATION_MAX_SECTIONS:
         logger.info(
-            f" Routed query to collection: '{collection}' based on domain: '{domain}'"
+            f"Citation {citation} matched {len(hits)} sections, "
+            f"keeping {CITATION_MAX_SECTIONS}"
         )
+        hits = hits[:CITATION_MAX_SECTIONS]
+    logger.info(f"Resolved citation {citation} to {len(hits)} sections")
+    return hits
 
-        query_vector = embed_query(user_query)  # must return List[float]
 
-        if not query_vector or not isinstance(query_vector, list):
+def retrieve_context(
+    client: QdrantClient,
+    user_query: str,
+    history: list[BaseMessage] | None = None,
+    top_k: int = 5,
+    expand_min_siblings: int = 2,
+):
+    """Retrieve with the strategy selected by RETRIEVAL_MODE."""
+    if RETRIEVAL_MODE == "fanout":
+        try:
+            return retrieve_fanout_context(
+                client, user_query, history, top_k, expand_min_siblings
+            )
+        except Exception as e:
+            logger.error(f"Fan-out retrieval failed for user query '{user_query}': {e}")
+            return []
+    return retrieve_routed_context(
+        client, user_query, history, top_k, expand_min_siblings
+    )
+
+
+def routed_collection(domain: str | None, confidence: float) -> str:
+    """Map a routed domain to its collection, defaulting to 'criminal_code'."""
+    collection = COLLECTION_MAP.get(domain)
+    if not collection:
+        logger.warning(
+            f"No collection mapped for domain '{domain}', "
+            "defaulting to 'criminal_code'"
+        )
+        collection = "criminal_code"
+    logger.info(
+        f" Routed query to collection: '{collection}' based on domain: "
+        f"'{domain}' (confidence {confidence:.2f})"
+    )
+    return collection
+
+
+def retrieve_routed_context(
+    client: QdrantClient,
+    user_query: str,
+    history: list[BaseMessage] | None = None,
+    top_k: int = 5,
+    expand_min_siblings: int = 2,
+):
+    try:
+        domain, confidence, _, routing_vector = route_query(client, user_query, history)
+        collection = routed_collection(domain, confidence)
+
+        query_vector = collection_query_vector(user_query, collection, routing_vector)
+
+        if query_vector is None or query_vector.ndim != 1 or not query_vector.size:
             logger.error(" Embedding failed or returned invalid format.")
             return []
 
-        return client.search(
-            collection_name=collection,
-            query_vector=query_vector,
-            limit=top_k,
-            with_payload=True,
+        return search_collection(
+            client, collection, user_query, query_vector, top_k, expand_min_siblings
         )
 
     except Exception as e:
         logger.error(f"Retrieval failed for user query '{user_query}': {e}")
         return []
+
+
+async def aretrieve_context(
+    client,
+    user_query: str,
+    history: list[BaseMessage] | None = None,
+    top_k: int = 5,
+    expand_min_siblings: int = 2,
+):
+    """``retrieve_context`` on an async vector-store client.
+
+    Embedding and routing run in worker threads; vector-store calls are
+    awaited, so the event loop stays free while Qdrant answers.
+    """
+    try:
+        if RETRIEVAL_MODE == "fanout":
+            return await aretrieve_fanout_context(
+                client, user_query, history, top_k, expand_min_siblings
+            )
+        return await aretrieve_routed_context(
+            client, user_query, history, top_k, expand_min_siblings
+        )
+    except Exception as e:
+        logger.error(f"Retrieval failed for user query '{user_query}': {e}")
+        return []
+
+
+def route_with_shared_client(user_query, history, llm_fallback=True):
+    # The router samples collections once to build its centroids, which is
+    # simplest with the sync client.
+    return route_query(get_vector_store(), user_query, history, llm_fallback)
+
+
+async def aretrieve_routed_context(
+    client,
+    user_query: str,
+    history: list[BaseMessage] | None = None,
+    top_k: int = 5,
+    expand_min_siblings: int = 2,
+):
+    domain, confidence, _, routing_vector = await asyncio.to_thread(
+        route_with_shared_client, user_query, history
+    )
+    collection = routed_collection(domain, confidence)
+    query_vector = await asyncio.to_thread(
+        collection_query_vector, user_query, collection, routing_vector
+    )
+    return await asearch_collection(
+        client, collection, user_query, query_vector, top_k, expand_min_siblings
+    )
+
+
+async def aretrieve_fanout_context(
+    client,
+    user_query: str,
+    history: list[BaseMessage] | None = None,
+    top_k: int = 5,
+    expand_min_siblings: int = 2,
+):
+    """``retrieve_fanout_context`` with the collections searched as tasks."""
+    _, _, probabilities, routing_vector = await asyncio.to_thread(
+        route_with_shared_client, user_query, history, False
+    )
+    priors = domain_priors(probabilities)
+    exists = await asyncio.gather(
+        *(client.collection_exists(collection_name=c) for c in COLLECTION_MAP.values())
+    )
+    domains = [domain for domain, ok in zip(COLLECTION_MAP, exists, strict=True) if ok]
+
+    async def search(domain):
+        collection = COLLECTION_MAP[domain]
+        query_vector = await asyncio.to_thread(
+            collection_query_vector, user_query, collection, routing_vector
+        )
+        return await asearch_collection(
+            client,
+            collection,
+            user_query,
+            query_vector,
+            top_k * FANOUT_CANDIDATES,
+            expand_min_siblings,
+        )
+
+    results = await asyncio.gather(
+        *(search(domain) for domain in domains), return_exceptions=True
+    )
+    return fuse_fanout_results(domains, results, priors, top_k)
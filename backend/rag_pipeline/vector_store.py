@@ -0,0 +1,644 @@
+import asyncio
+import contextlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import weakref
+from functools import partial
+
+import numpy as np
+from dotenv import load_dotenv
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.models import (
+    CollectionDescription,
+    CollectionsResponse,
+    CountResult,
+    Distance,
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    HasIdCondition,
+    MatchAny,
+    MatchValue,
+    PointIdsList,
+    Record,
+    ScoredPoint,
+    UpdateResult,
+    UpdateStatus,
+)
+from rag_pipeline.logger_config import get_logger
+
+load_dotenv()
+logger = get_logger(__name__)
+
+# "qdrant" talks to the server at QDRANT_URL; "local" searches in-process
+VECTOR_STORE = os.getenv("VECTOR_STORE", "qdrant")
+LOCAL_VECTOR_STORE_PATH = os.getenv(
+    "LOCAL_VECTOR_STORE_PATH", os.path.join(os.getcwd(), "vector_store")
+)
+QDRANT_URL = os.getenv("QDRANT_URL")
+QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+# gRPC has less per-call overhead than REST, notably for upserts
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "true").lower() == "true"
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", "60"))
+QDRANT_KEEPALIVE_MS = int(os.getenv("QDRANT_KEEPALIVE_MS", "30000"))
+# Health-checked connection attempts before giving up
+QDRANT_CONNECT_RETRIES = int(os.getenv("QDRANT_CONNECT_RETRIES", "3"))
+
+# Rows allocated when a collection's vector file first grows
+LOCAL_VECTOR_STORE_MIN_ROWS = 1024
+
+
+class LocalCollection:
+    """One collection: a memory-mapped float32 matrix plus SQLite payloads.
+
+    Row ``i`` of ``vectors.f32`` holds the vector of the point stored at row
+    ``i`` in ``points.sqlite3``. Rows freed by deletes are reused. Payloads
+    are also kept in memory so filters and results need no disk reads.
+
+    Several processes (e.g. the ingestion and retrieval apps) may open the
+    same collection. Writes hold SQLite's write lock, and every operation
+    first reloads the in-memory state if another connection has committed
+    since, which SQLite's ``data_version`` reports cheaply.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.dim = meta["size"]
+        self.distance = Distance(meta["distance"])
+        self.lock = threading.RLock()
+
+        self.conn = sqlite3.connect(
+            os.path.join(path, "points.sqlite3"), check_same_thread=False
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS points ("
+            "row INTEGER PRIMARY KEY, id TEXT UNIQUE, payload TEXT)"
+        )
+        self.conn.commit()
+        self.db_inode = os.stat(os.path.join(path, "points.sqlite3")).st_ino
+
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        if not os.path.exists(self.vectors_path):
+            open(self.vectors_path, "wb").close()
+        self.vectors = None
+        self.data_version = None
+        self.refresh()
+
+    def load(self):
+        """(Re)load ids, payloads and the vector map from disk."""
+        self.open_vectors()
+        self.ids = [None] * self.capacity
+        self.payloads = [None] * self.capacity
+        self.rows = {}
+        for row, point_id, payload in self.conn.execute(
+            "SELECT row, id, payload FROM points"
+        ):
+            self.ids[row] = point_id
+            self.payloads[row] = json.loads(payload)
+            self.rows[point_id] = row
+        self.live = np.zeros(self.capacity, dtype=bool)
+        self.live[list(self.rows.values())] = True
+        # Rows below ``size`` have been written at least once
+        self.size = max(self.rows.values(), default=-1) + 1
+        self.free = list(set(range(self.size)) - set(self.rows.values()))
+        # Per-field arrays of payload values for vectorized filters
+        self.field_values = {}
+
+    def refresh(self):
+        """Reload if another connection committed since the last load."""
+        with self.lock:
+            version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != self.data_version:
+                self.load()
+                self.data_version = version
+
+    def is_stale(self):
+        """Whether the collection was deleted or recreated on disk."""
+        try:
+            inode = os.stat(os.path.join(self.path, "points.sqlite3")).st_ino
+        except FileNotFoundError:
+            return True
+        return inode != self.db_inode
+
+    @contextlib.contextmanager
+    def write_transaction(self):
+        """Hold the write lock, so other processes' writers wait their turn.
+
+        Their changes are loaded first, so no row is allocated twice.
+        """
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.refresh()
+                yield
+            except BaseException:
+                self.conn.rollback()
+                # The in-memory state may be ahead of the database now.
+                self.data_version = None
+                raise
+            self.conn.commit()
+            self.field_values.clear()
+
+    def open_vectors(self):
+        """Map the vector file, sized to whole rows, as a writable matrix."""
+        size = os.path.getsize(self.vectors_path)
+        self.capacity = size // (4 * self.dim)
+        self.vectors = (
+            np.memmap(
+                self.vectors_path,
+                dtype=np.float32,
+                mode="r+",
+                shape=(self.capacity, self.dim),
+            )
+            if self.capacity
+            else np.empty((0, self.dim), dtype=np.float32)
+        )
+
+    def grow(self, needed):
+        """Extend the vector file to at least ``needed`` rows, doubling capacity."""
+        capacity = max(LOCAL_VECTOR_STORE_MIN_ROWS, self.capacity * 2, needed)
+        if isinstance(self.vectors, np.memmap):
+            self.vectors.flush()
+        with open(self.vectors_path, "r+b") as f:
+            f.truncate(capacity * 4 * self.dim)
+        extra = capacity - self.capacity
+        self.open_vectors()
+        self.ids.extend([None] * extra)
+        self.payloads.extend([None] * extra)
+        self.live = np.concatenate([self.live, np.zeros(extra, dtype=bool)])
+
+    def prepare(self, vectors):
+        """Validate dimensions, normalizing for cosine distance like Qdrant does."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.shape[-1] != self.dim:
+            raise ValueError(
+                f"Vector dimension {vectors.shape[-1]} does not match "
+                f"collection dimension {self.dim}"
+            )
+        if self.distance == Distance.COSINE:
+            norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+        return vectors
+
+    def upsert(self, points):
+        """Insert or replace ``points``, reusing freed rows."""
+        vectors = self.prepare([point.vector for point in points])
+        with self.write_transaction():
+            rows = []
+            next_row = self.size
+            for point in points:
+                point_id = str(point.id)
+                if point_id in self.rows:
+                    row = self.rows[point_id]
+                elif self.free:
+                    row = self.free.pop()
+                else:
+                    row, next_row = next_row, next_row + 1
+                self.rows[point_id] = row
+                rows.append(row)
+            self.size = max(self.size, max(rows) + 1)
+            if self.size > self.capacity:
+                self.grow(self.size)
+            for row, point, vector in zip(rows, points, vectors, strict=True):
+                self.vectors[row] = vector
+                self.ids[row] = str(point.id)
+                self.payloads[row] = point.payload or {}
+                self.live[row] = True
+            # Vectors reach the file before the rows that point to them.
+            self.vectors.flush()
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO points (row, id, payload) VALUES (?, ?, ?)",
+                [
+                    (row, str(point.id), json.dumps(point.payload or {}))
+                    for row, point in zip(rows, points, strict=True)
+                ],
+            )
+
+    def delete(self, point_ids):
+        """Delete the points with ``point_ids``, freeing their rows."""
+        with self.write_transaction():
+            rows = [
+                self.rows.pop(str(point_id))
+                for point_id in point_ids
+                if str(point_id) in self.rows
+            ]
+            for row in rows:
+                self.ids[row] = None
+                self.payloads[row] = None
+                self.live[row] = False
+            self.free.extend(rows)
+            self.conn.executemany(
+                "DELETE FROM points WHERE row = ?", [(row,) for row in rows]
+            )
+
+    def values(self, key):
+        """Array of every row's ``key`` payload value, cached until the next write."""
+        if key not in self.field_values:
+            values = np.empty(len(self.payloads), dtype=object)
+            for row, payload in enumerate(self.payloads):
+                values[row] = payload.get(key) if payload else None
+            self.field_values[key] = values
+        return self.field_values[key]
+
+    def condition_mask(self, condition):
+        """Boolean row mask of one filter condition."""
+        if isinstance(condition, Filter):
+            return self.filter_mask(condition)
+        if isinstance(condition, HasIdCondition):
+            mask = np.zeros(self.capacity, dtype=bool)
+            rows = [self.rows.get(str(point_id)) for point_id in condition.has_id]
+            mask[[row for row in rows if row is not None]] = True
+            return mask
+        if isinstance(condition, FieldCondition):
+            values = self.values(condition.key)
+            if isinstance(condition.match, MatchValue):
+                return values == condition.match.value
+            if isinstance(condition.match, MatchAny):
+                wanted = set(condition.match.any)
+                return np.array([value in wanted for value in values], dtype=bool)
+        raise ValueError(
+            f"Unsupported filter condition {type(condition).__name__}: {condition!r}"
+        )
+
+    def filter_mask(self, query_filter):
+        """Boolean mask over rows of the live points matching ``query_filter``."""
+        mask = self.live.copy()
+        if query_filter is None:
+            return mask
+        for condition in query_filter.must or []:
+            mask &= self.condition_mask(condition)
+        for condition in query_filter.must_not or []:
+            mask &= ~self.condition_mask(condition)
+        if query_filter.should:
+            should = np.zeros(self.capacity, dtype=bool)
+            for condition in query_filter.should:
+                should |= self.condition_mask(condition)
+            mask &= should
+        return mask
+
+    def select_payload(self, row, with_payload):
+        """Payload of ``row`` restricted to ``with_payload`` (True, False or keys)."""
+        if not with_payload:
+            return None
+        payload = self.payloads[row]
+        if with_payload is True:
+            return dict(payload)
+        return {key: payload[key] for key in with_payload if key in payload}
+
+    def record(self, row, with_payload, with_vectors):
+        """Row as a Qdrant Record."""
+        return Record(
+            id=self.ids[row],
+            payload=self.select_payload(row, with_payload),
+            vector=self.vectors[row].tolist() if with_vectors else None,
+        )
+
+    def search(self, query_vector, limit, query_filter, with_payload, with_vectors):
+        """Return the ``limit`` best matches of ``query_vector`` among filtered rows."""
+        query = self.prepare(query_vector)
+        with self.lock:
+            self.refresh()
+            mask = self.filter_mask(query_filter)[: self.size]
+            matches = int(mask.sum())
+            if not matches:
+                return []
+            # Score every row in place and mask afterwards, which is cheaper
+            # than gathering the matching rows into a new matrix.
+            matrix = self.vectors[: self.size]
+            if self.distance == Distance.EUCLID:
+                # Qdrant reports the distance itself; smaller is better.
+                scores = np.linalg.norm(matrix - query, axis=1)
+                ranking = -scores
+            else:
+                scores = ranking = matrix @ query
+            ranking = np.where(mask, ranking, -np.inf)
+            limit = min(limit, matches)
+            top = np.argpartition(ranking, -limit)[-limit:]
+            top = top[np.argsort(ranking[top])[::-1]]
+            return [
+                ScoredPoint(
+                    id=self.ids[row],
+                    version=0,
+                    score=float(scores[row]),
+                    payload=self.select_payload(row, with_payload),
+                    vector=self.vectors[row].tolist() if with_vectors else None,
+                )
+                for row in top
+            ]
+
+    def scroll(self, scroll_filter, limit, offset, with_payload, with_vectors):
+        """Page through matching points in row order, like Qdrant's scroll."""
+        with self.lock:
+            self.refresh()
+            rows = np.flatnonzero(self.filter_mask(scroll_filter))
+            if offset is not None:
+                start = self.rows.get(str(offset), self.capacity)
+                rows = rows[rows >= start]
+            page = [
+                self.record(row, with_payload, with_vectors) for row in rows[:limit]
+            ]
+            next_offset = self.ids[rows[limit]] if len(rows) > limit else None
+            return page, next_offset
+
+    def retrieve(self, ids, with_payload, with_vectors):
+        """Return the stored points among ``ids``, skipping unknown ones."""
+        with self.lock:
+            self.refresh()
+            rows = [self.rows.get(str(point_id)) for point_id in ids]
+            return [
+                self.record(row, with_payload, with_vectors)
+                for row in rows
+                if row is not None
+            ]
+
+    def close(self):
+        """Flush the vector file and close the database."""
+        with self.lock:
+            if isinstance(self.vectors, np.memmap):
+                self.vectors.flush()
+            self.conn.close()
+
+
+class LocalVectorStore:
+    """Exact, in-process replacement for the QdrantClient calls we make.
+
+    Each collection lives under ``path`` as a memory-mapped float32 matrix
+    searched by brute force with numpy, which beats a network round trip
+    for collections of a few thousand sections. Payload filters support
+    ``must``/``must_not``/``should`` with MatchValue, MatchAny and
+    HasIdCondition. Payload indexes are accepted but not needed, since
+    filters are vectorized over every row. Safe to share between threads.
+    """
+
+    def __init__(self, path=LOCAL_VECTOR_STORE_PATH):
+        self.path = path
+        self.collections = {}
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def collection_path(self, collection_name):
+        """Directory holding ``collection_name``'s files."""
+        return os.path.join(self.path, collection_name)
+
+    def collection(self, collection_name):
+        """Open ``collection_name``, reopening it if it was recreated on disk."""
+        with self.lock:
+            cached = self.collections.get(collection_name)
+            if cached is not None and cached.is_stale():
+                # Deleted or recreated by another process
+                cached.close()
+                del self.collections[collection_name]
+            if collection_name not in self.collections:
+                path = self.collection_path(collection_name)
+                if not os.path.exists(os.path.join(path, "meta.json")):
+                    raise ValueError(f"Collection {collection_name} not found")
+                self.collections[collection_name] = LocalCollection(path)
+            return self.collections[collection_name]
+
+    def collection_exists(self, collection_name):
+        """Whether ``collection_name`` has been created."""
+        return os.path.exists(
+            os.path.join(self.collection_path(collection_name), "meta.json")
+        )
+
+    def get_collections(self):
+        """List the collections like ``QdrantClient.get_collections``."""
+        names = sorted(
+            name for name in os.listdir(self.path) if self.collection_exists(name)
+        )
+        return CollectionsResponse(
+            collections=[CollectionDescription(name=name) for name in names]
+        )
+
+    def create_collection(self, collection_name, vectors_config, **kwargs):
+        """Create a collection; HNSW, quantization and other settings are ignored."""
+        distance = Distance(vectors_config.distance)
+        if distance == Distance.MANHATTAN:
+            raise ValueError("Manhattan distance is not supported by the local store")
+        with self.lock:
+            if self.collection_exists(collection_name):
+                raise ValueError(f"Collection {collection_name} already exists")
+            path = self.collection_path(collection_name)
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"size": vectors_config.size, "distance": distance.value}, f)
+        logger.info(f"Created local collection {collection_name}")
+        return True
+
+    def delete_collection(self, collection_name, **kwargs):
+        """Delete ``collection_name`` and its files; False if it did not exist."""
+        with self.lock:
+            collection = self.collections.pop(collection_name, None)
+            if collection:
+                collection.close()
+            if not self.collection_exists(collection_name):
+                return False
+            shutil.rmtree(self.collection_path(collection_name))
+        return True
+
+    def create_payload_index(self, collection_name, field_name, **kwargs):
+        """Accept a payload index request; filters need none locally."""
+        self.collection(collection_name)
+        return UpdateResult(operation_id=0, status=UpdateStatus.COMPLETED)
+
+    def upsert(self, collection_name, points, **kwargs):
+        """Insert or replace ``points`` in ``collection_name``."""
+        if points:
+            self.collection(collection_name).upsert(list(points))
+        return UpdateResult(operation_id=0, status=UpdateStatus.COMPLETED)
+
+    def delete(self, collection_name, points_selector, **kwargs):
+        """Delete points by ID list or by filter."""
+        collection = self.collection(collection_name)
+        if isinstance(points_selector, PointIdsList):
+            point_ids = points_selector.points
+        elif isinstance(points_selector, FilterSelector):
+            point_ids, _ = collection.scroll(
+                points_selector.filter, collection.capacity, None, False, False
+            )
+            point_ids = [point.id for point in point_ids]
+        else:
+            point_ids = points_selector
+        collection.delete(point_ids)
+        return UpdateResult(operation_id=0, status=UpdateStatus.COMPLETED)
+
+    def search(
+        self,
+        collection_name,
+        query_vector,
+        limit=10,
+        query_filter=None,
+        with_payload=True,
+        with_vectors=False,
+        score_threshold=None,
+        **kwargs,
+    ):
+        """Nearest neighbours of ``query_vector``, like ``QdrantClient.search``."""
+        hits = self.collection(collection_name).search(
+            query_vector, limit, query_filter, with_payload, with_vectors
+        )
+        if score_threshold is not None:
+            hits = [hit for hit in hits if hit.score >= score_threshold]
+        return hits
+
+    def scroll(
+        self,
+        collection_name,
+        scroll_filter=None,
+        limit=10,
+        offset=None,
+        with_payload=True,
+        with_vectors=False,
+        **kwargs,
+    ):
+        """Page through points, like ``QdrantClient.scroll``."""
+        return self.collection(collection_name).scroll(
+            scroll_filter, limit, offset, with_payload, with_vectors
+        )
+
+    def retrieve(
+        self, collection_name, ids, with_payload=True, with_vectors=False, **kwargs
+    ):
+        """Fetch points by ID, like ``QdrantClient.retrieve``."""
+        return self.collection(collection_name).retrieve(
+            ids, with_payload, with_vectors
+        )
+
+    def count(self, collection_name, count_filter=None, **kwargs):
+        """Count points matching ``count_filter``."""
+        collection = self.collection(collection_name)
+        with collection.lock:
+            collection.refresh()
+            return CountResult(count=int(collection.filter_mask(count_filter).sum()))
+
+    def close(self, **kwargs):
+        """Close every open collection."""
+        with self.lock:
+            for collection in self.collections.values():
+                collection.close()
+            self.collections.clear()
+
+
+class AsyncLocalVectorStore:
+    """Async facade over a LocalVectorStore; calls run in worker threads."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getattr__(self, name):
+        """Wrap the store's method ``name`` as a coroutine."""
+        method = getattr(self.store, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        return call
+
+
+def qdrant_options(url=None, api_key=None):
+    """Return connection settings shared by the sync and async Qdrant clients."""
+    return {
+        "url": url or QDRANT_URL,
+        "api_key": api_key or QDRANT_API_KEY,
+        "prefer_grpc": QDRANT_PREFER_GRPC,
+        "grpc_port": QDRANT_GRPC_PORT,
+        "timeout": QDRANT_TIMEOUT,
+        # Ping idle channels so connections kept between requests stay usable
+        "grpc_options": {
+            "grpc.keepalive_time_ms": QDRANT_KEEPALIVE_MS,
+            "grpc.keepalive_permit_without_calls": 1,
+        },
+    }
+
+
+def connect_vector_store(url=None, api_key=None):
+    """Create a QdrantClient, or a LocalVectorStore when VECTOR_STORE=local.
+
+    Prefer ``get_vector_store``, which reuses one client per process.
+    """
+    if VECTOR_STORE == "local":
+        logger.info(f"Using local vector store at {LOCAL_VECTOR_STORE_PATH}")
+        return LocalVectorStore(LOCAL_VECTOR_STORE_PATH)
+    if VECTOR_STORE != "qdrant":
+        raise ValueError(f"Unknown vector store: {VECTOR_STORE}")
+    options = qdrant_options(url, api_key)
+    logger.info(
+        f"Connecting to Qdrant at {options['url']}"
+        f"{' (gRPC)' if options['prefer_grpc'] else ''}"
+    )
+    return QdrantClient(**options)
+
+
+def check_health(client):
+    """Raise if the vector store can't be reached; returns its collections."""
+    return [c.name for c in client.get_collections().collections]
+
+
+async def acheck_health(client):
+    return [c.name for c in (await client.get_collections()).collections]
+
+
+def connect_with_retries(connect, retries=QDRANT_CONNECT_RETRIES):
+    for attempt in range(retries):
+        try:
+            client = connect()
+            check_health(client)
+            return client
+        except Exception as e:
+            logger.error(
+                f"Vector store health check failed "
+                f"(attempt {attempt + 1}/{retries}): {e}"
+            )
+            if attempt + 1 == retries:
+                raise
+            time.sleep(2**attempt)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_vector_store(url=None, api_key=None):
+    """Return the process-wide sync client, health-checked on first use.
+
+    gRPC channels are thread-safe, so ingestion workers and request threads
+    all share it.
+    """
+    key = (url or QDRANT_URL, api_key or QDRANT_API_KEY)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = connect_with_retries(
+                partial(connect_vector_store, url, api_key)
+            )
+        return _clients[key]
+
+
+_async_clients = weakref.WeakKeyDictionary()
+_async_client_locks = weakref.WeakKeyDictionary()
+
+
+async def get_async_vector_store():
+    """Return the async client for the running event loop, made on first use.
+
+    gRPC channels are bound to the loop that opened them, so each loop (in
+    practice the server's one loop) gets its own client.
+    """
+    loop = asyncio.get_running_loop()
+    # Tasks racing on first use wait here, so only one client is created.
+    async with _async_client_locks.setdefault(loop, asyncio.Lock()):
+        if loop not in _async_clients:
+            if VECTOR_STORE == "local":
+                client = AsyncLocalVectorStore(get_vector_store())
+            else:
+                client = AsyncQdrantClient(**qdrant_options())
+            await acheck_health(client)
+            _async_clients[loop] = client
+    return _async_clients[loop]
@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+import pytest
+from qdrant_client.models import Record, ScoredPoint
+from rag_pipeline import bm25
+from rag_pipeline.retriever.routing import (
+    fusion_steps,
+    reciprocal_rank_fusion,
+    run_steps,
+)
+
+DOCUMENTS = {
+    "1": "Section 302. Punishment for murder with imprisonment for life.",
+    "2": "Section 378. Theft of movable property out of possession.",
+    "3": "Section 379. Punishment for theft, imprisonment or fine.",
+    "4": "Section 13. Marriage and divorce of the parties.",
+}
+
+
+class ContentClient:
+    """Serves ``DOCUMENTS`` through the scroll/retrieve calls BM25 makes."""
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def scroll(self, collection_name, limit, offset, **kwargs):
+        ids = sorted(self.documents)
+        start = offset or 0
+        points = [
+            Record(id=point_id, payload={"content": self.documents[point_id]})
+            for point_id in ids[start : start + limit]
+        ]
+        next_offset = start + limit if start + limit < len(ids) else None
+        return points, next_offset
+
+    def retrieve(self, collection_name, ids, with_payload):
+        return [
+            Record(id=point_id, payload={"content": self.documents[point_id]})
+            for point_id in ids
+        ]
+
+
+@pytest.fixture
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(bm25, "BM25_INDEX_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_memmapped_index_ranks_matching_sections(index_dir):
+    assert bm25.build_collection_index(ContentClient(DOCUMENTS), "acts") == 4
+    index = bm25.load_collection_index("acts")
+
+    assert isinstance(index.postings_docs, np.memmap)
+    results = index.search("punishment for theft", limit=3)
+    # 379 matches both terms; 302 matches one and is shorter than 378.
+    assert [point_id for point_id, _ in results] == ["3", "1", "2"]
+    assert results[0][1] > results[1][1] > 0
+    assert index.search("section 378", limit=1)[0][0] == "2"
+    assert index.search("unknown words", limit=5) == []
+
+
+def test_allowed_ids_scope_the_search(index_dir):
+    bm25.build_collection_index(ContentClient(DOCUMENTS), "acts")
+    index = bm25.load_collection_index("acts")
+
+    results = index.search("punishment theft", limit=5, allowed_ids={"1", "4"})
+    assert [point_id for point_id, _ in results] == ["1"]
+
+
+def test_rebuild_publishes_a_new_version(index_dir):
+    client = ContentClient(dict(DOCUMENTS))
+    bm25.build_collection_index(client, "acts")
+    first = bm25.load_collection_index("acts")
+    assert bm25.load_collection_index("acts") is first
+
+    client.documents["5"] = "Section 420. Cheating and dishonestly inducing."
+    bm25.build_collection_index(client, "acts")
+    bm25.build_collection_index(client, "acts")
+
+    current = bm25.load_collection_index("acts")
+    assert current is not first
+    assert current.search("cheating", limit=1)[0][0] == "5"
+    versions = [entry for entry in os.listdir(index_dir / "acts") if entry[0] == "v"]
+    assert len(versions) == 2  # the current version and the one before it
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a", "d"]], k=60)
+
+    assert [point_id for point_id, _ in fused] == ["a", "c", "b", "d"]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+    assert fused[-1][1] == pytest.approx(1 / 63)
+
+
+def test_fusion_fetches_sparse_only_hits():
+    dense = [
+        ScoredPoint(id="1", version=0, score=0.9, payload={"content": "murder"}),
+        ScoredPoint(id="2", version=0, score=0.8, payload={"content": "theft"}),
+    ]
+    sparse = [("3", 7.5), ("2", 5.0)]
+
+    hits = run_steps(
+        ContentClient(DOCUMENTS), fusion_steps("acts", dense, sparse, limit=3)
+    )
+
+    assert [hit.id for hit in hits] == ["2", "1", "3"]
+    assert hits[2].payload["content"] == DOCUMENTS["3"]
+    assert hits[0].score == pytest.approx(1 / 62 + 1 / 62)
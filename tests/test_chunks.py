@@ -0,0 +1,103 @@
+from chunks import iter_legal_chunks, make_chunk_id
+from qdrant_client.models import Record
+from rag_pipeline.retriever.routing import merge_child_chunks
+
+
+def word_count(text):
+    return len(text.split())
+
+
+def paragraph(label, words):
+    return " ".join(f"{label}{i}" for i in range(words))
+
+
+SECTION = {
+    "PartID": "Part-1",
+    "PartTitle": "General",
+    "ChapterID": "Chapter-2",
+    "ChapterTitle": "Contracts",
+    "SectionID": "145.",
+    "SectionTitle": "Void contracts",
+    "Description": paragraph("d", 10),
+    "Sub-sections": [
+        {"Sub-sectionID": f"({n})", "Description": paragraph(f"s{n}-", 20)}
+        for n in range(1, 5)
+    ],
+}
+# The metadata header is 13 words, leaving 52 per child for the body.
+MAX_TOKENS = 65
+
+
+def test_chunk_ids_are_stable_uuid5_names():
+    assert make_chunk_id("civil_code", "Part-1_Chapter-2_145.") == (
+        "dee43f9c-15b5-52b1-8d29-5b0cb5a367c8"
+    )
+    assert make_chunk_id("civil_code", "Part-1_Chapter-2_145.", 1) == (
+        "af108a12-5964-5fd2-a4b4-336dca6bc56f"
+    )
+    assert make_chunk_id("civil_code", "Part-1_Chapter-2_145.", 0, 2) == (
+        "9ac8b9cc-ff83-50cc-8d5f-15a481091b50"
+    )
+
+
+def test_repeated_sections_get_distinct_ids():
+    chunks = list(iter_legal_chunks([SECTION, SECTION], act="civil_code"))
+
+    assert [chunk["id"] for chunk in chunks] == [
+        make_chunk_id("civil_code", "Part-1_Chapter-2_145."),
+        make_chunk_id("civil_code", "Part-1_Chapter-2_145.", 1),
+    ]
+    hashes = {chunk["metadata"]["content_hash"] for chunk in chunks}
+    assert len(hashes) == 1
+
+
+def test_long_section_splits_on_subsection_boundaries():
+    (whole,) = iter_legal_chunks([SECTION], act="civil_code")
+    children = list(
+        iter_legal_chunks(
+            [SECTION], act="civil_code", max_tokens=MAX_TOKENS, count_tokens=word_count
+        )
+    )
+
+    header, _, body = whole["content"].partition("\n\n")
+    bodies = [child["content"].partition("\n\n")[2] for child in children]
+    assert [b.split("\n\n")[0].split(":")[0] for b in bodies] == [
+        "d0 d1 d2 d3 d4 d5 d6 d7 d8 d9",
+        "Sub-section 1",
+        "Sub-section 2",
+        "Sub-section 3",
+    ]
+    for index, (child, child_body) in enumerate(zip(children, bodies, strict=True)):
+        metadata = child["metadata"]
+        assert child["content"].startswith(header + "\n\n")
+        assert word_count(child["content"]) <= MAX_TOKENS
+        assert child["id"] == make_chunk_id(
+            "civil_code", "Part-1_Chapter-2_145.", 0, index
+        )
+        assert metadata["ParentID"] == whole["id"]
+        assert (metadata["ChunkIndex"], metadata["ChunkCount"]) == (index, 4)
+        offset = metadata["BodyOffset"]
+        assert body[offset : offset + len(child_body)] == child_body
+        assert body[:offset].endswith(metadata["BodySeparator"])
+    assert [c["metadata"]["OverlapUnits"] for c in children] == [0, 1, 1, 1]
+
+
+def test_children_merge_back_into_the_parent():
+    (whole,) = iter_legal_chunks([SECTION], act="civil_code")
+    children = iter_legal_chunks(
+        [SECTION],
+        act="civil_code",
+        max_tokens=MAX_TOKENS,
+        overlap_units=0,
+        count_tokens=word_count,
+    )
+    points = [
+        Record(id=c["id"], payload={"content": c["content"], **c["metadata"]})
+        for c in children
+    ]
+
+    merged = merge_child_chunks(points[::-1])
+
+    assert merged["content"] == whole["content"]
+    assert merged["title"] == whole["title"]
+    assert "ParentID" not in merged
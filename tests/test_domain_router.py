@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from qdrant_client.models import Distance, PointStruct, VectorParams
+from rag_pipeline.retriever import domain_router
+from rag_pipeline.retriever.domain_router import DomainRouter, get_domain_router
+from rag_pipeline.vector_store import LocalVectorStore
+
+COLLECTION_MAP = {"criminal": "criminal_code", "civil": "civil_code"}
+
+
+def make_router(temperature):
+    return DomainRouter(
+        ["criminal", "civil", "labour"],
+        np.eye(3),
+        "model",
+        temperature=temperature,
+    )
+
+
+def test_low_temperature_routes_confidently():
+    domain, confidence, probabilities = make_router(0.02).route([0.9, 0.3, 0.1])
+
+    assert domain == "criminal"
+    assert confidence > 0.99
+    assert sum(probabilities.values()) == pytest.approx(1.0)
+
+
+def test_high_temperature_spreads_probability():
+    router = make_router(10.0)
+    domain, confidence, probabilities = router.route([0.9, 0.3, 0.1])
+
+    assert domain == "criminal"
+    assert confidence < 0.4
+    assert probabilities["civil"] > probabilities["labour"]
+    # Scaling the query vector does not change cosine similarities.
+    assert router.probabilities([9.0, 3.0, 1.0]) == pytest.approx(probabilities)
+
+
+def test_save_and_load_keep_counts(tmp_path):
+    path = str(tmp_path / "centroids.npz")
+    counts = {"criminal": 3, "civil": 5}
+    router = DomainRouter(["criminal", "civil"], np.eye(2), "model", counts)
+    router.save(path)
+
+    loaded = DomainRouter.load(path)
+
+    assert loaded.domains == ["criminal", "civil"]
+    assert loaded.counts == {"criminal": 3, "civil": 5}
+    np.testing.assert_allclose(loaded.centroids, router.centroids)
+
+
+class StubEmbedder:
+    model_id = "stub"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    path = str(tmp_path / "centroids.npz")
+    monkeypatch.setattr(domain_router, "ROUTER_CENTROIDS_PATH", path)
+    monkeypatch.setattr(domain_router, "ROUTER_RECHECK_SECONDS", 0)
+    monkeypatch.setattr(domain_router, "get_embedder", StubEmbedder)
+    monkeypatch.setattr(domain_router, "_router", None)
+    store = LocalVectorStore(str(tmp_path / "store"))
+    for domain, collection in COLLECTION_MAP.items():
+        store.create_collection(
+            collection, vectors_config=VectorParams(size=2, distance=Distance.COSINE)
+        )
+        vector = [1.0, 0.0] if domain == "criminal" else [0.0, 1.0]
+        add_points(store, collection, vector, range(3))
+    return store
+
+
+def add_points(store, collection, vector, ids):
+    points = [PointStruct(id=i, vector=vector, payload={"content": ""}) for i in ids]
+    store.upsert(collection, points=points)
+
+
+def test_router_is_rebuilt_when_a_collection_changes(store, monkeypatch):
+    router = get_domain_router(store, COLLECTION_MAP)
+    assert router.counts == {"criminal": 3, "civil": 3}
+    assert get_domain_router(store, COLLECTION_MAP) is router
+
+    # Another process ingests sections that move the civil centroid.
+    add_points(store, "civil_code", [1.0, 1.0], range(3, 9))
+    rebuilt = get_domain_router(store, COLLECTION_MAP)
+
+    assert rebuilt is not router
+    assert rebuilt.counts == {"criminal": 3, "civil": 9}
+    assert rebuilt.route([1.0, 1.0])[0] == "civil"
+    # The saved file is current, so a fresh process loads it without building.
+    monkeypatch.setattr(domain_router, "_router", None)
+    monkeypatch.setattr(domain_router, "build_domain_router", None)
+    assert get_domain_router(store, COLLECTION_MAP).counts == rebuilt.counts
@@ -0,0 +1,68 @@
+import itertools
+
+import numpy as np
+import pytest
+from rag_pipeline import embedding_cache
+from rag_pipeline.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Distinct, increasing last_used values make the LRU order deterministic.
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: float(next(ticks)))
+
+
+def make_cache(tmp_path, **limits):
+    return EmbeddingCache(path=str(tmp_path / "cache.sqlite3"), **limits)
+
+
+def test_hits_and_misses(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("model", "query", "What is theft?", [0.1, 0.2])
+
+    vectors = cache.get_many("model", "query", ["What  is theft? ", "murder"])
+
+    np.testing.assert_allclose(vectors[0], [0.1, 0.2])
+    assert vectors[0].dtype == np.float32
+    assert vectors[1] is None
+    assert cache.get("other-model", "query", "What is theft?") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    assert stats["entries"] == 1
+
+
+def test_vectors_persist_across_instances(tmp_path):
+    make_cache(tmp_path).put("model", "document", "Section 1", [1.0, 2.0])
+
+    reopened = make_cache(tmp_path, memory_entries=0)
+
+    np.testing.assert_allclose(reopened.get("model", "document", "Section 1"), [1, 2])
+    assert reopened.stats(exact=True)["bytes"] == 8
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = make_cache(tmp_path, max_entries=10)
+    for i in range(10):
+        cache.put("model", "document", f"section {i}", [float(i)])
+    assert cache.get("model", "document", "section 0") is not None
+
+    cache.put("model", "document", "section 10", [10.0])
+
+    # Evicts down to 90% of max_entries, oldest use first; section 0 was
+    # used after sections 1 and 2 were stored.
+    assert cache.get("model", "document", "section 0") is not None
+    assert cache.get("model", "document", "section 1") is None
+    assert cache.get("model", "document", "section 2") is None
+    assert cache.get("model", "document", "section 3") is not None
+    assert cache.stats(exact=True)["entries"] == 9
+
+
+def test_byte_limit_triggers_eviction(tmp_path, clock):
+    cache = make_cache(tmp_path, max_bytes=40 * 4)
+    for i in range(5):
+        cache.put("model", "document", f"section {i}", np.zeros(10))
+
+    assert cache.stats(exact=True)["bytes"] <= 40 * 4
+    assert cache.get("model", "document", "section 0") is None
+    assert cache.get("model", "document", "section 4") is not None
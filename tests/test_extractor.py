@@ -0,0 +1,26 @@
+from pathlib import Path
+
+import pypdfium2 as pdfium
+import pytest
+from extractor import extract_from_pdf
+
+CIVIL_CODE = Path(__file__).parents[1] / "data/raw/civil_code.pdf"
+# Enough of the act for several parts, chapters and page ranges per worker,
+# while keeping the test to a few seconds.
+SAMPLE_PAGES = 40
+
+
+@pytest.mark.skipif(not CIVIL_CODE.exists(), reason="data/raw/civil_code.pdf absent")
+def test_parallel_extraction_matches_serial(tmp_path):
+    source = pdfium.PdfDocument(str(CIVIL_CODE))
+    sample = pdfium.PdfDocument.new()
+    sample.import_pages(source, list(range(min(SAMPLE_PAGES, len(source)))))
+    pdf_path = str(tmp_path / "civil_code_sample.pdf")
+    sample.save(pdf_path)
+
+    serial = extract_from_pdf(pdf_path, workers=1)
+    parallel = extract_from_pdf(pdf_path, workers=4)
+
+    assert serial is not None
+    assert serial["sections"]
+    assert parallel == serial
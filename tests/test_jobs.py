@@ -0,0 +1,111 @@
+import importlib.util
+import threading
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from jobs import CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobManager
+
+APP_PATH = Path(__file__).parents[1] / "backend/rag_pipeline/extraction/app.py"
+
+
+def load_extraction_app():
+    # backend/app.py shadows the extraction service's "app" module name.
+    spec = importlib.util.spec_from_file_location("extraction_app", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def blocking_job(started, release):
+    def run(job):
+        job.start_stage("embed", total=3)
+        started.set()
+        release.wait(timeout=5)
+        job.advance(3)
+        return {"chunks": 3}
+
+    return run
+
+
+def test_job_runs_through_its_states():
+    manager = JobManager(max_workers=1)
+    started, release = threading.Event(), threading.Event()
+    job = manager.submit(blocking_job(started, release), description="act.pdf")
+
+    assert started.wait(timeout=5)
+    assert job.to_dict()["status"] == RUNNING
+    assert job.to_dict()["progress"] == {"embed": {"done": 0, "total": 3}}
+    release.set()
+    job.future.result(timeout=5)
+
+    state = job.to_dict()
+    assert state["status"] == SUCCEEDED
+    assert state["result"] == {"chunks": 3}
+    assert state["progress"]["embed"]["done"] == 3
+    assert manager.get(job.id) is job
+
+
+def test_failed_job_records_the_error():
+    def fail(job):
+        job.start_stage("extract")
+        raise ValueError("not a legal act")
+
+    job = JobManager().submit(fail)
+    job.future.result(timeout=5)
+
+    assert job.status == FAILED
+    assert job.error == "not a legal act"
+
+
+def test_cancel_stops_running_job_and_drops_queued_job():
+    manager = JobManager(max_workers=1)
+    started, release = threading.Event(), threading.Event()
+    running = manager.submit(blocking_job(started, release))
+    assert started.wait(timeout=5)
+    queued = manager.submit(blocking_job(threading.Event(), release))
+    assert queued.status == QUEUED
+
+    manager.cancel(queued.id)
+    assert queued.status == CANCELLED
+    manager.cancel(running.id)
+    release.set()
+    running.future.result(timeout=5)
+
+    assert running.status == CANCELLED
+    assert running.result is None
+    assert manager.cancel("missing") is None
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    app = load_extraction_app()
+    app.job_manager = JobManager(max_workers=1)
+
+    def fake_ingest(job, pdf_path, *, filename, act, pdf_sha256, **options):
+        job.start_stage("extract", total=1)
+        job.advance()
+        return {"act": act, "bytes": Path(pdf_path).stat().st_size}
+
+    monkeypatch.setattr(app, "ingest_pdf", fake_ingest)
+    return TestClient(app.app), app.job_manager
+
+
+def test_upload_returns_202_and_job_can_be_polled(client):
+    http, manager = client
+    response = http.post(
+        "/upload-pdf/",
+        files={"file": ("civil_code.pdf", b"%PDF-1.4 fake", "application/pdf")},
+    )
+
+    assert response.status_code == 202
+    body = response.json()
+    assert body["status_url"] == f"/jobs/{body['job_id']}"
+    manager.get(body["job_id"]).future.result(timeout=5)
+
+    job = http.get(body["status_url"]).json()
+    assert job["status"] == SUCCEEDED
+    assert job["result"] == {"act": "civil_code", "bytes": 13}
+    assert http.delete(body["status_url"]).status_code == 409
+    assert http.get("/jobs/unknown").status_code == 404
@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from rag_pipeline.llm import OllamaClient
+
+
+class FakeOllama:
+    """Answers /api/generate, tracking how many requests overlap."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+
+    async def __call__(self, request):
+        body = json.loads(request.content)
+        if body["model"] == "missing":
+            return httpx.Response(404, text="model not found")
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        return httpx.Response(200, json={"response": f" {body['prompt']} done "})
+
+
+def make_client(server, **options):
+    class MockedClient(OllamaClient):
+        async def create_client(self, timeout, connect_timeout, max_connections):
+            return httpx.AsyncClient(
+                base_url=self.base_url, transport=httpx.MockTransport(server)
+            )
+
+    return MockedClient(**options)
+
+
+@pytest.fixture
+def server():
+    return FakeOllama(delay=0.02)
+
+
+def test_sync_and_async_callers_share_one_client(server):
+    client = make_client(server)
+    try:
+        assert client.generate_sync("hello", "llama") == "hello done"
+
+        async def ask():
+            return await asyncio.gather(
+                *(client.generate(f"q{i}", "llama") for i in range(3))
+            )
+
+        # Each asyncio.run uses a new loop; the pooled client outlives both.
+        assert asyncio.run(ask()) == ["q0 done", "q1 done", "q2 done"]
+        assert asyncio.run(ask()) == ["q0 done", "q1 done", "q2 done"]
+        assert client.stats()["llama"]["calls"] == 7
+    finally:
+        client.close()
+
+
+def test_requests_per_model_are_limited(server):
+    client = make_client(server, model_concurrency=2)
+    try:
+
+        async def burst():
+            return await asyncio.gather(
+                *(client.generate(str(i), "llama") for i in range(6))
+            )
+
+        asyncio.run(burst())
+        assert server.max_active == 2
+        stats = client.stats()["llama"]
+        assert (stats["in_flight"], stats["waiting"]) == (0, 0)
+        assert stats["max_wait_seconds"] > 0
+    finally:
+        client.close()
+
+
+def test_errors_are_raised_and_counted(server):
+    client = make_client(server)
+    try:
+        with pytest.raises(RuntimeError, match="model not found"):
+            client.generate_sync("hello", "missing")
+        assert client.stats()["missing"]["errors"] == 1
+    finally:
+        client.close()
+
+
+def test_close_stops_the_background_loop(server):
+    client = make_client(server)
+    client.close()
+
+    assert not client.thread.is_alive()
+    assert client.client.is_closed
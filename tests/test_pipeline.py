@@ -0,0 +1,123 @@
+import itertools
+import threading
+
+import pipeline
+import pytest
+from jobs import JobCancelledError
+from pipeline import IngestionPipeline
+
+
+class FakeStore:
+    """Records what the pipeline's stages embed and upsert."""
+
+    def __init__(self, fail_on_group=None):
+        self.fail_on_group = fail_on_group
+        self.groups = []
+        self.upserted = []
+        self.collections = []
+        self.lock = threading.Lock()
+
+    def embed_chunks(self, chunks, collection=None, progress=None):
+        self.groups.append([chunk["id"] for chunk in chunks])
+        if len(self.groups) == self.fail_on_group:
+            raise RuntimeError("embedding quota exhausted")
+        for chunk in chunks:
+            chunk["vector"] = [float(chunk["id"]), 1.0]
+        if progress:
+            progress(len(chunks))
+        return chunks
+
+    def ensure_collection(self, client, collection, dim):
+        self.collections.append((collection, dim))
+
+    def upload_chunks(self, client, collection, chunks, progress=None, **options):
+        with self.lock:
+            self.upserted.extend(chunk["id"] for chunk in chunks)
+        if progress:
+            progress(len(chunks))
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = FakeStore()
+    for name in ("embed_chunks", "ensure_collection", "upload_chunks"):
+        monkeypatch.setattr(pipeline, name, getattr(store, name))
+    return store
+
+
+def chunks(count):
+    return ({"id": i, "content": f"section {i}"} for i in range(count))
+
+
+def make_pipeline(**options):
+    options = {"embed_group_size": 10, "upsert_batch_size": 4, **options}
+    return IngestionPipeline(None, "acts", queue_size=2, **options)
+
+
+def run_with_timeout(target, timeout=10):
+    """Run ``target`` in a thread; the test fails if it does not finish."""
+    outcome = {}
+
+    def call():
+        try:
+            outcome["result"] = target()
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=call, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "pipeline did not shut down"
+    return outcome
+
+
+def test_every_chunk_is_embedded_and_upserted_once(store):
+    embedded, upserted = [], []
+    stats = make_pipeline(
+        upsert_workers=3,
+        embed_progress=embedded.append,
+        upsert_progress=upserted.append,
+    ).run(chunks(57))
+
+    assert store.groups == [list(range(i, min(i + 10, 57))) for i in range(0, 57, 10)]
+    assert sorted(store.upserted) == list(range(57))
+    assert store.collections == [("acts", 2)]
+    assert sum(embedded) == sum(upserted) == 57
+    assert {name: s["items"] for name, s in stats.items()} == {
+        "chunk": 57,
+        "embed": 57,
+        "upsert": 57,
+    }
+
+
+def test_single_upsert_worker_keeps_source_order(store):
+    make_pipeline(upsert_workers=1).run(chunks(23))
+
+    assert store.upserted == list(range(23))
+
+
+def test_stage_error_stops_an_endless_source(store):
+    store.fail_on_group = 2
+
+    outcome = run_with_timeout(
+        lambda: make_pipeline(upsert_workers=2).run(
+            {"id": i, "content": "text"} for i in itertools.count()
+        )
+    )
+
+    assert str(outcome["error"]) == "embedding quota exhausted"
+    assert set(store.upserted) <= set(range(10))
+
+
+def test_progress_callback_error_cancels_the_run(store):
+    def cancel(_):
+        raise JobCancelledError("cancelled")
+
+    outcome = run_with_timeout(
+        lambda: make_pipeline(upsert_workers=2, upsert_progress=cancel).run(
+            chunks(1000)
+        )
+    )
+
+    assert isinstance(outcome["error"], JobCancelledError)
+    assert len(store.upserted) < 1000
@@ -0,0 +1,133 @@
+import pytest
+from rag_pipeline import rerank
+from rag_pipeline.rerank import RerankCache, RerankService
+
+
+class StubReranker:
+    """Mirrors mxbai_rerank's ``BaseReranker._compute_scores`` signature."""
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.calls = []
+
+    def _compute_scores(self, *, queries, documents, batch_size, show_progress):
+        self.calls.append((list(queries), list(documents)))
+        if self.fail_on in documents:
+            raise RuntimeError("forward pass failed")
+        pairs = zip(queries, documents, strict=True)
+        return [float(len(q) * 100 + len(d)) for q, d in pairs]
+
+
+def expected(query, documents):
+    return [float(len(query) * 100 + len(d)) for d in documents]
+
+
+def make_service(model, batch_size=6):
+    # A long max_wait makes the worker hold the batch until it is full.
+    return RerankService(
+        model=model, batch_size=batch_size, max_wait=5, cache_entries=0
+    )
+
+
+def test_mixed_queries_share_a_forward_pass():
+    model = StubReranker()
+    service = make_service(model)
+    requests = [
+        ("theft", ["a", "bb"]),
+        ("minimum wage", ["ccc"]),
+        ("divorce", ["dddd", "e", "ff"]),
+    ]
+    futures = [service.submit(query, docs) for query, docs in requests]
+
+    for (query, docs), future in zip(requests, futures, strict=True):
+        assert future.result(timeout=5) == expected(query, docs)
+    assert len(model.calls) == 1
+    queries, _ = model.calls[0]
+    assert set(queries) == {"theft", "minimum wage", "divorce"}
+    assert service.metrics()["batch_fill"] == 1.0
+
+
+def test_oversized_batch_is_split_into_forward_passes():
+    model = StubReranker()
+    service = make_service(model, batch_size=2)
+    documents = ["a", "bb", "ccc", "dddd", "e"]
+
+    assert service.score("q", documents) == expected("q", documents)
+    assert [len(docs) for _, docs in model.calls] == [2, 2, 1]
+
+
+def test_failure_is_raised_by_every_request_in_the_batch():
+    service = make_service(StubReranker(fail_on="boom"), batch_size=4)
+    futures = [
+        service.submit("first", ["a", "b"]),
+        service.submit("second", ["boom", "c"]),
+    ]
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match="forward pass failed"):
+            future.result(timeout=5)
+
+
+def test_cache_hit_skips_the_model():
+    model = StubReranker()
+    service = RerankService(model=model, batch_size=4, max_wait=0.01)
+    keys = [("1", "hash-a"), ("2", "hash-b")]
+
+    first = service.score("theft", ["a", "bb"], keys)
+    second = service.score(" theft  ", ["a", "bb"], keys)
+
+    assert first == second == expected("theft", ["a", "bb"])
+    assert len(model.calls) == 1
+    assert service.cache.stats()["hits"] == 2
+
+
+def test_changed_content_hash_is_a_miss():
+    model = StubReranker()
+    service = RerankService(model=model, batch_size=4, max_wait=0.01)
+
+    service.score("theft", ["old text"], [("1", "hash-old")])
+    assert service.score("theft", ["new text"], [("1", "hash-new")]) == expected(
+        "theft", ["new text"]
+    )
+    assert len(model.calls) == 2
+
+
+def test_cache_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rerank.time, "time", lambda: now[0])
+    cache = RerankCache(max_entries=10, ttl=60)
+    cache.put_many("m", "q", [("1", "h")], [0.5])
+
+    now[0] += 59
+    assert cache.get_many("m", "q", [("1", "h")]) == [0.5]
+    now[0] += 2
+    assert cache.get_many("m", "q", [("1", "h")]) == [None]
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["bytes"] == 0
+
+
+def test_cache_evicts_least_recently_used():
+    cache = RerankCache(max_entries=2, ttl=60)
+    cache.put_many("m", "q", [("1", "h"), ("2", "h")], [0.1, 0.2])
+    cache.get_many("m", "q", [("1", "h")])  # "2" is now least recently used
+    cache.put_many("m", "q", [("3", "h")], [0.3])
+
+    keys = [("1", "h"), ("2", "h"), ("3", "h")]
+    assert cache.get_many("m", "q", keys) == [0.1, None, 0.3]
+    assert cache.stats()["entries"] == 2
+
+
+def test_failed_model_load_is_retried(monkeypatch):
+    monkeypatch.setattr(rerank, "RERANK_LOAD_RETRY_SECONDS", 0)
+    attempts = []
+
+    class FlakyService(RerankService):
+        def load_model(self):
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise OSError("download failed")
+
+    service = FlakyService(model=StubReranker(), max_wait=0.01, cache_entries=0)
+
+    assert service.score("q", ["a"]) == expected("q", ["a"])
+    assert len(attempts) == 2